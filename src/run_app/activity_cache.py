@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict
+
+from derived_cache import sizeof
+from singleflight import SingleFlight
+
+ACTIVITY_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+class ActivityCache:
+    """
+    Process-wide in-memory cache of athletes' activity histories, keyed by athlete id.
+
+    Sessions of the same athlete share one entry, whichever access token they hold, and
+    concurrent misses wait for a single `load(athlete_id)`. Once the entries' total
+    approximate size exceeds `max_bytes`, the athletes idle the longest are evicted.
+    """
+
+    def __init__(self, load, max_bytes=ACTIVITY_CACHE_MAX_BYTES):
+        self.load = load
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # Bumped by `invalidate`, so a load that raced with an update isn't cached.
+        self._generations = {}
+        self._loads = SingleFlight()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, athlete_id):
+        return athlete_id in self._entries
+
+    def get(self, athlete_id):
+        with self._lock:
+            if athlete_id in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(athlete_id)
+                return self._entries[athlete_id][0]
+            self.misses += 1
+            generation = self._generations.get(athlete_id, 0)
+        return self._loads.do((athlete_id, generation), lambda: self._load(athlete_id, generation))
+
+    def _load(self, athlete_id, generation):
+        activities = self.load(athlete_id)
+        size = sizeof(activities)
+        with self._lock:
+            if self._generations.get(athlete_id, 0) != generation or size > self.max_bytes:
+                return activities
+            if athlete_id in self._entries:
+                self.total_bytes -= self._entries.pop(athlete_id)[1]
+            self._entries[athlete_id] = (activities, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+        return activities
+
+    def bytes_by_athlete(self):
+        with self._lock:
+            return {athlete_id: size for athlete_id, (_, size) in self._entries.items()}
+
+    def invalidate(self, athlete_id):
+        """Drops the athlete's history, e.g. after new activities were stored."""
+        with self._lock:
+            self._generations[athlete_id] = self._generations.get(athlete_id, 0) + 1
+            entry = self._entries.pop(athlete_id, None)
+            if entry is not None:
+                self.total_bytes -= entry[1]
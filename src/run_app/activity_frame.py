@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+INITIAL_CAPACITY = 200
+
+# (column, Strava summary field, storage kind) for the canonical activities frame.
+ACTIVITY_SCHEMA = [
+    ("date", "start_date_local", "datetime"),
+    ("name", "name", "object"),
+    ("type", "type", "category"),
+    ("distance_meters", "distance", "float32"),
+    ("moving_time_seconds", "moving_time", "int32"),
+    ("elapsed_time seconds", "elapsed_time", "int32"),
+    ("total_elevation_gain", "total_elevation_gain", "float32"),
+    ("average_speed_metres_per_second", "average_speed", "float32"),
+    ("max_speed_metres_per_second", "max_speed", "float32"),
+    ("average_cadence", "average_cadence", "float32"),
+    ("average_watts", "average_watts", "float32"),
+    ("average_heartrate", "average_heartrate", "float32"),
+    ("max_heartrate", "max_heartrate", "float32"),
+    ("elev_high_meters", "elev_high", "float32"),
+    ("elev_low_meters", "elev_low", "float32"),
+    ("suffer_score", "suffer_score", "float32"),
+    ("id", "id", "int64"),
+]
+
+# Canonical dtypes of the preprocessed runs frame, see `compact_runs`.
+RUNS_DTYPES = {
+    "date": "datetime64[ns, UTC]",
+    "name": "category",
+    "type": "category",
+    "distance_meters": "float32",
+    "moving_time_seconds": "Int32",
+    "elapsed_time seconds": "Int32",
+    "total_elevation_gain": "float32",
+    "average_speed_metres_per_second": "float32",
+    "max_speed_metres_per_second": "float32",
+    "average_cadence": "Int16",
+    "average_watts": "float32",
+    "average_heartrate": "Int16",
+    "max_heartrate": "Int16",
+    "elev_high_meters": "float32",
+    "elev_low_meters": "float32",
+    "suffer_score": "float32",
+    "id": "Int64",
+    "month": "period[M]",
+    "distance_km": "float32",
+    "pace": "float32",
+}
+
+_BUFFER_DTYPES = {
+    "datetime": object,
+    "object": object,
+    "category": object,
+    "float32": np.float32,
+    "int32": np.int32,
+    "int64": np.int64,
+}
+_INTEGER_KINDS = ("int32", "int64")
+
+
+class ActivityFrameBuilder:
+    """
+    Decodes Strava activity pages straight into preallocated, typed column buffers.
+
+    Buffers grow geometrically, so ingesting N activities page by page allocates O(N)
+    memory in total; the DataFrame itself is only built once in `to_frame`.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self._size = 0
+        self._capacity = 0
+        self._buffers = {}
+        self._masks = {}
+        self._reserve(max(capacity, 1))
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, capacity):
+        if capacity <= self._capacity:
+            return
+        capacity = max(capacity, self._capacity * 2)
+        for column, _, kind in ACTIVITY_SCHEMA:
+            buffer = np.empty(capacity, dtype=_BUFFER_DTYPES[kind])
+            if column in self._buffers:
+                buffer[: self._size] = self._buffers[column][: self._size]
+            self._buffers[column] = buffer
+            if kind in _INTEGER_KINDS:
+                mask = np.ones(capacity, dtype=bool)
+                if column in self._masks:
+                    mask[: self._size] = self._masks[column][: self._size]
+                self._masks[column] = mask
+        self._capacity = capacity
+
+    def extend(self, activities):
+        activities = list(activities)
+        start, end = self._size, self._size + len(activities)
+        self._reserve(end)
+        for column, field, kind in ACTIVITY_SCHEMA:
+            values = [activity.get(field) for activity in activities]
+            if kind in _INTEGER_KINDS:
+                missing = [value is None for value in values]
+                self._masks[column][start:end] = missing
+                self._buffers[column][start:end] = [0 if value is None else value for value in values]
+            else:
+                self._buffers[column][start:end] = values
+        self._size = end
+        return self
+
+    def to_frame(self):
+        size = self._size
+        data = {}
+        for column, _, kind in ACTIVITY_SCHEMA:
+            values = self._buffers[column][:size]
+            if kind == "datetime":
+                data[column] = pd.to_datetime(values, format="%Y-%m-%dT%H:%M:%SZ", utc=True, errors="coerce")
+            elif kind == "category":
+                data[column] = pd.Categorical(values)
+            elif kind in _INTEGER_KINDS:
+                data[column] = pd.arrays.IntegerArray(values.copy(), self._masks[column][:size].copy())
+            else:
+                data[column] = values.copy()
+        return pd.DataFrame(data)
+
+
+def frame_from_pages(pages):
+    builder = ActivityFrameBuilder()
+    for page in pages:
+        builder.extend(page)
+    return builder.to_frame()
+
+
+def compact_runs(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Casts a runs frame to `RUNS_DTYPES`, dropping columns outside the schema.
+
+    Heart rate and cadence are whole beats/steps per minute, so they are rounded into
+    nullable Int16; the remaining metrics are float32 and names are categorical.
+    Raises `ValueError` if a column of the schema is missing.
+    """
+    missing = [column for column in RUNS_DTYPES if column not in df.columns]
+    if missing:
+        raise ValueError(f"Runs frame is missing columns {missing}")
+    columns = {}
+    for column, dtype in RUNS_DTYPES.items():
+        values = df[column]
+        if dtype == "Int16" and values.dtype.kind == "f":
+            values = values.round()
+        columns[column] = values.astype(dtype)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """Bytes held by a frame, including its index and the contents of object columns."""
+    return int(df.memory_usage(deep=True).sum())
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+DATA_DIR = os.environ.get("RUN_APP_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+DEFAULT_STORE_PATH = os.path.join(DATA_DIR, "activities.sqlite3")
+
+
+def start_timestamp(activity):
+    """Epoch seconds of the activity's UTC `start_date`, the unit the Strava `after` cursor expects."""
+    start_date = activity.get("start_date") or activity.get("start_date_local")
+    if not start_date:
+        return None
+    parsed = datetime.strptime(start_date, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def payload_digest(payload):
+    """32-bit digest of a stored activity payload, summed into `dataset_version` so edits change it."""
+    return int.from_bytes(hashlib.blake2b(payload.encode(), digest_size=4).digest(), "big")
+
+
+def dataset_version(activities):
+    """Cheap fingerprint of an activity history: its size, latest start time and a content stamp."""
+    return (
+        len(activities),
+        max((start_timestamp(activity) or 0 for activity in activities), default=0),
+        sum(payload_digest(json.dumps(activity)) for activity in activities),
+    )
+
+
+class ActivityStore:
+    """Persistent per-athlete store of raw Strava activity summaries, backed by SQLite."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS activities (
+                    id INTEGER PRIMARY KEY,
+                    athlete_id INTEGER NOT NULL,
+                    start_timestamp INTEGER,
+                    payload TEXT NOT NULL,
+                    digest INTEGER
+                )
+                """
+            )
+            columns = {name for _, name, *_ in connection.execute("PRAGMA table_info(activities)")}
+            if "digest" not in columns:
+                connection.execute("ALTER TABLE activities ADD COLUMN digest INTEGER")
+            missing = connection.execute("SELECT id, payload FROM activities WHERE digest IS NULL").fetchall()
+            connection.executemany(
+                "UPDATE activities SET digest = ? WHERE id = ?",
+                [(payload_digest(payload), activity_id) for activity_id, payload in missing],
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS activities_athlete_start ON activities (athlete_id, start_timestamp)"
+            )
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sync_cursors (
+                    athlete_id INTEGER PRIMARY KEY,
+                    start_timestamp INTEGER NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def latest_start_timestamp(self, athlete_id):
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT MAX(start_timestamp) FROM activities WHERE athlete_id = ?", (athlete_id,)
+            ).fetchone()
+        return row[0]
+
+    def dataset_version(self, athlete_id):
+        """`dataset_version` of the athlete's stored activities, without loading them."""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT COUNT(*), COALESCE(MAX(start_timestamp), 0), COALESCE(SUM(digest), 0) FROM activities"
+                " WHERE athlete_id = ?",
+                (athlete_id,),
+            ).fetchone()
+        return tuple(row)
+
+    def sync_cursor(self, athlete_id):
+        """Start timestamp up to which the athlete's history is known to be complete, None before a full sync."""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT start_timestamp FROM sync_cursors WHERE athlete_id = ?", (athlete_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_sync_cursor(self, athlete_id, timestamp):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO sync_cursors (athlete_id, start_timestamp) VALUES (?, ?)",
+                (athlete_id, timestamp),
+            )
+
+    def upsert(self, athlete_id, activities):
+        rows = []
+        for activity in activities:
+            payload = json.dumps(activity)
+            rows.append((activity["id"], athlete_id, start_timestamp(activity), payload, payload_digest(payload)))
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO activities (id, athlete_id, start_timestamp, payload, digest)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def load(self, athlete_id):
+        """Returns the stored activities newest first, matching the order of the Strava API."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT payload FROM activities WHERE athlete_id = ? ORDER BY start_timestamp DESC",
+                (athlete_id,),
+            ).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
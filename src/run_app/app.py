@@ -1,20 +1,34 @@
 import streamlit as st
 import pandas as pd
-from streamlit_lottie import st_lottie
 from streamlit.components.v1 import html
-import plotly.figure_factory as ff
-from langchain.agents import create_pandas_dataframe_agent
-from langchain.chat_models import ChatOpenAI
-from langchain.agents.agent_types import AgentType
-from pydantic import ValidationError
-from langchain.agents.openai_functions_agent.base import OutputParserException
-from mitosheet.streamlit.v1 import spreadsheet
-import requests
-import json
-import textwrap
+from streamlit_lottie import st_lottie
+import httpx
+import decoupling
+import derived_cache
+import heatmap
+import instrumentation
+import lazy
+import llm_client
 import plots
+import prefetch
+import quick_answers
+import response_cache
+import stream_format
 import strava
 import text
+from monthly_cube import MonthlyCube
+from windows import COMPARISON_WINDOWS, ActivityWindows
+
+# Only imported once the feature using them is shown.
+snapshot = lazy.LazyModule("snapshot")
+mitosheet = lazy.LazyModule("mitosheet.streamlit.v1")
+langchain_agents = lazy.LazyModule("langchain.agents")
+langchain_agent_types = lazy.LazyModule("langchain.agents.agent_types")
+langchain_chat_models = lazy.LazyModule("langchain.chat_models")
+langchain_openai_functions = lazy.LazyModule("langchain.agents.openai_functions_agent.base")
+pydantic = lazy.LazyModule("pydantic")
+
+GPT_MODEL = "gpt-4"
 
 
 def setup_config():
@@ -69,58 +83,43 @@ def convert_pace(pace):
     return minutes + seconds_fraction
 
 
-def pace_threshold(df):
-    pace_threshold = st.number_input(
+def pace_threshold():
+    return st.number_input(
         "Exclude runs slower than this pace (min/km)",
         value=7,
         step=1,
     )
-    df = df[df["pace"] <= pace_threshold]
-    return df
 
 
-def distance_threshold(df):
-    dist_threshold = st.number_input(
+def distance_threshold():
+    return st.number_input(
         "Exclude runs shorter than this distance (km)",
         value=4,
         step=1,
     )
-    df = df[df["distance_km"] >= dist_threshold]
-    return df
 
 
-def display_comparison_metrics(df: pd.DataFrame, df_raw: pd.DataFrame):
+def filter_runs(df: pd.DataFrame, max_pace, min_distance) -> pd.DataFrame:
+    return df[(df["pace"] <= max_pace) & (df["distance_km"] >= min_distance)]
+
+
+def comparison_window():
+    return st.select_slider(
+        "Compare the last ... days with the days before",
+        options=COMPARISON_WINDOWS,
+        value=30,
+    )
+
+
+@instrumentation.timed()
+def display_comparison_metrics(windows: ActivityWindows, df_raw: pd.DataFrame, days=30):
     """
-    Displays a comparison of metrics for the last 30 days against the previous 30 days.
+    Displays a comparison of metrics for the last `days` days against the `days` days before.
     Additionally, shows the overall metrics for the entire dataset.
     """
-    end_date = df["date"].max()
-    last_30_days = df[(df["date"] <= end_date) & (df["date"] > end_date - pd.Timedelta(days=30))]
-    previous_30_days = df[
-        (df["date"] <= end_date - pd.Timedelta(days=30)) & (df["date"] > end_date - pd.Timedelta(days=60))
-    ]
-
-    total_records_all = round(df.shape[0], 2)
-    total_distance_all = round(df["distance_km"].sum(), 2)
-    avg_pace_all = round(df["pace"].mean(), 2)
-
-    metrics_last_30 = {
-        "Total Records": round(last_30_days.shape[0], 2),
-        "Total Distance": round(last_30_days["distance_km"].sum(), 2),
-        "Average Pace": round(last_30_days["pace"].mean(), 2),
-    }
-
-    metrics_prev_30 = {
-        "Total Records": round(previous_30_days.shape[0], 2),
-        "Total Distance": round(previous_30_days["distance_km"].sum(), 2),
-        "Average Pace": round(previous_30_days["pace"].mean(), 2),
-    }
-
-    metrics_all_time = {
-        "Total Records": total_records_all,
-        "Total Distance": total_distance_all,
-        "Average Pace": avg_pace_all,
-    }
+    metrics_last = windows.last_days(days)
+    metrics_prev = windows.last_days(days, offset_days=days)
+    metrics_all_time = windows.all_time()
 
     col0, col1, col2, col3 = st.columns([1, 1, 1, 1])
     with col0:
@@ -141,15 +140,15 @@ def display_comparison_metrics(df: pd.DataFrame, df_raw: pd.DataFrame):
             st.metric(label=metric, value=value)
 
     with col2:
-        st.subheader("Previous 30 Days")
-        for metric, value in metrics_prev_30.items():
+        st.subheader(f"Previous {days} Days")
+        for metric, value in metrics_prev.items():
             st.metric(label=metric, value=value)
 
     with col1:
-        st.subheader("Last 30 Days")
-        for metric, value in metrics_last_30.items():
+        st.subheader(f"Last {days} Days")
+        for metric, value in metrics_last.items():
             if metric == "Average Pace":
-                delta_val = value - metrics_prev_30[metric]
+                delta_val = value - metrics_prev[metric]
                 st.metric(
                     label=metric,
                     value=value,
@@ -157,183 +156,218 @@ def display_comparison_metrics(df: pd.DataFrame, df_raw: pd.DataFrame):
                     delta_color="inverse",
                 )
             else:
-                delta_val = value - metrics_prev_30[metric]
+                delta_val = value - metrics_prev[metric]
                 st.metric(label=metric, value=value, delta=round(delta_val, 2))
 
 
-def activity_heatmap(df):
-    distances = [[0 for _ in range(52)] for _ in range(7)]
-    full_dates = [["" for _ in range(52)] for _ in range(7)]
-
-    for _, row in df.iterrows():
-        week_of_year = row["date"].isocalendar()[1] - 1
-        day_of_week = row["date"].weekday()
-
-        full_dates[day_of_week][week_of_year] = row["date"].strftime("%Y-%m-%d")
-        distances[day_of_week][week_of_year] = row["distance_km"]
-
-    colorscale = [
-        [0.0, "rgba(10, 10, 10, 1)"],
-        [0.1, "rgba(30, 165, 30, 0.1)"],
-        [0.3, "rgba(40, 180, 40, 0.4)"],
-        [0.5, "rgba(50, 195, 50, 0.55)"],
-        [0.7, "rgba(60, 210, 60, 0.7)"],
-        [0.9, "rgba(65, 225, 65, 0.85)"],
-        [1.0, "rgba(70, 236, 70, 1)"],
-    ]
-    hover = [
-        [f"Day: {date}<br>Distance: {round(dist,2)} km" if date else "" for date, dist in zip(date_row, dist_row)]
-        for date_row, dist_row in zip(full_dates, distances)
-    ]
-
-    fig = ff.create_annotated_heatmap(
-        distances,
-        colorscale=colorscale,
-        text=hover,
-        hoverinfo="text",
-        xgap=3,
-        ygap=3,
-    )
-    heatmap_annotations = []
-    months = [
-        'January',
-        'February',
-        'March',
-        'April',
-        'May',
-        'June',
-        'July',
-        'August',
-        'September',
-        'October',
-        'November',
-        'December',
-    ]
-    months_string = '               '.join(months)
-    for ann in fig.layout.annotations:
-        if ann.text != "0":
-            try:
-                rounded_text = str(round(float(ann.text), 1))
-                ann.text = rounded_text
-                heatmap_annotations.append(ann)
-            except ValueError:
-                heatmap_annotations.append(ann)
-    all_annotations = heatmap_annotations + [
-        dict(
-            x=0.5,
-            y=0.1,
-            text=months_string,
-            xref="paper",
-            yref="paper",
-            align="center",
-        )
-    ]
-
-    fig.update_layout(
-        autosize=False,
-        yaxis_title="Mon Tue Wed Thu Fr Sat Sun",
-        width=1800,
-        height=500,
-        xaxis=dict(constrain="domain", showgrid=False, zeroline=False, showline=False),
-        yaxis=dict(scaleanchor="x", showgrid=False, zeroline=False, showline=False),
-        annotations=all_annotations,
-        margin=dict(t=0, r=0, b=100, l=0),
+def display_decoupling(measured: pd.DataFrame):
+    """Shows the aerobic decoupling (Pa:HR) measured from the per-second streams of the recent runs."""
+    values = measured["decoupling"].dropna()
+    if values.empty:
+        return
+    st.metric(
+        "Median aerobic decoupling (Pa:HR)",
+        f"{values.median():.1f}%",
+        help="Drop of pace per heart beat from the first to the second half of a run. "
+        "Below 5% indicates a well developed aerobic base.",
     )
-    fig.update_yaxes(
-        tickvals=list(range(7)),
-        ticktext=["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"],
-    )
-    for ann in fig.layout.annotations:
-        ann.font.size = 12
-    st.plotly_chart(fig, use_container_width=False)
+    st.caption(f"{(values < 5).mean():.0%} of your last {len(values)} measured runs stayed below 5% decoupling.")
 
 
-def wrap_text(text, width=140):
-    unwrapped_text = ' '.join(text.splitlines())
-    return '\n'.join(textwrap.wrap(unwrapped_text, width=width))
+@instrumentation.timed()
+def activity_heatmap(df, years):
+    grid = heatmap.daily_distance_grid(df, years)
+    for index, year in reversed(list(enumerate(years))):
+        st.plotly_chart(heatmap.heatmap_figure(grid[index], year), use_container_width=False)
 
 
-def separate_table(content):
-    lines = content.split('\n')
-    table_start_index = -1
-    for index, line in enumerate(lines):
-        if set(line.strip()) <= {'-', '|', ' '}:
-            table_start_index = index - 1
-            break
+def heatmap_years(df):
+    years = sorted(df["date"].dt.year.unique().tolist())
+    if len(years) < 2:
+        return years
+    first, last = st.select_slider("Heatmap years", options=years, value=(years[-1], years[-1]))
+    return list(range(first, last + 1))
 
-    if table_start_index != -1:
-        table_lines = [lines[table_start_index]]
-        for line in lines[table_start_index + 1 :]:
-            if "|" in line:
-                table_lines.append(line)
-            else:
-                break
 
-        before_table = '\n'.join(lines[:table_start_index])
-        table_content = '\n'.join(table_lines)
-        after_table = '\n'.join(lines[table_start_index + len(table_lines) :])
+@instrumentation.timed()
+def filtered_runs(athlete_id, max_pace, min_distance, job=None, pages=0):
+    """
+    The athlete's stored runs, unfiltered and filtered, and the cache key of the filtered runs.
 
-        return before_table, table_content, after_table
+    While `job` is still syncing the history, the runs it delivered in its first `pages` pages stand in.
+    """
+    if job is not None and not job.done:
+        version = strava.sync_version(job, pages)
+        df_raw = strava.progressive_runs_frame(athlete_id, job, pages)
+    else:
+        version = strava.activity_store().dataset_version(athlete_id)
+        df_raw = strava.runs_frame(athlete_id, version)
+    key = derived_cache.cache_key(athlete_id, version, pace_threshold=max_pace, distance_threshold=min_distance)
+    df = derived_cache.cached(key, "runs", lambda: filter_runs(df_raw, max_pace, min_distance))
+    return df_raw, df, key
+
+
+@instrumentation.timed()
+def render_dashboard(slots, df_raw, df, key, days, final=False):
+    """
+    Draws the heatmap, metrics and charts into their placeholders, replacing what was there.
 
-    return content, "", ""
+    Until the `final` render only the latest year of the heatmap is drawn, as its year
+    selector is a widget and can only be created once per script run.
+    """
+    with slots["heatmap"].container():
+        years = heatmap_years(df_raw) if final else sorted(df_raw["date"].dt.year.unique().tolist())[-1:]
+        activity_heatmap(df_raw, years)
+    windows = derived_cache.cached(key, "windows", lambda: ActivityWindows(df))
+    with slots["metrics"].container():
+        display_comparison_metrics(windows, df_raw, days)
+
+    cube = MonthlyCube.updated(st.session_state.get("monthly_cube"), df)
+    st.session_state["monthly_cube"] = cube
+    with slots["cumulative"].container():
+        plots.plot_cumulative_kms_per_month(cube, key=key)
+        # plots.plot_monthly_avg_pace(cube, key=key)
+    with slots["efficiency"].container():
+        plots.plot_heart_rate_efficiency(df, key=key)
+    with slots["distribution"].container():
+        plots.plot_pace_distribution(cube, key=key)
+    with slots["histogram"].container():
+        plots.plot_distance_histogram(df)
+
+
+def stream_gpt_content(query):
+    """
+    Yields the chunks of GPT's streamed answer to `query` as they arrive.
 
+    Complete answers are cached, so asking the same question again doesn't call the API.
+    """
+    cache = response_cache.shared_response_cache()
+    key = response_cache.response_key(query, GPT_MODEL)
+    cached_content = cache.get(key)
+    if cached_content is not None:
+        yield cached_content
+        return
 
-def fetch_gpt_response_test(query):
-    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {st.secrets['gpt4_key']}"}
-    data = {"model": "gpt-4", "messages": [{"role": "user", "content": query}], "stream": True}
+    content = []
+    messages = [{"role": "user", "content": query}]
+    for content_chunk in llm_client.shared_chat_streamer().stream(st.secrets['gpt4_key'], messages, GPT_MODEL):
+        content.append(content_chunk)
+        yield content_chunk
+    cache.put(key, "".join(content))
 
-    response = requests.post('https://api.openai.com/v1/chat/completions', headers=headers, json=data, stream=True)
 
-    accumulated_content = ""
-    for line in response.iter_lines():
-        if line:
-            decoded_line = line.decode('utf-8')
-            if decoded_line.startswith('data:'):
-                try:
-                    json_data = json.loads(decoded_line[5:])
-                except json.JSONDecodeError:
-                    continue
-                choice = json_data.get('choices', [{}])[0]
-                delta = choice.get('delta', {})
-                content_chunk = delta.get('content', "")
-                accumulated_content += content_chunk
-                before_table, table_content, after_table = separate_table(accumulated_content)
-                formatted_content = wrap_text(before_table) + table_content + wrap_text(after_table)
-                yield formatted_content
+def fetch_gpt_response_test(query):
+    """Yields GPT's answer as formatted deltas: paragraphs wrapped, markdown tables kept intact."""
+    return stream_format.format_stream(stream_gpt_content(query))
 
 
 def fetch_gpt_response(query):
-    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {st.secrets['gpt4_key']}"}
-    data = {"model": "gpt-4", "messages": [{"role": "user", "content": query}], "stream": True}
-
-    response = requests.post('https://api.openai.com/v1/chat/completions', headers=headers, json=data, stream=True)
-
-    accumulated_content = ""
-    for line in response.iter_lines():
-        if line:
-            decoded_line = line.decode('utf-8')
-            if decoded_line.startswith('data:'):
-                try:
-                    json_data = json.loads(decoded_line[5:])
-                except json.JSONDecodeError:
-                    continue
-                choice = json_data.get('choices', [{}])[0]
-                delta = choice.get('delta', {})
-                content_chunk = delta.get('content', "")
-                accumulated_content += content_chunk
-                formatted_content = wrap_text(accumulated_content)
-                yield formatted_content
+    """Yields GPT's answer as formatted deltas, all text wrapped as paragraphs."""
+    return stream_format.format_stream(stream_gpt_content(query), detect_tables=False)
 
 
 def init_langchain_agent(df):
-    return create_pandas_dataframe_agent(
-        ChatOpenAI(temperature=0, model="gpt-4", openai_api_key=st.secrets['gpt4_key']),
+    return langchain_agents.create_pandas_dataframe_agent(
+        langchain_chat_models.ChatOpenAI(temperature=0, model=GPT_MODEL, openai_api_key=st.secrets['gpt4_key']),
         df,
         verbose=True,
-        agent_type=AgentType.OPENAI_FUNCTIONS,
+        agent_type=langchain_agent_types.AgentType.OPENAI_FUNCTIONS,
     )
 
 
+def explore_snapshot():
+    """Lets visitors explore a processed history downloaded from the app before, without logging in."""
+    uploaded = st.file_uploader("Or explore a running history you downloaded from this app before", type="parquet")
+    if uploaded is None:
+        return
+    try:
+        df_raw = snapshot.read_snapshot(uploaded)
+    except snapshot.SnapshotError as e:
+        st.error(f"This file is not a running history downloaded from this app: {e}")
+        return
+    if df_raw.empty:
+        st.info("This history has no runs.")
+        return
+
+    slots = {"heatmap": st.empty()}
+    pace, threshold, window = st.columns(3)
+    with pace:
+        max_pace = pace_threshold()
+    with threshold:
+        min_distance = distance_threshold()
+    with window:
+        days = comparison_window()
+    slots["metrics"] = st.empty()
+    a, _, b = st.columns((6, 1, 6))
+    with a:
+        slots["cumulative"] = st.empty()
+        slots["efficiency"] = st.empty()
+    with b:
+        slots["distribution"] = st.empty()
+        slots["histogram"] = st.empty()
+    render_dashboard(slots, df_raw, filter_runs(df_raw, max_pace, min_distance), None, days, final=True)
+
+
+def is_admin(athlete_id):
+    return athlete_id in st.secrets.get("ADMIN_ATHLETE_IDS", [])
+
+
+def cache_counts(counts):
+    return ", ".join(f"{cache}: {count}" for cache, count in counts.items())
+
+
+def profiling_panel():
+    """Admin-only breakdown of where recent reruns spent their time, with JSON and Prometheus exports."""
+    profiler = instrumentation.shared_profiler()
+    with st.expander("Profiling"):
+        summary = pd.DataFrame.from_dict(profiler.stage_summary(), orient="index")
+        if not summary.empty:
+            summary["cache_hits"] = summary["cache_hits"].map(cache_counts)
+            summary["cache_misses"] = summary["cache_misses"].map(cache_counts)
+            st.dataframe(summary.sort_values("total", ascending=False), use_container_width=True)
+
+        reruns = profiler.recent()
+        if reruns:
+            labels = {
+                f"{pd.Timestamp(rerun['started'], unit='s'):%H:%M:%S} {rerun['seconds']:.2f}s "
+                f"(session {rerun['session_id']})": rerun
+                for rerun in reruns
+            }
+            rerun = labels[st.selectbox("Rerun", list(labels))]
+            stages = pd.DataFrame(rerun["stages"])
+            stages["name"] = [" " * depth + name for depth, name in zip(stages["depth"], stages["name"])]
+            stages["cache_hits"] = stages["cache_hits"].map(cache_counts)
+            stages["cache_misses"] = stages["cache_misses"].map(cache_counts)
+            st.dataframe(stages.drop(columns="depth"), use_container_width=True)
+
+        latency = strava.strava_client().latency_summary()
+        if latency:
+            st.markdown("**Strava API latency**")
+            st.dataframe(pd.DataFrame.from_dict(latency, orient="index"), use_container_width=True)
+
+        memory = strava.memory_by_athlete()
+        if memory:
+            st.markdown("**Memory per athlete (bytes)**")
+            st.dataframe(pd.DataFrame.from_dict(memory, orient="index"), use_container_width=True)
+
+        json_export, prometheus_export = st.columns(2)
+        with json_export:
+            st.download_button(
+                "Export JSON",
+                profiler.to_json(strava_latency=latency, memory_by_athlete=memory),
+                file_name="profile.json",
+                mime="application/json",
+            )
+        with prometheus_export:
+            st.download_button(
+                "Export Prometheus metrics",
+                profiler.to_prometheus(memory),
+                file_name="metrics.prom",
+                mime="text/plain",
+            )
+
+
+@instrumentation.profiled
 def main():
     """Main function of the Streamlit App."""
     setup_config()
@@ -356,40 +390,24 @@ def main():
     if strava_auth:
         with r:
             html(bmac)
-        df_raw = pd.DataFrame()
-        page_num = 1
-
-        while True:
-            try:
-                df_page = strava.dataframe_from_strava(strava_auth, page_num)
-
-                if df_page.empty:
-                    break
-
-                df_raw = pd.concat([df_raw, df_page], ignore_index=True)
-                page_num += 1
-
-            except Exception as e:
-                print(f"Error on page {page_num}: {e}")
-                break
-        df_raw = strava.load_strava_data(df_raw)
-        df_raw_2024 = df_raw[df_raw['date'].dt.year == 2024]
-
-        activity_heatmap(df_raw_2024)
-        pace, threshold = st.columns(2)
+        athlete_id = strava_auth["athlete"]["id"]
+        job = strava.prefetch_activities(strava_auth)
+        with instrumentation.stage("prefetch.first_page"):
+            rendered_pages = job.wait_for_pages(1, timeout=prefetch.FIRST_PAGE_TIMEOUT_SECONDS)
+
+        # Everything that depends on the history is drawn into placeholders, so it can be
+        # redrawn in place as more pages arrive.
+        progress = st.empty()
+        slots = {"heatmap": st.empty()}
+        pace, threshold, window = st.columns(3)
         with pace:
-            df = pace_threshold(df_raw)
+            max_pace = pace_threshold()
         with threshold:
-            df = distance_threshold(df)
-        display_comparison_metrics(df, df_raw)
-
-        with st.expander(
-            "Work with your data - create plots and analysis without coding (powered by [Mito](https://www.trymito.io/spreadsheet-automation))"
-        ):
-            spreadsheet(
-                df,
-                # use_container_width=True,
-            )
+            min_distance = distance_threshold()
+        with window:
+            days = comparison_window()
+        slots["metrics"] = st.empty()
+        spreadsheet_slot = st.empty()
 
         metrics_list = [
             "distance_km",
@@ -403,14 +421,19 @@ def main():
 
         # plots.plot_scatter_metrics_with_regression(df, metrics_list)
 
+        measure_efficiency = st.toggle("Measure efficiency from per-second heart rate and pace streams")
         a, _, b = st.columns((6, 1, 6))
         with a:
-            plots.plot_cumulative_kms_per_month(df)
-            # plots.plot_monthly_avg_pace(df)
-            plots.plot_heart_rate_efficiency(df)
+            slots["cumulative"] = st.empty()
+            slots["efficiency"] = st.empty()
         with b:
-            plots.plot_pace_distribution(df)
-            plots.plot_distance_histogram(df)
+            slots["distribution"] = st.empty()
+            slots["histogram"] = st.empty()
+
+        rendered_final = job.done
+        df_raw, df, filtered_key = filtered_runs(athlete_id, max_pace, min_distance, job, rendered_pages)
+        if not df_raw.empty:
+            render_dashboard(slots, df_raw, df, filtered_key, days, final=rendered_final)
 
         if st.toggle("### Ressources - Strength Training for Runners"):
             st.markdown(text.texts["gym_summary"])
@@ -421,18 +444,100 @@ def main():
         st.markdown("*Example: Show me my longest run!*")
         user_input = st.text_input("Your question:", "")
         if user_input:
+            # Common questions are answered from a precomputed summary without calling GPT-4.
+            with instrumentation.stage("quick_answers.answer"):
+                summary = derived_cache.cached(filtered_key, "summary", lambda: quick_answers.RunSummary(df))
+                answer = quick_answers.answer(user_input, summary)
+            if answer is not None:
+                st.markdown(answer)
+            else:
+                # Identical questions over identical data are answered from the response cache.
+                fingerprint = derived_cache.cached(
+                    filtered_key, "fingerprint", lambda: response_cache.data_fingerprint(df)
+                )
+                key = response_cache.response_key(user_input, f"{GPT_MODEL}/pandas-agent", fingerprint)
+                try:
+                    with st.spinner("AI at work!"), instrumentation.stage("langchain.agent"):
+                        response = response_cache.shared_response_cache().get_or_compute(
+                            key,
+                            lambda: init_langchain_agent(quick_answers.agent_frame(df)).run(summary.prompt(user_input)),
+                        )
+                        st.markdown(response)
+                except pydantic.ValidationError:
+                    st.error("API Key Validation failed. Ensure your API key is correctly configured.")
+                except ImportError:
+                    st.error("A required library is missing. Ensure you've installed all dependencies.")
+                except langchain_openai_functions.OutputParserException:
+                    st.error(
+                        "There was an error parsing the response. Please try a different query or check your data."
+                    )
+                except Exception as e:
+                    st.error(f"An unexpected error occurred: {str(e)}")
+
+        while not job.done and job.error is None:
+            progress.status(
+                f"Loading your activity history... {job.activities} activities so far, charts fill in as more arrive.",
+                state="running",
+            )
+            with instrumentation.stage("prefetch.wait_for_pages"):
+                pages = job.wait_for_pages(rendered_pages + 1, timeout=prefetch.PAGE_TIMEOUT_SECONDS)
+            if pages == rendered_pages:
+                # Either the job just finished or no page arrived in time; stop waiting either way.
+                break
+            rendered_pages = pages
+            df_raw, df, filtered_key = filtered_runs(athlete_id, max_pace, min_distance, job, rendered_pages)
+            if not df_raw.empty:
+                render_dashboard(slots, df_raw, df, filtered_key, days)
+        progress.empty()
+        if not rendered_final:
+            df_raw, df, filtered_key = filtered_runs(athlete_id, max_pace, min_distance)
+        if job.error is not None:
+            print(f"Error while fetching activities: {job.error}")
+            progress.warning("Could not load your latest activities from Strava, showing the last synced data.")
+        elif not job.done:
+            progress.warning("Strava is slow to respond, showing the activities loaded so far. Reload to see the rest.")
+
+        measured = None
+        if measure_efficiency:
+            run_ids = df["id"].dropna().astype(int).tolist()[-decoupling.STREAM_ANALYSIS_LIMIT :]
             try:
-                with st.spinner("AI at work!"):
-                    response = init_langchain_agent(df).run(user_input)
-                    st.markdown(response)
-            except ValidationError:
-                st.error("API Key Validation failed. Ensure your API key is correctly configured.")
-            except ImportError:
-                st.error("A required library is missing. Ensure you've installed all dependencies.")
-            except OutputParserException:
-                st.error("There was an error parsing the response. Please try a different query or check your data.")
-            except Exception as e:
-                st.error(f"An unexpected error occurred: {str(e)}")
+                with st.spinner("Downloading and analysing your activity streams..."):
+                    with instrumentation.stage("strava.sync_streams"):
+                        strava.sync_streams(strava_auth, run_ids)
+                    with instrumentation.stage("decoupling.analyse_activities"):
+                        measured = decoupling.analyse_activities(strava.stream_store(), athlete_id, run_ids)
+            except httpx.HTTPError as e:
+                st.warning(f"Could not download all activity streams: {e}")
+        if not df_raw.empty and not rendered_final:
+            render_dashboard(slots, df_raw, df, filtered_key, days, final=True)
+        if measured is not None:
+            with slots["efficiency"].container():
+                plots.plot_heart_rate_efficiency(df, key=filtered_key, measured=measured)
+                display_decoupling(measured)
+
+        with spreadsheet_slot.container():
+            with st.expander(
+                "Work with your data - create plots and analysis without coding (powered by [Mito](https://www.trymito.io/spreadsheet-automation))"
+            ):
+                with instrumentation.stage("mitosheet.spreadsheet"):
+                    mitosheet.spreadsheet(
+                        df,
+                        # use_container_width=True,
+                    )
+            if not df_raw.empty:
+                st.download_button(
+                    "Download your processed running history (Parquet)",
+                    derived_cache.cached(
+                        filtered_key, "snapshot", lambda: snapshot.snapshot_bytes(df_raw, athlete_id=athlete_id)
+                    ),
+                    file_name=f"runs-{athlete_id}.parquet",
+                    mime="application/vnd.apache.parquet",
+                )
+
+        if is_admin(athlete_id):
+            profiling_panel()
+    else:
+        explore_snapshot()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,133 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from streams import ActivityStreams, StreamStore, stream_version
+
+# Most recent runs whose streams the dashboard downloads and analyses.
+STREAM_ANALYSIS_LIMIT = 100
+# Below this many activities a process pool costs more than it saves.
+PROCESS_POOL_MIN_ACTIVITIES = 50
+RESULT_FILE = "efficiency.json"
+MAX_GRADE = 0.45
+# Minetti et al. (2002) energy cost of running at grade 0, J/kg/m.
+FLAT_COST = 3.6
+
+
+def running_cost(grade):
+    """Minetti's polynomial energy cost of running (J/kg/m) at a fractional grade."""
+    g = np.clip(grade, -MAX_GRADE, MAX_GRADE)
+    return 155.4 * g**5 - 30.4 * g**4 - 43.3 * g**3 + 46.3 * g**2 + 19.5 * g + FLAT_COST
+
+
+def grade(distance, altitude):
+    """Fractional grade per sample from cumulative distance and altitude."""
+    rise = np.diff(altitude, prepend=altitude[:1])
+    run = np.diff(distance, prepend=distance[:1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(run > 0, rise / run, 0.0)
+
+
+def efficiency_kernel(time, heartrate, velocity, grades=None, moving=None):
+    """
+    Aerobic efficiency of one activity from its per-second streams.
+
+    Returns the efficiency factor (grade-adjusted speed in m/s per beat), the
+    Pa:HR decoupling in percent (drop of that factor from the first to the second
+    half of the moving time) and the average grade-adjusted speed. Samples are
+    weighted by the time they cover, so gaps in recording don't skew the averages.
+    """
+    time = np.asarray(time, dtype=np.float64)
+    heartrate = np.asarray(heartrate, dtype=np.float64)
+    velocity = np.asarray(velocity, dtype=np.float64)
+    weights = np.diff(time, append=time[-1:])
+    # Comparisons with NaN are false, so sensor dropouts are left out.
+    valid = (heartrate > 0) & (weights > 0) & np.isfinite(velocity)
+    if moving is not None:
+        valid &= np.asarray(moving, dtype=bool)
+    if grades is not None:
+        velocity = velocity * running_cost(np.asarray(grades, dtype=np.float64) / 100) / FLAT_COST
+    if valid.sum() < 2:
+        return {"efficiency_factor": np.nan, "decoupling": np.nan, "grade_adjusted_speed": np.nan}
+
+    moving_time = np.cumsum(np.where(valid, weights, 0))
+    first_half = valid & (moving_time <= moving_time[-1] / 2)
+    second_half = valid & ~first_half
+
+    def factor(mask):
+        w = weights[mask]
+        if w.sum() == 0:
+            return np.nan
+        return np.average(velocity[mask], weights=w) / np.average(heartrate[mask], weights=w)
+
+    first, second = factor(first_half), factor(second_half)
+    return {
+        "efficiency_factor": factor(valid),
+        "decoupling": (first - second) / first * 100 if first else np.nan,
+        "grade_adjusted_speed": np.average(velocity[valid], weights=weights[valid]),
+    }
+
+
+def analyse_streams(streams: ActivityStreams):
+    if "time" not in streams or "heartrate" not in streams or "velocity_smooth" not in streams:
+        return {"efficiency_factor": np.nan, "decoupling": np.nan, "grade_adjusted_speed": np.nan}
+    grades = streams.get("grade_smooth")
+    if grades is None and "altitude" in streams and "distance" in streams:
+        grades = grade(np.asarray(streams["distance"], np.float64), np.asarray(streams["altitude"], np.float64)) * 100
+    return efficiency_kernel(
+        streams["time"], streams["heartrate"], streams["velocity_smooth"], grades, streams.get("moving")
+    )
+
+
+def analyse_directory(directory):
+    """
+    Analyses the streams in `directory`, caching the result next to them together with
+    the `stream_version` it was computed from, so re-saved streams are analysed again.
+    """
+    result_path = os.path.join(directory, RESULT_FILE)
+    version = stream_version(directory)
+    if os.path.exists(result_path):
+        with open(result_path) as f:
+            result = json.load(f)
+        if result.get("stream_version") == version:
+            return result
+    result = {key: float(value) for key, value in analyse_streams(ActivityStreams(directory)).items()}
+    result["stream_version"] = version
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+    return result
+
+
+def analyse_activities(store: StreamStore, athlete_id, activity_ids, max_workers=None) -> pd.DataFrame:
+    """
+    Measured efficiency and decoupling of every stored activity, indexed by activity id,
+    with the version of the streams each was measured from.
+
+    Results are cached per activity; large batches of uncached activities are spread
+    over a process pool.
+    """
+    activity_ids = [activity_id for activity_id in activity_ids if store.has(athlete_id, activity_id)]
+    directories = [store.load(athlete_id, activity_id).directory for activity_id in activity_ids]
+    uncached = sum(not os.path.exists(os.path.join(directory, RESULT_FILE)) for directory in directories)
+    if uncached >= PROCESS_POOL_MIN_ACTIVITIES:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            results = list(executor.map(analyse_directory, directories, chunksize=8))
+    else:
+        results = [analyse_directory(directory) for directory in directories]
+    return pd.DataFrame(
+        results,
+        index=pd.Index(activity_ids, name="id"),
+        columns=["efficiency_factor", "decoupling", "grade_adjusted_speed", "stream_version"],
+    )
+
+
+def measurement_key(measured: pd.DataFrame):
+    """Identifies a set of measurements by the streams they came from, for caching what is derived from them."""
+    if measured is None:
+        return None
+    return tuple(zip(measured.index.tolist(), measured["stream_version"].tolist()))
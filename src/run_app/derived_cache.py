@@ -0,0 +1,110 @@
+import pickle
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import instrumentation
+
+DERIVED_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def sizeof(value):
+    """Approximate in-memory size of a cached value in bytes."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        size = value.memory_usage(deep=True)
+        return int(size.sum() if isinstance(size, pd.Series) else size)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+class DerivedCache:
+    """
+    Thread-safe LRU cache for frames, aggregates and figures derived from an athlete's data.
+
+    Entries are evicted least recently used first once their total approximate size
+    exceeds `max_bytes`. Keys are plain tuples, so looking one up never hashes a DataFrame.
+    """
+
+    def __init__(self, max_bytes=DERIVED_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            hit = key in self._entries
+            instrumentation.count_cache("derived", hit)
+            if not hit:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+        return value
+
+    def get_or_compute(self, key, compute):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = self.put(key, compute())
+        return value
+
+    def bytes_by_athlete(self):
+        """Approximate bytes cached per athlete id, the first element of every `cache_key`."""
+        usage = {}
+        with self._lock:
+            for key, (_, size) in self._entries.items():
+                usage[key[0]] = usage.get(key[0], 0) + size
+        return usage
+
+    def invalidate(self, predicate):
+        """Drops every entry whose key satisfies `predicate`."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self.total_bytes -= self._entries.pop(key)[1]
+
+
+@st.cache_resource
+def shared_cache():
+    return DerivedCache()
+
+
+def cache_key(athlete_id, dataset_version, **params):
+    """Key prefix identifying one athlete's dataset version under a set of filter parameters."""
+    return (athlete_id, dataset_version, tuple(sorted(params.items())))
+
+
+def cached(key, name, compute):
+    """Returns `compute()` memoised under `key` + `name`, or computes it uncached when `key` is None."""
+    if key is None:
+        return compute()
+    return shared_cache().get_or_compute((*key, name), compute)
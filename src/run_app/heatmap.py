@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+MONTHS = [
+    'January',
+    'February',
+    'March',
+    'April',
+    'May',
+    'June',
+    'July',
+    'August',
+    'September',
+    'October',
+    'November',
+    'December',
+]
+# A year spans at most 54 Monday-based week columns (leap year starting on a Sunday).
+WEEK_COLUMNS = 54
+COLORSCALE = [
+    [0.0, "rgba(10, 10, 10, 1)"],
+    [0.1, "rgba(30, 165, 30, 0.1)"],
+    [0.3, "rgba(40, 180, 40, 0.4)"],
+    [0.5, "rgba(50, 195, 50, 0.55)"],
+    [0.7, "rgba(60, 210, 60, 0.7)"],
+    [0.9, "rgba(65, 225, 65, 0.85)"],
+    [1.0, "rgba(70, 236, 70, 1)"],
+]
+
+
+def _calendar_position(days):
+    """Maps datetime64[D] days to (year, weekday, week column) index arrays."""
+    years = days.astype("datetime64[Y]")
+    day_of_year = (days - years.astype("datetime64[D]")).astype(np.int64)
+    # 1970-01-01 was a Thursday, i.e. weekday 3 with Monday as 0.
+    weekday = (days.astype(np.int64) + 3) % 7
+    first_weekday = (weekday - day_of_year) % 7
+    week = (day_of_year + first_weekday) // 7
+    return years.astype(np.int64) + 1970, weekday, week
+
+
+def _year_cells(year):
+    """Returns 1 January of `year` and the day offset from it of every (weekday, week) cell."""
+    first_day = np.datetime64(f"{year}-01-01")
+    first_weekday = (first_day.astype(np.int64) + 3) % 7
+    cells = np.arange(WEEK_COLUMNS * 7).reshape(WEEK_COLUMNS, 7).T
+    return first_day, cells - first_weekday
+
+
+def daily_distance_grid(df: pd.DataFrame, years) -> np.ndarray:
+    """
+    Bins the distance of every run into a (year, weekday, week) calendar array.
+
+    Runs on the same day are summed. Cells outside a calendar year are NaN so they
+    are left blank when rendered.
+    """
+    years = list(years)
+    grid = np.zeros((len(years), 7, WEEK_COLUMNS))
+    if not years:
+        return grid
+
+    for index, year in enumerate(years):
+        first_day, offset = _year_cells(year)
+        days_in_year = (np.datetime64(f"{year + 1}-01-01") - first_day).astype(np.int64)
+        grid[index][(offset < 0) | (offset >= days_in_year)] = np.nan
+
+    dates = df["date"]
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    days = dates.to_numpy().astype("datetime64[D]")
+    distances = df["distance_km"].to_numpy(dtype=np.float64, na_value=0)
+    year, weekday, week = _calendar_position(days)
+    selected = ~np.isnat(days) & (year >= years[0]) & (year <= years[-1])
+    np.add.at(grid, (year[selected] - years[0], weekday[selected], week[selected]), distances[selected])
+
+    return grid
+
+
+def heatmap_figure(grid: np.ndarray, year: int) -> go.Figure:
+    """Builds the heatmap for one year of `daily_distance_grid`, labelling cells with text instead of annotations."""
+    first_day, offset = _year_cells(year)
+    cell_dates = np.datetime_as_string(first_day + offset, unit="D")
+    distances = np.nan_to_num(grid)
+    has_run = distances > 0
+    text = np.where(has_run, np.char.mod("%.1f", distances), "")
+    hover = np.where(
+        has_run,
+        np.char.add(np.char.add("Day: ", cell_dates), np.char.mod("<br>Distance: %.2f km", distances)),
+        "",
+    )
+    month_starts = np.arange(first_day.astype("datetime64[M]"), first_day.astype("datetime64[M]") + 12)
+    _, _, month_weeks = _calendar_position(month_starts.astype("datetime64[D]"))
+
+    fig = go.Figure(
+        data=go.Heatmap(
+            z=grid,
+            text=text,
+            texttemplate="%{text}",
+            textfont=dict(size=12),
+            hovertext=hover,
+            hoverinfo="text",
+            colorscale=COLORSCALE,
+            showscale=False,
+            xgap=3,
+            ygap=3,
+        )
+    )
+    fig.update_layout(
+        title=dict(text=str(year), x=0, y=0.98),
+        autosize=False,
+        yaxis_title="Mon Tue Wed Thu Fr Sat Sun",
+        width=1800,
+        height=500,
+        xaxis=dict(
+            constrain="domain",
+            showgrid=False,
+            zeroline=False,
+            showline=False,
+            tickvals=month_weeks,
+            ticktext=MONTHS,
+        ),
+        yaxis=dict(scaleanchor="x", showgrid=False, zeroline=False, showline=False),
+        margin=dict(t=30, r=0, b=100, l=0),
+    )
+    fig.update_yaxes(
+        tickvals=list(range(7)),
+        ticktext=WEEKDAYS,
+    )
+    return fig
@@ -0,0 +1,265 @@
+import contextvars
+import functools
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Reruns kept per process.
+PROFILE_HISTORY = 200
+METRIC_PREFIX = "run_app"
+
+_current_rerun = contextvars.ContextVar("current_rerun", default=None)
+_current_stage = contextvars.ContextVar("current_stage", default=None)
+
+
+class StageTiming:
+    """Wall time, net allocated memory blocks and cache lookups of one stage of a rerun."""
+
+    __slots__ = ("name", "depth", "seconds", "allocated_blocks", "cache_hits", "cache_misses", "error")
+
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.seconds = 0.0
+        self.allocated_blocks = 0
+        self.cache_hits = {}
+        self.cache_misses = {}
+        self.error = None
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class RerunProfile:
+    """The stages timed during one run of the Streamlit script, in the order they finished."""
+
+    def __init__(self, session_id=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.started = time.time()
+        self.seconds = None
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def add(self, timing):
+        with self._lock:
+            self.stages.append(timing)
+
+    def to_dict(self):
+        with self._lock:
+            stages = [timing.to_dict() for timing in self.stages]
+        return {
+            "id": self.id,
+            "session_id": self.session_id,
+            "started": self.started,
+            "seconds": self.seconds,
+            "stages": stages,
+        }
+
+
+class Profiler:
+    """
+    Process-wide ring buffer of rerun profiles.
+
+    Stages are only recorded inside `rerun()`, so instrumented code called elsewhere,
+    e.g. by the prefetch workers, runs at the cost of one context variable lookup.
+    """
+
+    def __init__(self, history=PROFILE_HISTORY):
+        self.reruns = deque(maxlen=history)
+
+    @contextmanager
+    def rerun(self, session_id=None):
+        profile = RerunProfile(session_id)
+        token = _current_rerun.set(profile)
+        started = time.perf_counter()
+        try:
+            yield profile
+        finally:
+            profile.seconds = time.perf_counter() - started
+            _current_rerun.reset(token)
+            self.reruns.append(profile)
+
+    def recent(self, count=None):
+        """Finished reruns, newest first, as dicts."""
+        reruns = list(self.reruns)[::-1]
+        return [profile.to_dict() for profile in reruns[:count]]
+
+    def stage_summary(self):
+        """Per stage: number of calls, p50/p95/max/total seconds, allocated blocks and cache lookups."""
+        by_stage = {}
+        for profile in list(self.reruns):
+            for timing in list(profile.stages):
+                by_stage.setdefault(timing.name, []).append(timing)
+        summary = {}
+        for name, timings in by_stage.items():
+            seconds = np.array([timing.seconds for timing in timings])
+            hits, misses = {}, {}
+            for timing in timings:
+                for cache, count in timing.cache_hits.items():
+                    hits[cache] = hits.get(cache, 0) + count
+                for cache, count in timing.cache_misses.items():
+                    misses[cache] = misses.get(cache, 0) + count
+            summary[name] = {
+                "calls": len(timings),
+                "errors": sum(timing.error is not None for timing in timings),
+                "p50": float(np.percentile(seconds, 50)),
+                "p95": float(np.percentile(seconds, 95)),
+                "max": float(seconds.max()),
+                "total": float(seconds.sum()),
+                "allocated_blocks": sum(timing.allocated_blocks for timing in timings),
+                "cache_hits": hits,
+                "cache_misses": misses,
+            }
+        return summary
+
+    def to_json(self, **extra):
+        return json.dumps({"stages": self.stage_summary(), "reruns": self.recent(), **extra}, indent=2)
+
+    def to_prometheus(self, memory_by_athlete=None):
+        """
+        The stage summary in the Prometheus text exposition format, plus the bytes cached
+        per athlete and cache when `memory_by_athlete` ({athlete: {cache: bytes}}) is given.
+        """
+        summary = self.stage_summary()
+        reruns = [profile.seconds for profile in list(self.reruns)]
+        lines = [
+            f"# HELP {METRIC_PREFIX}_rerun_seconds Wall time of recent script reruns.",
+            f"# TYPE {METRIC_PREFIX}_rerun_seconds summary",
+        ]
+        if reruns:
+            for quantile in (0.5, 0.95):
+                lines.append(
+                    f'{METRIC_PREFIX}_rerun_seconds{{quantile="{quantile}"}} {np.percentile(reruns, quantile * 100):.6f}'
+                )
+        lines.append(f"{METRIC_PREFIX}_rerun_seconds_sum {sum(reruns):.6f}")
+        lines.append(f"{METRIC_PREFIX}_rerun_seconds_count {len(reruns)}")
+
+        lines += [
+            f"# HELP {METRIC_PREFIX}_stage_seconds Wall time of instrumented stages in recent reruns.",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds summary",
+        ]
+        for name, stats in summary.items():
+            label = _label(name)
+            lines.append(f'{METRIC_PREFIX}_stage_seconds{{stage="{label}",quantile="0.5"}} {stats["p50"]:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds{{stage="{label}",quantile="0.95"}} {stats["p95"]:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{label}"}} {stats["total"]:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{label}"}} {stats["calls"]}')
+
+        lines += [
+            f"# HELP {METRIC_PREFIX}_stage_errors Stages that raised in recent reruns.",
+            f"# TYPE {METRIC_PREFIX}_stage_errors gauge",
+        ]
+        for name, stats in summary.items():
+            lines.append(f'{METRIC_PREFIX}_stage_errors{{stage="{_label(name)}"}} {stats["errors"]}')
+
+        lines += [
+            f"# HELP {METRIC_PREFIX}_stage_allocated_blocks Net memory blocks allocated by stages in recent reruns.",
+            f"# TYPE {METRIC_PREFIX}_stage_allocated_blocks gauge",
+        ]
+        for name, stats in summary.items():
+            lines.append(
+                f'{METRIC_PREFIX}_stage_allocated_blocks{{stage="{_label(name)}"}} {stats["allocated_blocks"]}'
+            )
+
+        lines += [
+            f"# HELP {METRIC_PREFIX}_stage_cache_lookups Cache lookups made by stages in recent reruns.",
+            f"# TYPE {METRIC_PREFIX}_stage_cache_lookups gauge",
+        ]
+        for name, stats in summary.items():
+            for result, counts in (("hit", stats["cache_hits"]), ("miss", stats["cache_misses"])):
+                for cache, count in counts.items():
+                    lines.append(
+                        f'{METRIC_PREFIX}_stage_cache_lookups{{stage="{_label(name)}",cache="{_label(cache)}",'
+                        f'result="{result}"}} {count}'
+                    )
+
+        if memory_by_athlete:
+            lines += [
+                f"# HELP {METRIC_PREFIX}_athlete_memory_bytes Approximate bytes cached per athlete.",
+                f"# TYPE {METRIC_PREFIX}_athlete_memory_bytes gauge",
+            ]
+            for athlete, caches in memory_by_athlete.items():
+                for cache, size in caches.items():
+                    lines.append(
+                        f'{METRIC_PREFIX}_athlete_memory_bytes{{athlete="{_label(athlete)}",cache="{_label(cache)}"}} {size}'
+                    )
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@st.cache_resource
+def shared_profiler():
+    return Profiler()
+
+
+def profiled(func):
+    """Decorator profiling every call of a Streamlit script's entry point as one rerun."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        script_run_ctx = get_script_run_ctx()
+        with shared_profiler().rerun(script_run_ctx.session_id if script_run_ctx else None):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def stage(name):
+    """Times the enclosed block as a stage of the current rerun, if one is being profiled."""
+    profile = _current_rerun.get()
+    if profile is None:
+        yield None
+        return
+    parent = _current_stage.get()
+    timing = StageTiming(name, 0 if parent is None else parent.depth + 1)
+    token = _current_stage.set(timing)
+    blocks = sys.getallocatedblocks()
+    started = time.perf_counter()
+    try:
+        yield timing
+    except BaseException as e:
+        timing.error = type(e).__name__
+        raise
+    finally:
+        timing.seconds = time.perf_counter() - started
+        timing.allocated_blocks = sys.getallocatedblocks() - blocks
+        _current_stage.reset(token)
+        profile.add(timing)
+
+
+def timed(name=None):
+    """Decorator timing every call of a function as a stage; named `module.function` by default."""
+
+    def decorate(func):
+        stage_name = name or f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def count_cache(cache, hit):
+    """Counts a lookup in `cache` against the stage running in this context, if any."""
+    timing = _current_stage.get()
+    if timing is None:
+        return
+    counts = timing.cache_hits if hit else timing.cache_misses
+    counts[cache] = counts.get(cache, 0) + 1
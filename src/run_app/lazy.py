@@ -0,0 +1,26 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported when one of its attributes is first used.
+
+    Keeps heavy subsystems (the AI agent, the Mito spreadsheet, Bokeh, Parquet snapshots) off the
+    startup path of every visitor that never uses the feature they belong to.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._module = None
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            self._module = importlib.import_module(self.name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self):
+        return f"<LazyModule {self.name!r}{' (loaded)' if self.loaded else ''}>"
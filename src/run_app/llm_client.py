@@ -0,0 +1,154 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+
+import httpx
+import streamlit as st
+
+OPENAI_API_BASE_URL = "https://api.openai.com/v1"
+CONNECT_TIMEOUT_SECONDS = 10.0
+# Longest silence tolerated between two chunks of a stream.
+READ_TIMEOUT_SECONDS = 30.0
+# Longest a whole stream may take.
+STREAM_TIMEOUT_SECONDS = 300.0
+_DATA_PREFIX = b"data:"
+_DONE = b"[DONE]"
+_END = object()
+
+
+class SSEParser:
+    """
+    Incremental parser of a server-sent event byte stream.
+
+    Works on bytes: only `data:` lines are sliced out, so keep-alive comments and
+    blank separator lines are skipped without being decoded.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """Returns the payloads of the `data:` lines completed by `data`."""
+        self._buffer += data
+        end = self._buffer.rfind(b"\n")
+        if end == -1:
+            return []
+        lines = self._buffer[:end].split(b"\n")
+        del self._buffer[: end + 1]
+        return [bytes(line[len(_DATA_PREFIX) :].strip()) for line in lines if line.startswith(_DATA_PREFIX)]
+
+
+def delta_content(payload):
+    choices = json.loads(payload).get("choices") or [{}]
+    return choices[0].get("delta", {}).get("content")
+
+
+class ChatStreamClient:
+    """Streams chat completions over one pooled keep-alive connection, asynchronously."""
+
+    def __init__(self, base_url=OPENAI_API_BASE_URL, transport=None):
+        self.http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(READ_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=8),
+            transport=transport,
+        )
+
+    async def stream(self, api_key, messages, model, cancelled=None, timeout=STREAM_TIMEOUT_SECONDS, read_timeout=None):
+        """
+        Yields the content chunks of a streamed completion.
+
+        Stops early once `cancelled()` returns true. Raises `TimeoutError` when the stream
+        takes longer than `timeout` seconds, and `httpx.ReadTimeout` when no bytes arrive
+        for `read_timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        parser = SSEParser()
+        request_timeout = httpx.Timeout(read_timeout or READ_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS)
+        async with self.http.stream(
+            "POST",
+            "/chat/completions",
+            headers={"Authorization": f"Bearer {api_key}"},
+            json={"model": model, "messages": messages, "stream": True},
+            timeout=request_timeout,
+        ) as response:
+            response.raise_for_status()
+            done = False
+            # Decoded bytes: a gzip-compressed stream would reach the parser garbled from `aiter_raw`.
+            async for data in response.aiter_bytes():
+                if cancelled is not None and cancelled():
+                    return
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Completion stream took longer than {timeout:.0f}s")
+                # After [DONE] the rest of the body is still read, so the connection can be reused.
+                if done:
+                    continue
+                for payload in parser.feed(data):
+                    if payload == _DONE:
+                        done = True
+                        break
+                    content = delta_content(payload)
+                    if content:
+                        yield content
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+class ChatStreamer:
+    """
+    Runs a `ChatStreamClient` on a background event loop, so Streamlit scripts can
+    iterate its streams synchronously while every stream shares its connection pool.
+    """
+
+    def __init__(self, base_url=OPENAI_API_BASE_URL, transport=None):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-stream", daemon=True)
+        self._thread.start()
+        self.client = ChatStreamClient(base_url, transport)
+
+    def stream(self, api_key, messages, model, timeout=STREAM_TIMEOUT_SECONDS, read_timeout=None):
+        """
+        Iterates the content chunks of a streamed completion.
+
+        Closing the iterator early, e.g. when a rerun interrupts the script consuming it,
+        cancels the request and releases its connection.
+        """
+        chunks = queue.Queue()
+        cancel = threading.Event()
+
+        async def pump():
+            try:
+                async for chunk in self.client.stream(
+                    api_key, messages, model, cancelled=cancel.is_set, timeout=timeout, read_timeout=read_timeout
+                ):
+                    chunks.put(chunk)
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                chunks.put(_END)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._loop)
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is _END:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            cancel.set()
+            future.cancel()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+@st.cache_resource
+def shared_chat_streamer():
+    return ChatStreamer()
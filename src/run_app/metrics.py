@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+# Metres of flat running one metre of climbing is worth.
+ELEVATION_ADJUSTMENT_FACTOR = 11
+# Cardiac drift correction: 5% per hour of moving time, capped at 5%.
+CARDIAC_DRIFT_PER_HOUR = 0.05
+MIN_DRIFT_ADJUSTMENT = 0.95
+# Runs up to this distance (km) get their efficiency penalised by `decay`.
+SHORT_RUN_KM = 6
+
+
+def as_float_array(values):
+    """Returns values as a float64 ndarray, mapping missing values (None, pd.NA) to NaN."""
+    if isinstance(values, (pd.Series, pd.Index, pd.api.extensions.ExtensionArray)):
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.asarray(values, dtype=np.float64)
+
+
+def to_kilometers(distance_meters):
+    return as_float_array(distance_meters) / 1000
+
+
+def speed_to_pace(speed):
+    """
+    Pace in min/km encoded as `minutes.seconds`, e.g. 5:07 -> 5.07, seconds truncated.
+
+    A speed of 0 gives inf and a missing speed gives NaN.
+    """
+    speed = as_float_array(speed)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        seconds_per_kilometer = 1 / speed * 1000
+        minutes = np.floor(seconds_per_kilometer // 60)
+        seconds = np.floor(seconds_per_kilometer % 60)
+        pace = (minutes * 100 + seconds) / 100
+    return np.where(speed == 0, np.inf, pace)
+
+
+def adjusted_distance(distance, total_elevation_gain):
+    """Distance in km plus the flat-equivalent distance of the elevation gained."""
+    return as_float_array(distance) + ELEVATION_ADJUSTMENT_FACTOR * as_float_array(total_elevation_gain) / 1000
+
+
+def adjusted_speed(distance, moving_time_seconds):
+    """Speed in m/s over an (adjusted) distance in km."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return as_float_array(distance) / as_float_array(moving_time_seconds) * 1000
+
+
+def drift_adjusted_heartrate(average_heartrate, moving_time_seconds):
+    """Vectorised `plots.adjust_heart_rate_for_cardiac_drift`."""
+    adjustment = 1 - CARDIAC_DRIFT_PER_HOUR * (as_float_array(moving_time_seconds) / 3600)
+    adjustment = np.clip(adjustment, MIN_DRIFT_ADJUSTMENT, 1)
+    return as_float_array(average_heartrate) * adjustment
+
+
+def decay(distance):
+    distance = as_float_array(distance)
+    return np.where(distance <= SHORT_RUN_KM, 1 - 0.12 * (1 - distance / 8), 1)
+
+
+def heart_rate_efficiency(df: pd.DataFrame) -> dict:
+    """
+    Computes the heart rate efficiency columns for every run in one pass.
+
+    Returns a dict of column name -> ndarray, ready for `df.assign(**columns)`.
+    """
+    moving_time = as_float_array(df["moving_time_seconds"])
+    additional = ELEVATION_ADJUSTMENT_FACTOR * as_float_array(df["total_elevation_gain"])
+    adjusted = as_float_array(df["distance_km"]) + additional / 1000
+    speed = adjusted_speed(adjusted, moving_time)
+    heartrate = drift_adjusted_heartrate(df["average_heartrate"], moving_time)
+    run_decay = decay(df["distance_km"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        efficiency = (speed / heartrate) * run_decay
+
+    return {
+        "additional_distance": additional,
+        "adjusted_distance": adjusted,
+        "adjusted_speed": speed,
+        "adjusted_heartrate": heartrate,
+        "decay": run_decay,
+        "heart_rate_efficiency": efficiency,
+    }
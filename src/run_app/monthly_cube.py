@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+CUBE_COLUMNS = [
+    "month-year",
+    "runs",
+    "distance_km",
+    "pace",
+    "pace_min",
+    "pace_q1",
+    "pace_median",
+    "pace_q3",
+    "pace_max",
+    "average_heartrate",
+    "max_heartrate",
+]
+
+
+def month_key(dates: pd.Series) -> pd.Series:
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    return dates.dt.to_period("M")
+
+
+def months(df: pd.DataFrame) -> pd.Series:
+    """The month of every run, from the precomputed `month` column when the frame has one."""
+    if "month" in df.columns:
+        return df["month"]
+    return month_key(df["date"])
+
+
+def aggregate_months(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregates runs per calendar month in a single groupby, indexed by Period[M]."""
+    if df.empty:
+        return pd.DataFrame(columns=CUBE_COLUMNS, index=pd.PeriodIndex([], freq="M", name="month"))
+    grouped = df.groupby(months(df).rename("month"))
+    table = grouped.agg(
+        runs=("distance_km", "size"),
+        distance_km=("distance_km", "sum"),
+        pace=("pace", "mean"),
+        pace_min=("pace", "min"),
+        pace_max=("pace", "max"),
+        average_heartrate=("average_heartrate", "mean"),
+        max_heartrate=("max_heartrate", "max"),
+    )
+    quartiles = grouped["pace"].quantile([0.25, 0.5, 0.75]).unstack()
+    table["pace_q1"] = quartiles[0.25]
+    table["pace_median"] = quartiles[0.5]
+    table["pace_q3"] = quartiles[0.75]
+    table["month-year"] = table.index.strftime("%Y-%m")
+    return table[CUBE_COLUMNS]
+
+
+class MonthlyCube:
+    """
+    Per-month aggregates (distance, pace statistics, counts, heart rate) feeding every monthly chart.
+
+    `table` has one row per month with runs, indexed by Period[M] and ordered by month.
+    """
+
+    def __init__(self, table: pd.DataFrame, last_date):
+        self.table = table
+        self.last_date = last_date
+
+    @classmethod
+    def build(cls, df: pd.DataFrame):
+        table = aggregate_months(df)
+        return cls(table, df["date"].max() if not df.empty else None)
+
+    @classmethod
+    def updated(cls, cube, df: pd.DataFrame):
+        """
+        Returns a cube for `df`, re-aggregating only from the latest month of `cube` onwards.
+
+        `df` must be sorted by date. When the months before that differ from what `cube`
+        was built from (e.g. the filters changed), the whole cube is rebuilt.
+        """
+        if cube is None or cube.table.empty or df.empty:
+            return cls.build(df)
+
+        first_month = cube.table.index[-1]
+        ordinals = pd.PeriodIndex(months(df)).asi8
+        start = int(np.searchsorted(ordinals, first_month.ordinal, side="left"))
+        settled = cube.table[cube.table.index < first_month]
+        if start != settled["runs"].sum() or not np.isclose(
+            df["distance_km"].iloc[:start].sum(), settled["distance_km"].sum()
+        ):
+            return cls.build(df)
+
+        if df["date"].iloc[-1] == cube.last_date and len(df) == cube.table["runs"].sum():
+            return cube
+        table = pd.concat([settled, aggregate_months(df.iloc[start:])])
+        return cls(table, df["date"].iloc[-1])
@@ -1,8 +1,13 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-import plotly.figure_factory as ff
 import numpy as np
+import decoupling
+import instrumentation
+import metrics
+from derived_cache import cached
+from monthly_cube import MonthlyCube
+from training_load import TrainingLoad
 
 
 def plot_scatter_metrics_with_regression(df: pd.DataFrame, metrics: list):
@@ -48,6 +53,7 @@ def plot_scatter_metrics_with_regression(df: pd.DataFrame, metrics: list):
     st.markdown(f"**Correlation Coefficient between {metric_x} and {metric_y}:** {correlation:.2f}")
 
 
+@instrumentation.timed()
 def plot_distance_histogram(df):
     fig = go.Figure(
         data=[
@@ -78,113 +84,82 @@ def adjust_heart_rate_for_cardiac_drift(row):
     return row['average_heartrate'] * adjustment
 
 
-@st.cache_data
-def plot_heart_rate_efficiency(df: pd.DataFrame):
-    try:
-        df = df.dropna(subset=['distance_km', 'total_elevation_gain', 'moving_time_seconds', 'average_heartrate'])
-
-        ELEVATION_ADJUSTMENT_FACTOR = 11
-        df['additional_distance'] = ELEVATION_ADJUSTMENT_FACTOR * df['total_elevation_gain']
-        df['adjusted_distance'] = df['distance_km'] + df['additional_distance'] / 1000
-        df['adjusted_speed'] = df['adjusted_distance'] / df['moving_time_seconds'] * 1000
-        df['adjusted_heartrate'] = df.apply(adjust_heart_rate_for_cardiac_drift, axis=1)
-        df['decay'] = df['distance_km'].apply(lambda d: 1 - 0.12 * (1 - d / 8) if d <= 6 else 1)
-        df['heart_rate_efficiency'] = (df['adjusted_speed'] / df['adjusted_heartrate']) * df['decay']
-        customdata = df[
-            ["distance_km", "pace", "average_heartrate", "total_elevation_gain"]
-        ].values
-        hovertemplate = (
-            "<b>Date:</b> %{x}<br><b>Efficiency:</b> %{y:.2f}<br>"
-            "<b>Distance:</b> %{customdata[0]:.2f} km<br>"
-            "<b>Pace:</b> %{customdata[1]:.2f} min/km<br>"
-            "<b>Average Heartrate:</b> %{customdata[2]:.2f}<br>"
-            "<b>Elevation Gain:</b> %{customdata[3]:.2f} m<br>"
-            "<extra></extra>"  
-        )
-        # Regression Line Calculation
-        df['heart_rate_efficiency'] = pd.to_numeric(df['heart_rate_efficiency'], errors='coerce')
-        mask = pd.notna(df['heart_rate_efficiency'])  # Mask for non-NaN values
-        slope, intercept = np.polyfit(df[mask]['date'].astype(np.int64), df[mask]['heart_rate_efficiency'], 1)
-        df['regression_line'] = slope * df['date'].astype(np.int64) + intercept
+def heart_rate_efficiency_figure(df: pd.DataFrame, measured: pd.DataFrame = None) -> go.Figure:
+    df = df.dropna(subset=['distance_km', 'total_elevation_gain', 'moving_time_seconds', 'average_heartrate'])
 
-        # Plotting
-        fig = go.Figure(
-            data=[
-                go.Scatter(
-                    y=df['heart_rate_efficiency'] * 10,
-                    x=df['date'],
-                    mode='lines+markers',
-                    line=dict(color='rgba(60, 75, 255, 0.6)', width=2.5),
-                    marker=dict(color="rgba(137, 146, 255, 0.8)", size=8),
-                    customdata=customdata,
-                    hovertemplate=hovertemplate,
-                    name="Data",
-                ),
-                # Adding Regression Line
-                go.Scatter(
-                    y=df['regression_line'] * 10,
-                    x=df['date'],
-                    mode='lines',
-                    line=dict(color='rgba(231, 29, 54, 0.8)', width=1.5),
-                    name="Regression Line",
-                ),
-            ]
-        )
+    df = df.assign(**metrics.heart_rate_efficiency(df))
+    if measured is not None and not measured.empty:
+        # Efficiency factors measured from the per-second streams replace the heuristic where available.
+        df = df.join(measured[["efficiency_factor"]], on="id")
+        df['heart_rate_efficiency'] = df['efficiency_factor'].fillna(df['heart_rate_efficiency'])
+    customdata = df[["distance_km", "pace", "average_heartrate", "total_elevation_gain"]].to_numpy(
+        dtype=float, na_value=np.nan
+    )
+    hovertemplate = (
+        "<b>Date:</b> %{x}<br><b>Efficiency:</b> %{y:.2f}<br>"
+        "<b>Distance:</b> %{customdata[0]:.2f} km<br>"
+        "<b>Pace:</b> %{customdata[1]:.2f} min/km<br>"
+        "<b>Average Heartrate:</b> %{customdata[2]:.2f}<br>"
+        "<b>Elevation Gain:</b> %{customdata[3]:.2f} m<br>"
+        "<extra></extra>"
+    )
+    # Regression Line Calculation
+    df['heart_rate_efficiency'] = pd.to_numeric(df['heart_rate_efficiency'], errors='coerce')
+    mask = pd.notna(df['heart_rate_efficiency'])  # Mask for non-NaN values
+    slope, intercept = np.polyfit(df[mask]['date'].astype(np.int64), df[mask]['heart_rate_efficiency'], 1)
+    df['regression_line'] = slope * df['date'].astype(np.int64) + intercept
+
+    # Plotting
+    fig = go.Figure(
+        data=[
+            go.Scatter(
+                y=df['heart_rate_efficiency'] * 10,
+                x=df['date'],
+                mode='lines+markers',
+                line=dict(color='rgba(60, 75, 255, 0.6)', width=2.5),
+                marker=dict(color="rgba(137, 146, 255, 0.8)", size=8),
+                customdata=customdata,
+                hovertemplate=hovertemplate,
+                name="Data",
+            ),
+            # Adding Regression Line
+            go.Scatter(
+                y=df['regression_line'] * 10,
+                x=df['date'],
+                mode='lines',
+                line=dict(color='rgba(231, 29, 54, 0.8)', width=1.5),
+                name="Regression Line",
+            ),
+        ]
+    )
+
+    fig.update_layout(
+        title="Heart Rate Efficiency Over Time",
+        yaxis_title="Heart Rate Efficiency",
+        xaxis_title="Date",
+        plot_bgcolor="rgba(0,0,0,0)",
+        showlegend=False,
+    )
+
+    return fig
 
-        fig.update_layout(
-            title="Heart Rate Efficiency Over Time",
-            yaxis_title="Heart Rate Efficiency",
-            xaxis_title="Date",
-            plot_bgcolor="rgba(0,0,0,0)",
-            showlegend=False,
-        )
 
+@instrumentation.timed()
+def plot_heart_rate_efficiency(df: pd.DataFrame, key=None, measured: pd.DataFrame = None):
+    try:
+        name = ("heart_rate_efficiency_figure", decoupling.measurement_key(measured))
+        fig = cached(key, name, lambda: heart_rate_efficiency_figure(df, measured))
         st.plotly_chart(fig, use_container_width=True)
     except Exception as e:
         st.warning("A problem occured: " + str(e))
 
 
+@instrumentation.timed()
 def plot_fatigue_sport(df):
     try:
-        median_heartrate = df['average_heartrate'].replace('None', np.nan).dropna().median()
-        df['average_heartrate'].replace({"None": np.nan}, inplace=True)
-        df['average_heartrate'].fillna(median_heartrate, inplace=True)
-
-        df['HRPR'] = df['average_heartrate'] / df['average_speed_metres_per_second']
-
-        df['date'] = df['date'].dt.tz_localize(None)
-        df['week'] = df['date'].dt.to_period('W-MON')
-
-        df['days_since_last_workout'] = df['date'].diff().dt.days
-
-        weekly_data = (
-            df.groupby('week')
-            .agg({'distance_km': 'sum', 'max_heartrate': 'mean', 'HRPR': 'mean', 'days_since_last_workout': 'mean'})
-            .reset_index()
-        )
-
-        weekly_data.columns = ['week', 'Weekly Volume', 'Weekly Intensity', 'HRPR', 'Days Since Last']
-
-        weekly_data['Normalized HRPR'] = (weekly_data['HRPR'] - weekly_data['HRPR'].min()) / (
-            weekly_data['HRPR'].max() - weekly_data['HRPR'].min()
-        )
-        weekly_data['Normalized Volume'] = (weekly_data['Weekly Volume'] - weekly_data['Weekly Volume'].min()) / (
-            weekly_data['Weekly Volume'].max() - weekly_data['Weekly Volume'].min()
-        )
-        weekly_data['Normalized Intensity'] = (
-            weekly_data['Weekly Intensity'] - weekly_data['Weekly Intensity'].min()
-        ) / (weekly_data['Weekly Intensity'].max() - weekly_data['Weekly Intensity'].min())
-        DECAY_FACTOR = 0.7
-        weekly_data['Fatigue Adjustment'] = 1 - (weekly_data['Days Since Last'] * (1 - DECAY_FACTOR))
-        weekly_data['Fatigue'] = (
-            100
-            * weekly_data['Fatigue Adjustment']
-            * (weekly_data['Normalized HRPR'] +  weekly_data['Normalized Volume'] +  weekly_data['Normalized Intensity'])
-            / 3
-            + 10
-        )
-
-        current_fatigue = weekly_data['Fatigue'].iloc[-1]
+        load = TrainingLoad.updated(st.session_state.get("training_load"), df)
+        st.session_state["training_load"] = load
+        current_fatigue = load.current_fatigue
         fig = go.Figure(
             data=[
                 go.Pie(
@@ -233,9 +208,7 @@ def plot_selected_metrics(df: pd.DataFrame, metrics: list):
     st.plotly_chart(fig, use_container_width=True)
 
 
-@st.cache_data
-def plot_monthly_avg_pace(df: pd.DataFrame):
-    monthly_avg = df.groupby("month-year")["pace"].mean().reset_index()
+def monthly_avg_pace_figure(monthly_avg: pd.DataFrame) -> go.Figure:
     fig = go.Figure(
         data=[
             go.Bar(
@@ -250,12 +223,16 @@ def plot_monthly_avg_pace(df: pd.DataFrame):
         title="Average pace per Month",
         yaxis_title="Average pace",
     )
+    return fig
+
+
+@instrumentation.timed()
+def plot_monthly_avg_pace(cube: MonthlyCube, key=None):
+    fig = cached(key, "monthly_avg_pace_figure", lambda: monthly_avg_pace_figure(cube.table))
     st.plotly_chart(fig, use_container_width=True)
 
 
-@st.cache_data
-def plot_cumulative_kms_per_month(df: pd.DataFrame):
-    monthly_sum = df.groupby("month-year")["distance_km"].sum().reset_index()
+def cumulative_kms_figure(monthly_sum: pd.DataFrame) -> go.Figure:
     fig = go.Figure(
         data=[
             go.Bar(
@@ -272,33 +249,41 @@ def plot_cumulative_kms_per_month(df: pd.DataFrame):
         title="Total distance_meters per Month",
         yaxis_title="Total distance_meters",
     )
+    return fig
+
+
+@instrumentation.timed()
+def plot_cumulative_kms_per_month(cube: MonthlyCube, key=None):
+    fig = cached(key, "cumulative_kms_figure", lambda: cumulative_kms_figure(cube.table))
     st.plotly_chart(fig, use_container_width=True)
 
 
-def plot_pace_distribution(df):
-    df["YearMonth"] = df["date"].dt.strftime("%Y-%m")
-    fig = go.Figure()
-    months = sorted(df["YearMonth"].unique())
-    for month in months:
-        month_data = df[df["YearMonth"] == month]
-        fig.add_trace(
+def pace_distribution_figure(monthly: pd.DataFrame) -> go.Figure:
+    fig = go.Figure(
+        data=[
             go.Box(
-                y=month_data["pace"],
-                name=month,
+                x=monthly["month-year"],
+                lowerfence=monthly["pace_min"],
+                q1=monthly["pace_q1"],
+                median=monthly["pace_median"],
+                q3=monthly["pace_q3"],
+                upperfence=monthly["pace_max"],
                 boxpoints=False,
                 hoverinfo="y+name",
-                customdata=month_data["pace"],
                 showlegend=False,
                 line=dict(color="#f77f00"),
-                hovertemplate=(
-                    "Min: %{customdata.min}<br>" "Max: %{customdata.max}<br>" "Median: %{customdata.median}<br>"
-                ),
             )
-        )
+        ]
+    )
 
     fig.update_layout(
         title="Distribution of pace for Each Month",
         yaxis_title="pace (min/km)",
     )
+    return fig
+
 
+@instrumentation.timed()
+def plot_pace_distribution(cube: MonthlyCube, key=None):
+    fig = cached(key, "pace_distribution_figure", lambda: pace_distribution_figure(cube.table))
     st.plotly_chart(fig, use_container_width=True)
@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+PREFETCH_WORKERS = 4
+# A finished download is reused by every session of the athlete for this long.
+PREFETCH_REFRESH_SECONDS = 300
+# A failed download is retried no sooner than this.
+PREFETCH_RETRY_SECONDS = 30
+# How long a session waits for the first page before rendering.
+FIRST_PAGE_TIMEOUT_SECONDS = 10
+# How long a session waits for each further page before giving up on a stalled download.
+PAGE_TIMEOUT_SECONDS = 60
+
+
+class PrefetchJob:
+    """Progress of one athlete's background history download, shared by all of their sessions."""
+
+    def __init__(self, athlete_id):
+        self.athlete_id = athlete_id
+        self.pages = 0
+        self.activities = 0
+        # What the task made of each page as it landed, e.g. its preprocessed runs.
+        self.page_results = []
+        # Version of the athlete's stored history when the download started.
+        self.base_version = None
+        self.started = time.time()
+        self.finished = None
+        self.error = None
+        self.future = None
+        self._changed = threading.Condition()
+
+    def add_page(self, activities, result=None):
+        with self._changed:
+            self.page_results.append(result)
+            self.pages += 1
+            self.activities += len(activities)
+            self._changed.notify_all()
+
+    @property
+    def done(self):
+        return self.finished is not None
+
+    def wait_for_pages(self, pages, timeout=None):
+        """Blocks until `pages` pages have landed or the job has finished; returns the number of pages landed."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.pages >= pages or self.finished is not None, timeout)
+            return self.pages
+
+    def _finish(self, error=None):
+        with self._changed:
+            self.error = error
+            self.finished = time.time()
+            self._changed.notify_all()
+
+    def _expired(self, now):
+        if not self.done:
+            return False
+        return now - self.finished > (PREFETCH_RETRY_SECONDS if self.error else PREFETCH_REFRESH_SECONDS)
+
+
+@contextmanager
+def script_run_ctx(ctx):
+    """
+    Attaches a session's ScriptRunContext to the current pool thread for the enclosed
+    task only, so the next task the thread runs doesn't inherit another session's context.
+    """
+    thread = threading.current_thread()
+    previous = getattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+    setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, ctx)
+    try:
+        yield
+    finally:
+        setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, previous)
+
+
+class Prefetcher:
+    """
+    Thread pool shared across sessions that downloads and preprocesses athletes' histories.
+
+    At most one job runs per athlete: starting a download while one is running, or
+    shortly after one finished, returns the existing job instead.
+    """
+
+    def __init__(self, max_workers=PREFETCH_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def start(self, athlete_id, task):
+        """Runs `task(job)` in the background unless a current job for `athlete_id` exists; returns the job."""
+        with self._lock:
+            job = self._jobs.get(athlete_id)
+            if job is not None and not job._expired(time.time()):
+                return job
+            job = PrefetchJob(athlete_id)
+            # Let the worker use Streamlit's caches like the session that started it.
+            session_ctx = get_script_run_ctx()
+
+            def run():
+                with script_run_ctx(session_ctx):
+                    try:
+                        result = task(job)
+                    except Exception as e:
+                        job._finish(e)
+                        raise
+                job._finish()
+                return result
+
+            job.future = self._executor.submit(run)
+            self._jobs[athlete_id] = job
+            return job
@@ -0,0 +1,254 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from monthly_cube import aggregate_months
+from windows import ActivityWindows
+
+# Shortest run that counts towards the fastest-run record at each distance.
+RECORD_DISTANCES = {"5k": 5.0, "10k": 10.0, "half marathon": 21.0975, "marathon": 42.195}
+# The only columns the AI agent needs to answer questions the summary can't.
+AGENT_COLUMNS = [
+    "date",
+    "name",
+    "distance_km",
+    "pace",
+    "moving_time_seconds",
+    "total_elevation_gain",
+    "average_heartrate",
+    "max_heartrate",
+]
+CONTEXT_MONTHS = 12
+CONTEXT_WEEKS = 8
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
+
+
+def describe_run(run):
+    return (
+        f"{run['name']} on {run['date']:%Y-%m-%d}: {run['distance_km']:.2f} km at {run['pace']:.2f} min/km, "
+        f"{format_duration(run['moving_time_seconds'])}, {run['total_elevation_gain']:.0f} m elevation"
+        + (f", {run['average_heartrate']:.0f} bpm" if pd.notna(run['average_heartrate']) else "")
+    )
+
+
+def markdown_table(header, rows):
+    lines = ["| " + " | ".join(header) + " |", "|" + " --- |" * len(header)]
+    lines += ["| " + " | ".join(str(value) for value in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def agent_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """The runs with only the columns the AI agent needs, to keep its prompts small."""
+    return df[AGENT_COLUMNS].reset_index(drop=True)
+
+
+class RunSummary:
+    """
+    Precomputed totals, records, best efforts and monthly/weekly aggregates of a runs frame.
+
+    Answers common questions locally and serves as a compact context for the AI agent.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.windows = ActivityWindows(df)
+        self.totals = {
+            "runs": len(df),
+            "distance_km": float(df["distance_km"].sum()),
+            "moving_time_seconds": float(df["moving_time_seconds"].sum()),
+            "elevation_m": float(df["total_elevation_gain"].sum()),
+            "average_pace": float(df["pace"][np.isfinite(df["pace"])].mean()),
+            # NaN rather than pd.NA when no run has a heart rate, as the column is nullable.
+            "average_heartrate": float(df["average_heartrate"].astype("float64").mean()),
+            "first_run": df["date"].min(),
+            "last_run": df["date"].max(),
+        }
+        paced = df[np.isfinite(df["pace"]) & (df["pace"] > 0)]
+        self.records = {
+            "longest run": self._row(df, "distance_km", "max"),
+            "fastest run": self._row(paced, "pace", "min"),
+            "longest run by time": self._row(df, "moving_time_seconds", "max"),
+            "hilliest run": self._row(df, "total_elevation_gain", "max"),
+            "hardest run by heart rate": self._row(df, "average_heartrate", "max"),
+        }
+        self.best_efforts = {
+            name: self._row(paced[paced["distance_km"] >= distance], "pace", "min")
+            for name, distance in RECORD_DISTANCES.items()
+        }
+        self.monthly = aggregate_months(df)[["month-year", "runs", "distance_km", "pace", "average_heartrate"]]
+        dates = df["date"].dt.tz_localize(None) if df["date"].dt.tz is not None else df["date"]
+        self.weekly = df.groupby(dates.dt.to_period("W-SUN").rename("week")).agg(
+            runs=("distance_km", "size"), distance_km=("distance_km", "sum"), pace=("pace", "mean")
+        )
+
+    @staticmethod
+    def _row(df, column, how):
+        values = df[column].dropna()
+        if values.empty:
+            return None
+        return df.loc[values.idxmax() if how == "max" else values.idxmin()]
+
+    def context(self):
+        """The summary as compact markdown, for the AI agent's prompt."""
+        totals = self.totals
+        if not totals["runs"]:
+            return "No runs yet."
+        has_heartrate = not np.isnan(totals["average_heartrate"])
+        lines = [
+            f"Runs: {totals['runs']} from {totals['first_run']:%Y-%m-%d} to {totals['last_run']:%Y-%m-%d}, "
+            f"{totals['distance_km']:.1f} km, {format_duration(totals['moving_time_seconds'])} moving time, "
+            f"{totals['elevation_m']:.0f} m elevation, average pace {totals['average_pace']:.2f} min/km"
+            + (f", average heart rate {totals['average_heartrate']:.0f} bpm." if has_heartrate else "."),
+            "Records:",
+        ]
+        lines += [f"- {name}: {describe_run(run)}" for name, run in self.records.items() if run is not None]
+        lines += [
+            f"- fastest {name} or longer: {describe_run(run)}"
+            for name, run in self.best_efforts.items()
+            if run is not None
+        ]
+        lines.append(f"Last {CONTEXT_MONTHS} months (month, runs, km, average pace):")
+        lines += [
+            f"- {row['month-year']}: {row['runs']}, {row['distance_km']:.1f}, {row['pace']:.2f}"
+            for _, row in self.monthly.tail(CONTEXT_MONTHS).iterrows()
+        ]
+        lines.append(f"Last {CONTEXT_WEEKS} weeks (week ending, runs, km):")
+        lines += [
+            f"- {week.end_time:%Y-%m-%d}: {row['runs']}, {row['distance_km']:.1f}"
+            for week, row in self.weekly.tail(CONTEXT_WEEKS).iterrows()
+        ]
+        return "\n".join(lines)
+
+    def prompt(self, question):
+        return f"Summary of my running data:\n{self.context()}\n\nQuestion: {question}"
+
+
+def _record(name):
+    def answer(summary, match):
+        run = summary.records[name]
+        return f"Your {name}: {describe_run(run)}." if run is not None else None
+
+    return answer
+
+
+def _best_effort(summary, match):
+    name = {"5": "5k", "10": "10k", "half": "half marathon", "marathon": "marathon"}[match.group(1)]
+    run = summary.best_efforts[name]
+    if run is None:
+        return f"You haven't run a {name} yet."
+    return f"Your fastest run of {name} or longer: {describe_run(run)}."
+
+
+def _totals(summary, match):
+    totals = summary.totals
+    return (
+        f"You ran {totals['runs']} times and {totals['distance_km']:.1f} km in total "
+        f"({format_duration(totals['moving_time_seconds'])} moving time, {totals['elevation_m']:.0f} m elevation)."
+    )
+
+
+def _average_pace(summary, match):
+    return f"Your average pace is {summary.totals['average_pace']:.2f} min/km."
+
+
+def _average_heartrate(summary, match):
+    if np.isnan(summary.totals["average_heartrate"]):
+        return "None of your runs was recorded with a heart rate."
+    return f"Your average heart rate is {summary.totals['average_heartrate']:.0f} bpm."
+
+
+def _last_days(summary, match):
+    days = int(match.group(1))
+    metrics = summary.windows.last_days(days)
+    return (
+        f"In the last {days} days you ran {metrics['Total Records']} times and {metrics['Total Distance']:.1f} km "
+        f"at an average pace of {metrics['Average Pace']:.2f} min/km."
+    )
+
+
+def _monthly(summary, match):
+    monthly = summary.monthly.tail(CONTEXT_MONTHS)
+    return markdown_table(
+        ["Month", "Runs", "Distance (km)", "Average pace (min/km)"],
+        [
+            [row["month-year"], row["runs"], f"{row['distance_km']:.1f}", f"{row['pace']:.2f}"]
+            for _, row in monthly.iterrows()
+        ],
+    )
+
+
+def _weekly(summary, match):
+    weekly = summary.weekly.tail(CONTEXT_WEEKS)
+    return markdown_table(
+        ["Week ending", "Runs", "Distance (km)", "Average pace (min/km)"],
+        [
+            [f"{week.end_time:%Y-%m-%d}", row["runs"], f"{row['distance_km']:.1f}", f"{row['pace']:.2f}"]
+            for week, row in weekly.iterrows()
+        ],
+    )
+
+
+# Words that carry no meaning for the intents and are dropped from a question before matching.
+FILLER_WORDS = set(
+    "a an are can did do does give had has have i im in is ive me my of please show tell the was were what whats "
+    "which you".split()
+)
+RUN = r"(?:runs?|running|ran)"
+HEART_RATE = r"(?:heart ?rate|hr)"
+MEASURE = r"(?:distance|km|kilometers|mileage|runs|running|pace|stats|summary|totals?)"
+TOTAL = r"(?: (?:in total|total|altogether|overall|so far|ever|all time))?"
+# Each pattern must match the whole remaining question, so that any content word it doesn't
+# cover, e.g. a period, a unit or "times faster than", leaves the question to the agent.
+# Tried in order; the first match answers the question.
+INTENTS = [
+    (
+        re.compile(r"(?:fastest|best|quickest|pr|personal best) (5|10|half|marathon)(?: ?km?| marathon)?(?: race)?"),
+        _best_effort,
+    ),
+    (re.compile(rf"(?:longest|furthest|farthest) {RUN} by (?:time|duration)"), _record("longest run by time")),
+    (re.compile(rf"(?:longest|furthest|farthest) (?:{RUN}|distance)(?: ever| {RUN})?"), _record("longest run")),
+    (re.compile(rf"(?:fastest|quickest) {RUN}(?: ever)?"), _record("fastest run")),
+    (re.compile(rf"hilliest {RUN}|{RUN} with most (?:elevation|climbing)"), _record("hilliest run")),
+    (
+        re.compile(rf"{RUN} with highest(?: average)? {HEART_RATE}|highest(?: average)? {HEART_RATE} {RUN}"),
+        _record("hardest run by heart rate"),
+    ),
+    (
+        re.compile(rf"(?:how (?:far|much|many (?:runs|times|km|kilometers))(?: {RUN})? )?(?:last|past) (\d+) days"),
+        _last_days,
+    ),
+    (re.compile(rf"(?:how (?:far|much|many) )?(?:{MEASURE} )?(?:per|each|by) month|monthly(?: {MEASURE})?"), _monthly),
+    (re.compile(rf"(?:how (?:far|much|many) )?(?:{MEASURE} )?(?:per|each|by) week|weekly(?: {MEASURE})?"), _weekly),
+    (re.compile(rf"(?:average|avg|mean)(?: {RUN})? pace"), _average_pace),
+    (re.compile(rf"(?:average|avg|mean) {HEART_RATE}"), _average_heartrate),
+    (
+        re.compile(
+            rf"(?:how (?:many (?:runs|times|km|kilometers)|far|much)(?: {RUN})?"
+            rf"|totals?(?: (?:{RUN}|distance|km|kilometers|mileage))?){TOTAL}"
+        ),
+        _totals,
+    ),
+]
+
+
+def normalise(question):
+    """Lower-cases `question` and drops its punctuation and filler words."""
+    words = re.findall(r"[a-z0-9]+", question.lower().replace("'", "").replace("’", ""))
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+
+def answer(question, summary: RunSummary):
+    """Answers `question` from the summary if it matches a known intent, otherwise returns None."""
+    if summary.totals["runs"] == 0:
+        return None
+    question = normalise(question)
+    for pattern, respond in INTENTS:
+        match = pattern.fullmatch(question)
+        if match:
+            return respond(summary, match)
+    return None
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+import instrumentation
+from activity_store import DATA_DIR
+from singleflight import SingleFlight
+
+DEFAULT_CACHE_PATH = os.path.join(DATA_DIR, "llm_responses.sqlite3")
+RESPONSE_TTL_SECONDS = 7 * 24 * 3600
+RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+def normalize_question(question):
+    """Lower-cases the question and drops whitespace and punctuation differences that don't change its meaning."""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+def data_fingerprint(df: pd.DataFrame):
+    """Content hash of a frame, identical for identical data however it was loaded."""
+    digest = hashlib.sha256(",".join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def response_key(question, model, fingerprint=None):
+    payload = json.dumps([normalize_question(question), model, fingerprint])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of LLM responses, backed by SQLite.
+
+    Entries expire after `ttl_seconds`; beyond `max_bytes` of responses the least
+    recently used are evicted. Concurrent misses for the same key share one call.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=RESPONSE_TTL_SECONDS, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._flight = SingleFlight()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    used REAL NOT NULL
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def __len__(self):
+        with self._connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT response FROM responses WHERE key = ? AND created > ?", (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is not None:
+                connection.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+        instrumentation.count_cache("llm_response", row is not None)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        size = len(response.encode())
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, used) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now),
+            )
+            self._evict(connection, now)
+        return response
+
+    def _evict(self, connection, now):
+        connection.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl_seconds,))
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY used"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached response for `key`, or stores and returns `compute()`, computing it once at a time."""
+        response = self.get(key)
+        if response is not None:
+            return response
+
+        def compute_and_store():
+            # A call finishing between the lookup above and this one taking the lead may have stored it.
+            response = self.get(key)
+            return response if response is not None else self.put(key, compute())
+
+        return self._flight.do(key, compute_and_store)
+
+
+@st.cache_resource
+def shared_response_cache():
+    return ResponseCache()
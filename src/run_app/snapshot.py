@@ -0,0 +1,144 @@
+import functools
+import io
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+import lazy
+from activity_frame import RUNS_DTYPES
+from monthly_cube import month_key
+from activity_store import DATA_DIR
+
+# Only imported once a snapshot is written or read.
+pa = lazy.LazyModule("pyarrow")
+pc = lazy.LazyModule("pyarrow.compute")
+pq = lazy.LazyModule("pyarrow.parquet")
+
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots")
+SNAPSHOT_FORMAT_VERSION = 2
+_METADATA_KEY = b"run_app_snapshot"
+# Small row groups let date filters skip most of a long history; rows are sorted by date.
+ROW_GROUP_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=None)
+def snapshot_schema():
+    """The Arrow schema of a snapshot: `RUNS_DTYPES` without the month, which is derived from the date on reading."""
+    arrow_types = {
+        "datetime64[ns, UTC]": pa.timestamp("ns", tz="UTC"),
+        "category": pa.dictionary(pa.int32(), pa.string()),
+        "float32": pa.float32(),
+        "Int16": pa.int16(),
+        "Int32": pa.int32(),
+        "Int64": pa.int64(),
+    }
+    return pa.schema(
+        [pa.field(column, arrow_types[dtype]) for column, dtype in RUNS_DTYPES.items() if column != "month"]
+    )
+
+
+def _pandas_type(arrow_type):
+    return {pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype(), pa.int64(): pd.Int64Dtype()}.get(arrow_type)
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def write_snapshot(df: pd.DataFrame, where, **metadata):
+    """
+    Writes a processed runs frame as Parquet with the column types of `RUNS_DTYPES`.
+    `metadata`, e.g. the dataset version, is stored alongside.
+    """
+    schema = snapshot_schema()
+    frame = df[schema.names].sort_values("date")
+    table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+    info = {"format": SNAPSHOT_FORMAT_VERSION, **metadata}
+    table = table.replace_schema_metadata({**table.schema.metadata, _METADATA_KEY: json.dumps(info).encode()})
+    pq.write_table(table, where, compression="zstd", row_group_size=ROW_GROUP_SIZE)
+
+
+def snapshot_bytes(df: pd.DataFrame, **metadata):
+    buffer = io.BytesIO()
+    write_snapshot(df, buffer, **metadata)
+    return buffer.getvalue()
+
+
+def snapshot_metadata(source):
+    """The metadata a snapshot was written with; raises `SnapshotError` for other files."""
+    try:
+        metadata = pq.read_schema(source).metadata or {}
+    except (pa.ArrowInvalid, OSError) as e:
+        raise SnapshotError(f"Not a Parquet file: {e}") from e
+    if _METADATA_KEY not in metadata:
+        raise SnapshotError("Not an activity snapshot")
+    info = json.loads(metadata[_METADATA_KEY])
+    if info.get("format") != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format {info.get('format')}")
+    return info
+
+
+def utc_timestamp(value):
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp.tz_convert("UTC")
+
+
+def read_snapshot(source, columns=None, start=None, end=None):
+    """
+    Reads a snapshot back into a runs frame, sorted by date.
+
+    Only `columns` are read when given, and `start`/`end` (inclusive/exclusive) filter
+    by date while reading, so row groups outside the range are skipped.
+    """
+    snapshot_metadata(source)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    schema = snapshot_schema()
+    date_type = schema.field("date").type
+    filters = None
+    if start is not None:
+        filters = pc.field("date") >= pa.scalar(utc_timestamp(start), date_type)
+    if end is not None:
+        before_end = pc.field("date") < pa.scalar(utc_timestamp(end), date_type)
+        filters = before_end if filters is None else filters & before_end
+    stored = None
+    if columns is not None:
+        stored = [column for column in columns if column != "month"]
+        if "month" in columns and "date" not in stored:
+            stored.append("date")
+    table = pq.read_table(source, columns=stored, filters=filters, schema=schema)
+    df = table.to_pandas(types_mapper=_pandas_type)
+    if columns is None or "month" in columns:
+        df["month"] = month_key(df["date"])
+    df = df[list(RUNS_DTYPES) if columns is None else columns]
+    return df.astype({column: RUNS_DTYPES[column] for column in df.columns})
+
+
+def local_snapshot_path(athlete_id):
+    return os.path.join(SNAPSHOT_DIR, f"{athlete_id}.parquet")
+
+
+def save_local_snapshot(athlete_id, df: pd.DataFrame, version):
+    """Writes the athlete's runs frame for `version` of their dataset, replacing any older snapshot atomically."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=SNAPSHOT_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as f:
+            write_snapshot(df, f, athlete_id=athlete_id, version=list(version))
+        os.replace(temporary, local_snapshot_path(athlete_id))
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def load_local_snapshot(athlete_id, version):
+    """The athlete's runs frame from their local snapshot, or None if there is none for `version`."""
+    path = local_snapshot_path(athlete_id)
+    try:
+        if tuple(snapshot_metadata(path).get("version") or ()) != tuple(version):
+            return None
+    except SnapshotError:
+        return None
+    return read_snapshot(path)
@@ -1,13 +1,35 @@
 import base64
+import hashlib
+import hmac
+import json
 import arrow
 import httpx
 import streamlit as st
 import pandas as pd
 import os
-
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from streamlit.components.v1 import html
+from streamlit.web.server.websocket_headers import _get_websocket_headers
+import activity_frame
+from activity_cache import ActivityCache
+import derived_cache
+import instrumentation
+import lazy
+import metrics
+from activity_store import ActivityStore, dataset_version
+from monthly_cube import month_key
+from prefetch import Prefetcher
+from singleflight import SingleFlight
+from strava_client import StravaClient
+from streams import StreamStore
+from token_store import SESSION_TTL_SECONDS, TokenStore, expires_soon
 
 # import sweat
-from bokeh.models.widgets import Div
+# Only needed for the logout redirect.
+bokeh_widgets = lazy.LazyModule("bokeh.models.widgets")
+# Only needed once a synced history is loaded or saved as a snapshot.
+snapshot = lazy.LazyModule("snapshot")
 
 
 APP_URL = st.secrets["APP_URL"]
@@ -15,8 +37,19 @@ STRAVA_CLIENT_ID = st.secrets["STRAVA_CLIENT_ID"]
 STRAVA_CLIENT_SECRET = st.secrets["STRAVA_CLIENT_SECRET"]
 STRAVA_AUTHORIZATION_URL = "https://www.strava.com/oauth/authorize"
 STRAVA_API_BASE_URL = "https://www.strava.com/api/v3"
+STRAVA_TOKEN_URL = "https://www.strava.com/oauth/token"
 DEFAULT_ACTIVITY_LABEL = "NO_ACTIVITY_SELECTED"
 STRAVA_ORANGE = "#fc4c02"
+# Strava caps per_page at 200; the API default of 30 costs ~7x more round trips.
+ACTIVITIES_PER_PAGE = 200
+PAGE_FETCH_CONCURRENCY = 4
+# Page size of `/athlete/activities` when none is requested, as used by `get_activities`.
+STRAVA_DEFAULT_PER_PAGE = 30
+ACTIVITY_PAGE_TTL_SECONDS = 300
+# Session state key of the login session id, which never goes into the URL.
+SESSION_STATE_KEY = "strava_session_id"
+# Cookie keeping the signed session id across reloads, new tabs and server restarts.
+SESSION_COOKIE = "strava_session"
 
 
 @st.cache_data(show_spinner=False)
@@ -73,7 +106,7 @@ def login_header(header=None):
     )
 
 
-def logout_header(header=None):
+def logout_header(header=None, session_id=None):
     if header is None:
         base = st
     else:
@@ -81,9 +114,13 @@ def logout_header(header=None):
         base = button
 
     if base.button("Log out"):
+        if session_id is not None:
+            token_store().end_session(session_id)
+            st.session_state.pop(SESSION_STATE_KEY, None)
+        set_session_cookie(None)
         js = f"window.location.href = '{APP_URL}'"
-        html = f"<img src onerror=\"{js}\">"
-        div = Div(text=html)
+        redirect = f"<img src onerror=\"{js}\">"
+        div = bokeh_widgets.Div(text=redirect)
         st.bokeh_chart(div)
 
 
@@ -99,47 +136,153 @@ def logged_in_title(strava_auth, header=None):
     col.markdown(f"*Welcome, {first_name} {last_name}!*")
 
 
-@st.cache_data
-def exchange_authorization_code(authorization_code):
-    response = httpx.post(
-        url="https://www.strava.com/oauth/token",
+@st.cache_resource
+def token_store():
+    return TokenStore()
+
+
+@st.cache_resource
+def token_refreshes():
+    return SingleFlight()
+
+
+def request_tokens(**grant):
+    response = strava_client().post(
+        url=STRAVA_TOKEN_URL,
         json={
             "client_id": STRAVA_CLIENT_ID,
             "client_secret": STRAVA_CLIENT_SECRET,
-            "code": authorization_code,
-            "grant_type": "authorization_code",
+            **grant,
         },
     )
+
+    return response.json()
+
+
+def exchange_authorization_code(authorization_code):
     try:
-        response.raise_for_status()
-    except httpx.HTTPStatusError:
+        strava_auth = request_tokens(code=authorization_code, grant_type="authorization_code")
+    except httpx.HTTPError:
         st.error("Something went wrong while authenticating with Strava. Please reload and try again")
         st.experimental_set_query_params()
         st.stop()
         return
 
-    strava_auth = response.json()
+    token_store().save(strava_auth)
 
     return strava_auth
 
 
+def refresh_tokens(tokens):
+    athlete_id = tokens["athlete"]["id"]
+    # Another session or process may have refreshed them while this one waited.
+    current = token_store().load(athlete_id)
+    if current is not None and not expires_soon(current):
+        return current
+    refreshed = request_tokens(refresh_token=tokens["refresh_token"], grant_type="refresh_token")
+    return token_store().save(refreshed, athlete_id=athlete_id)
+
+
+def athlete_auth(athlete_id):
+    """The athlete's stored tokens, refreshed first if they are about to expire; None if there are none."""
+    tokens = token_store().load(athlete_id)
+    if tokens is None or not expires_soon(tokens):
+        return tokens
+    # Concurrent sessions share one refresh, as Strava may rotate the refresh token.
+    return token_refreshes().do(athlete_id, lambda: refresh_tokens(tokens))
+
+
+def session_auth(session_id):
+    """The tokens of the athlete logged in to `session_id`, or None if they need to log in again."""
+    athlete_id = token_store().session_athlete(session_id)
+    if athlete_id is None:
+        return None
+    try:
+        return athlete_auth(athlete_id)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code not in (400, 401):
+            raise
+        # The athlete revoked the app's access.
+        token_store().delete(athlete_id)
+        return None
+
+
+def sign_session_id(session_id):
+    signature = hmac.new(STRAVA_CLIENT_SECRET.encode(), session_id.encode(), hashlib.sha256).hexdigest()
+    return f"{session_id}.{signature}"
+
+
+def verify_session_cookie(value):
+    """The session id of a cookie value made by `sign_session_id`, or None if it was tampered with."""
+    session_id, _, _ = value.rpartition(".")
+    if session_id and hmac.compare_digest(sign_session_id(session_id), value):
+        return session_id
+    return None
+
+
+def session_cookie():
+    """The session id of the login cookie the browser sent when it connected, or None."""
+    morsel = SimpleCookie((_get_websocket_headers() or {}).get("Cookie", "")).get(SESSION_COOKIE)
+    return verify_session_cookie(morsel.value) if morsel is not None else None
+
+
+def set_session_cookie(session_id):
+    """Stores the signed `session_id` in the browser, or removes the cookie when it is None."""
+    if session_id is None:
+        value, max_age = "", 0
+    else:
+        value, max_age = sign_session_id(session_id), SESSION_TTL_SECONDS
+    secure = "; Secure" if APP_URL.startswith("https://") else ""
+    cookie = f"{SESSION_COOKIE}={value}; Max-Age={max_age}; Path=/; SameSite=Lax{secure}"
+    html(f"<script>window.parent.document.cookie = {json.dumps(cookie)};</script>", height=0)
+
+
 def authenticate(header=None, stop_if_unauthenticated=True):
+    """
+    Returns the logged-in athlete's tokens, or shows the login button.
+
+    The one-time authorization code is exchanged once and removed from the URL. The
+    session id it starts is kept in the Streamlit session state and in a signed cookie,
+    never in the URL, as anyone holding it is logged in as the athlete. The cookie is
+    checked against the stored sessions, so a reload or a server restart needs no new
+    login. Tokens are stored per athlete and refreshed as needed.
+    """
     query_params = st.experimental_get_query_params()
     authorization_code = query_params.get("code", [None])[0]
+    session_id = st.session_state.get(SESSION_STATE_KEY)
+    has_cookie = False
+    if session_id is None:
+        session_id = session_cookie()
+        has_cookie = session_id is not None
 
-    if authorization_code is None:
-        authorization_code = query_params.get("session", [None])[0]
+    strava_auth = None
+    try:
+        if authorization_code is not None:
+            strava_auth = exchange_authorization_code(authorization_code)
+            session_id = token_store().start_session(strava_auth["athlete"]["id"])
+            st.session_state[SESSION_STATE_KEY] = session_id
+            set_session_cookie(session_id)
+            st.experimental_set_query_params()
+        elif session_id is not None:
+            strava_auth = session_auth(session_id)
+    except httpx.HTTPError:
+        st.error("Something went wrong while authenticating with Strava. Please reload and try again")
+        st.stop()
+        return
 
-    if authorization_code is None:
+    if strava_auth is None:
+        st.session_state.pop(SESSION_STATE_KEY, None)
+        if has_cookie:
+            set_session_cookie(None)
         login_header(header=header)
         if stop_if_unauthenticated:
             st.stop()
         return
     else:
-        logout_header(header=header)
-        strava_auth = exchange_authorization_code(authorization_code)
+        st.session_state[SESSION_STATE_KEY] = session_id
+        logout_header(header=header, session_id=session_id)
+        prefetch_activities(strava_auth)
         logged_in_title(strava_auth, header)
-        st.experimental_set_query_params(session=authorization_code)
 
         return strava_auth
 
@@ -150,14 +293,49 @@ def header():
     return strava_button
 
 
-@st.cache_data
 def get_activities(auth, page=1):
-    access_token = auth["access_token"]
-    response = httpx.get(
-        url=f"{STRAVA_API_BASE_URL}/athlete/activities",
-        params={
-            "page": page,
-        },
+    """
+    One page of the athlete's activities, newest first, like `/athlete/activities`.
+
+    Served from the shared activity cache once the athlete's history has been synced;
+    until then the page is downloaded once per athlete, however many sessions ask.
+    """
+    athlete_id = auth["athlete"]["id"]
+    if activity_store().sync_cursor(athlete_id) is not None:
+        start = (page - 1) * STRAVA_DEFAULT_PER_PAGE
+        return athlete_activities(athlete_id)[start : start + STRAVA_DEFAULT_PER_PAGE]
+    return activity_page(athlete_id, page, auth["access_token"])
+
+
+@st.cache_data(ttl=ACTIVITY_PAGE_TTL_SECONDS, show_spinner=False)
+def activity_page(athlete_id, page, _access_token):
+    """Cached by athlete and page only, as the access token changes whenever it is refreshed."""
+    return page_downloads().do(
+        (athlete_id, page), lambda: fetch_activity_page(_access_token, page, per_page=STRAVA_DEFAULT_PER_PAGE)
+    )
+
+
+@st.cache_resource
+def page_downloads():
+    return SingleFlight()
+
+
+@st.cache_resource
+def strava_client():
+    """One pooled, rate-limit aware API client shared by all sessions of the process."""
+    return StravaClient(base_url=STRAVA_API_BASE_URL)
+
+
+def fetch_activity_page(access_token, page, per_page=ACTIVITIES_PER_PAGE, after=None):
+    params = {
+        "page": page,
+        "per_page": per_page,
+    }
+    if after is not None:
+        params["after"] = after
+    response = strava_client().get(
+        "/athlete/activities",
+        params=params,
         headers={
             "Authorization": f"Bearer {access_token}",
         },
@@ -166,6 +344,170 @@ def get_activities(auth, page=1):
     return response.json()
 
 
+def iter_activity_pages(access_token, per_page=ACTIVITIES_PER_PAGE, max_concurrency=PAGE_FETCH_CONCURRENCY, after=None):
+    """
+    Yields every non-empty activity page in order, probing `max_concurrency` pages ahead at a time.
+    With `after` (epoch seconds) only activities started later than that are requested.
+
+    Stops at the first empty (or short) page. The first page is fetched on its own,
+    so small or incremental syncs cost one request.
+    """
+    activities = fetch_activity_page(access_token, 1, per_page, after)
+    if not activities:
+        return
+    yield activities
+    if len(activities) < per_page:
+        return
+
+    first_page = 2
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        while True:
+            batch = range(first_page, first_page + max_concurrency)
+            results = executor.map(lambda page: fetch_activity_page(access_token, page, per_page, after), batch)
+            for activities in results:
+                if not activities:
+                    return
+                yield activities
+                if len(activities) < per_page:
+                    return
+            first_page += max_concurrency
+
+
+@st.cache_resource
+def activity_store():
+    return ActivityStore()
+
+
+@st.cache_resource
+def activity_cache():
+    return ActivityCache(lambda athlete_id: activity_store().load(athlete_id))
+
+
+def memory_by_athlete():
+    """Approximate bytes held per athlete by the shared activity cache and the derived cache."""
+    report = {}
+    for cache, usage in (
+        ("activities", activity_cache().bytes_by_athlete()),
+        ("derived", derived_cache.shared_cache().bytes_by_athlete()),
+    ):
+        for athlete_id, size in usage.items():
+            report.setdefault(athlete_id, {"activities": 0, "derived": 0})[cache] = size
+    return report
+
+
+def athlete_activities(athlete_id):
+    """The athlete's stored activities, newest first, shared by all sessions of the process."""
+    return activity_cache().get(athlete_id)
+
+
+def sync_activity_history(auth, on_page=None):
+    """
+    Brings the athlete's local activity store up to date, storing every page as it lands.
+
+    Once a sync has completed, only activities newer than its cursor are fetched, so
+    returning athletes usually cost a single small request instead of the whole history.
+    `on_page(activities)` is called after each stored page.
+    """
+    store = activity_store()
+    athlete_id = auth["athlete"]["id"]
+    after = store.sync_cursor(athlete_id)
+    for activities in iter_activity_pages(auth["access_token"], after=after):
+        store.upsert(athlete_id, activities)
+        activity_cache().invalidate(athlete_id)
+        if on_page is not None:
+            on_page(activities)
+    store.set_sync_cursor(athlete_id, store.latest_start_timestamp(athlete_id) or 0)
+
+
+@st.cache_resource
+def activity_prefetcher():
+    return Prefetcher()
+
+
+def prefetch_activities(auth):
+    """
+    Starts downloading and preprocessing the athlete's history in the background, or
+    returns the job already doing so. Pages are stored as they land, so sessions can
+    render what has been loaded while the rest is still on its way.
+    """
+    athlete_id = auth["athlete"]["id"]
+
+    def task(job):
+        def on_page(activities):
+            # Preprocessed once here, so sessions render progress without reprocessing the stored history.
+            job.add_page(activities, load_strava_data(dataframe_from_activities(activities)))
+
+        job.base_version = activity_store().dataset_version(athlete_id)
+        sync_activity_history(auth, on_page=on_page)
+        runs_frame(athlete_id)
+        return athlete_activities(athlete_id)
+
+    return activity_prefetcher().start(athlete_id, task)
+
+
+@instrumentation.timed()
+def runs_frame(athlete_id, version=None):
+    """
+    The athlete's preprocessed runs for `version` of their stored dataset (by default the
+    current one), memoised in the shared derived cache and in a local snapshot, so a
+    restarted process reads them back instead of decoding and preprocessing the history.
+    """
+    if version is None:
+        version = activity_store().dataset_version(athlete_id)
+    key = derived_cache.cache_key(athlete_id, version)
+    return derived_cache.cached(key, "runs", lambda: load_runs_frame(athlete_id, version))
+
+
+def sync_version(job, pages):
+    """Dataset version of the history a running sync has delivered after `pages` pages."""
+    return ("sync", job.started, pages)
+
+
+def progressive_runs_frame(athlete_id, job, pages):
+    """
+    The athlete's runs while `job` is still syncing: those stored before it started plus
+    the runs of its first `pages` pages. Every page is preprocessed once as it lands, so
+    redrawing after each page doesn't decode and preprocess the whole stored history again.
+    """
+
+    def build():
+        base_version = job.base_version or activity_store().dataset_version(athlete_id)
+        frames = [runs_frame(athlete_id, base_version)] if base_version[0] else []
+        frames += [runs for runs in job.page_results[:pages] if runs is not None]
+        if not frames:
+            return load_strava_data(dataframe_from_activities([]))
+        df = pd.concat(frames, ignore_index=True).drop_duplicates("id", keep="last")
+        # Concatenated categoricals with different categories fall back to object.
+        return activity_frame.compact_runs(df.sort_values("date", kind="stable"))
+
+    return derived_cache.cached(derived_cache.cache_key(athlete_id, sync_version(job, pages)), "runs", build)
+
+
+def load_runs_frame(athlete_id, version):
+    df = snapshot.load_local_snapshot(athlete_id, version)
+    if df is not None:
+        return df
+    activities = athlete_activities(athlete_id)
+    df = load_strava_data(dataframe_from_activities(activities))
+    loaded_version = dataset_version(activities)
+    # Activities newer than the sync cursor were stored by a sync that is still running,
+    # and their snapshot would be superseded by its next page.
+    cursor = activity_store().sync_cursor(athlete_id)
+    if cursor is not None and loaded_version[1] <= cursor:
+        snapshot.save_local_snapshot(athlete_id, df, loaded_version)
+    return df
+
+
+@st.cache_resource
+def stream_store():
+    return StreamStore()
+
+
+def sync_streams(auth, activity_ids):
+    """Downloads the per-second streams of the given activities that are not stored locally yet."""
+    return stream_store().sync(strava_client(), auth["access_token"], auth["athlete"]["id"], activity_ids)
+
+
 def activity_label(activity):
     if activity["name"] == DEFAULT_ACTIVITY_LABEL:
         return ""
@@ -216,86 +558,22 @@ def select_strava_activity(auth):
 def dataframe_from_strava(auth, page=1):
     activities = get_activities(auth, page)
 
-    # Initialize empty lists for each column
-    dates = []
-    names = []
-    sport_types = []
-    distances = []
-    moving_times = []
-    elapsed_times = []
-    total_elevation_gains = []
-    average_speeds = []
-    max_speeds = []
-    average_cadences = []
-    average_watts_list = []
-    average_heartrates = []
-    max_heartrates = []
-    elev_highs = []
-    elev_lows = []
-    suffer_scores = []
-
-    for activity in activities:
-        dates.append(activity.get("start_date_local", None))
-        names.append(activity.get("name", None))
-        sport_types.append(activity.get("type", None))
-        distances.append(activity.get("distance", None))
-        moving_times.append(activity.get("moving_time", None))
-        elapsed_times.append(activity.get("elapsed_time", None))
-        total_elevation_gains.append(activity.get("total_elevation_gain", None))
-        average_speeds.append(activity.get("average_speed", None))
-        max_speeds.append(activity.get("max_speed", None))
-        average_cadences.append(activity.get("average_cadence", None))
-        average_watts_list.append(activity.get("average_watts", None))
-        average_heartrates.append(activity.get("average_heartrate", None))
-        max_heartrates.append(activity.get("max_heartrate", None))
-        elev_highs.append(activity.get("elev_high", None))
-        elev_lows.append(activity.get("elev_low", None))
-        suffer_scores.append(activity.get("suffer_score", None))
-
-    # Create a dictionary to convert to a DataFrame
-    data = {
-        "date": dates,
-        "name": names,
-        "type": sport_types,
-        "distance_meters": distances,
-        "moving_time_seconds": moving_times,
-        "elapsed_time seconds": elapsed_times,
-        "total_elevation_gain": total_elevation_gains,
-        "average_speed_metres_per_second": average_speeds,
-        "max_speed_metres_per_second": max_speeds,
-        "average_cadence": average_cadences,
-        "average_watts": average_watts_list,
-        "average_heartrate": average_heartrates,
-        "max_heartrate": max_heartrates,
-        "elev_high_meters": elev_highs,
-        "elev_low_meters": elev_lows,
-        "suffer_score": suffer_scores,
-    }
-
-    # Create a DataFrame
-    return pd.DataFrame(data)
-
+    return dataframe_from_activities(activities)
 
-def speed_to_pace(speed):
-    if speed == 0:
-        return "inf"
-    seconds_per_meter = 1 / speed
-    seconds_per_kilometer = seconds_per_meter * 1000
-    minutes = int(seconds_per_kilometer // 60)
-    seconds = int(seconds_per_kilometer % 60)
 
-    return float(f"{minutes}.{seconds:02}")
+def dataframe_from_activities(activities):
+    return activity_frame.frame_from_pages([activities])
 
 
-@st.cache_data
+@instrumentation.timed()
 def load_strava_data(data: pd.DataFrame) -> pd.DataFrame:
     """Loads and preprocesses running data."""
     data = data.copy()
     data = data[data['type'] == "Run"]
     data["date"] = pd.to_datetime(data["date"], errors='coerce')
     data = data.dropna(subset=['date'])
-    data["month-year"] = data["date"].dt.strftime("%Y-%m")
-    data["distance_km"] = data["distance_meters"].apply(lambda x: x / 1000)
-    data.loc[:, "pace"] = data["average_speed_metres_per_second"].apply(speed_to_pace)
     data = data[data["date"] >= "2023-01-01"]
-    return data.sort_values(by="date")
+    data["month"] = month_key(data["date"])
+    data["distance_km"] = metrics.to_kilometers(data["distance_meters"])
+    data["pace"] = metrics.speed_to_pace(data["average_speed_metres_per_second"])
+    return activity_frame.compact_runs(data.sort_values(by="date"))
@@ -0,0 +1,182 @@
+import random
+import re
+import threading
+import time
+from collections import deque
+
+import httpx
+import numpy as np
+
+STRAVA_API_BASE_URL = "https://www.strava.com/api/v3"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+# Strava's short-term limit resets every 15 minutes on the quarter hour, the daily one at midnight UTC.
+RATE_LIMIT_WINDOW_SECONDS = 15 * 60
+DAILY_WINDOW_SECONDS = 24 * 3600
+# Above this share of the short-term limit, requests are spread over the rest of the window.
+THROTTLE_THRESHOLD = 0.8
+# Pacing never holds a worker longer than this per request; the quota then runs out and fails fast.
+MAX_THROTTLE_SECONDS = 5.0
+# A server asking to wait longer than this before a retry fails the request instead.
+MAX_RETRY_AFTER_SECONDS = 30.0
+LATENCY_SAMPLES = 1000
+
+
+class RateLimitExceeded(httpx.HTTPError):
+    """Raised instead of sending a request once the app's 15-minute or daily Strava quota is used up."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Strava rate limit reached, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def seconds_until_window_reset(now=None, window=RATE_LIMIT_WINDOW_SECONDS):
+    now = time.time() if now is None else now
+    return window - now % window
+
+
+class RateLimiter:
+    """Tracks the `X-RateLimit-*` headers of the latest response and paces requests accordingly."""
+
+    def __init__(self):
+        self.limit = None
+        self.usage = None
+        self.window_end = 0.0
+        self.daily_limit = None
+        self.daily_usage = None
+        self.day_end = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, headers):
+        limits = headers.get("X-RateLimit-Limit")
+        usages = headers.get("X-RateLimit-Usage")
+        if not limits or not usages:
+            return
+        limits, usages = limits.split(","), usages.split(",")
+        now = time.time()
+        with self._lock:
+            self.limit = int(limits[0])
+            self.usage = int(usages[0])
+            self.window_end = now + seconds_until_window_reset(now)
+            if len(limits) > 1 and len(usages) > 1:
+                self.daily_limit = int(limits[1])
+                self.daily_usage = int(usages[1])
+                self.day_end = now + seconds_until_window_reset(now, DAILY_WINDOW_SECONDS)
+
+    def delay(self):
+        """Seconds to wait before the next request; raises when either quota is exhausted."""
+        with self._lock:
+            now = time.time()
+            if self.daily_limit is not None:
+                if self.day_end <= now:
+                    self.daily_limit = self.daily_usage = None
+                elif self.daily_usage >= self.daily_limit:
+                    raise RateLimitExceeded(self.day_end - now)
+                else:
+                    self.daily_usage += 1
+            if self.limit is None:
+                return 0.0
+            remaining_time = self.window_end - now
+            if remaining_time <= 0:
+                self.limit = self.usage = None
+                return 0.0
+            remaining_requests = self.limit - self.usage
+            if remaining_requests <= 0:
+                raise RateLimitExceeded(remaining_time)
+            if self.usage < THROTTLE_THRESHOLD * self.limit:
+                return 0.0
+            self.usage += 1
+            return min(remaining_time / remaining_requests, MAX_THROTTLE_SECONDS)
+
+
+def backoff(attempt, retry_after=None):
+    """
+    Exponential backoff with full jitter. A server-sent Retry-After in seconds is
+    returned as given, however long; HTTP dates fall back to the jittered backoff.
+    """
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt))
+
+
+class StravaClient:
+    """
+    Process-wide Strava API client.
+
+    Reuses one keep-alive connection pool, retries
+    429/5xx responses and transport errors with jittered exponential backoff, paces
+    requests by the rate-limit headers and records the latency of every request.
+    """
+
+    def __init__(self, base_url=STRAVA_API_BASE_URL, transport=None, sleep=time.sleep):
+        self.http = httpx.Client(
+            base_url=base_url,
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            transport=transport,
+        )
+        self.rate_limiter = RateLimiter()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._sleep = sleep
+
+    def request(self, method, url, **kwargs):
+        for attempt in range(MAX_ATTEMPTS):
+            self._sleep(self.rate_limiter.delay())
+            started = time.perf_counter()
+            try:
+                response = self.http.request(method, url, **kwargs)
+            except httpx.TransportError:
+                self._record(method, url, None, started, attempt)
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+                self._sleep(backoff(attempt))
+                continue
+
+            self._record(method, url, response.status_code, started, attempt)
+            self.rate_limiter.update(response.headers)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_ATTEMPTS - 1:
+                break
+            wait = backoff(attempt, response.headers.get("Retry-After"))
+            if wait > MAX_RETRY_AFTER_SECONDS:
+                break
+            self._sleep(wait)
+
+        response.raise_for_status()
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def _record(self, method, url, status_code, started, attempt):
+        self.latencies.append(
+            {
+                "method": method,
+                "endpoint": re.sub(r"/\d+", "/{id}", str(url).split("?")[0]),
+                "status": status_code,
+                "attempt": attempt,
+                "seconds": time.perf_counter() - started,
+            }
+        )
+
+    def latency_summary(self):
+        """Request count, error count and p50/p95/max latency in seconds per endpoint."""
+        by_endpoint = {}
+        for sample in list(self.latencies):
+            by_endpoint.setdefault((sample["method"], sample["endpoint"]), []).append(sample)
+        summary = {}
+        for (method, endpoint), samples in by_endpoint.items():
+            seconds = np.array([sample["seconds"] for sample in samples])
+            summary[f"{method} {endpoint}"] = {
+                "requests": len(samples),
+                "errors": sum(sample["status"] is None or sample["status"] >= 400 for sample in samples),
+                "p50": float(np.percentile(seconds, 50)),
+                "p95": float(np.percentile(seconds, 95)),
+                "max": float(seconds.max()),
+            }
+        return summary
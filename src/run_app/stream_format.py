@@ -0,0 +1,133 @@
+import re
+
+WRAP_WIDTH = 140
+_WHITESPACE = re.compile(r"\s+")
+
+
+class StreamFormatter:
+    """
+    Incrementally wraps streamed markdown text, keeping tables intact.
+
+    Text is fed chunk by chunk and only the new tail is looked at, so formatting a
+    whole response is linear in its length. Lines starting with `|` are table rows
+    and passed through verbatim; other lines are flowed into paragraphs wrapped at
+    `width` (greedily, so finished output lines never change), and blank lines end
+    paragraphs. `feed` and `close` return the newly finished output as a delta.
+    """
+
+    def __init__(self, width=WRAP_WIDTH, detect_tables=True):
+        self.width = width
+        self.detect_tables = detect_tables
+        self._line_start = True  # Nothing but whitespace seen on the current input line.
+        self._in_table_row = False
+        self._row = []  # Parts of the table row being read.
+        self._blank_lines = 0  # Consecutive empty input lines, to detect paragraph breaks.
+        self._output_line = ""  # Wrapped output line being filled.
+        self._word = ""  # Word cut off by the end of the last chunk.
+        self._has_output = False
+
+    @property
+    def tail(self):
+        """The unfinished end of the output, for previews."""
+        return (self._output_line + " " + self._word).strip()
+
+    def feed(self, chunk):
+        delta = []
+        position = 0
+        while position < len(chunk):
+            newline = chunk.find("\n", position)
+            end = len(chunk) if newline == -1 else newline
+            self._feed_line_part(chunk[position:end], delta)
+            if newline == -1:
+                break
+            self._end_line(delta)
+            position = newline + 1
+        return "".join(delta)
+
+    def close(self):
+        delta = []
+        if self._in_table_row:
+            self._end_line(delta)
+        self._flush_word(delta)
+        if self._output_line:
+            delta.append(self._output_line)
+            self._output_line = ""
+        return "".join(delta)
+
+    def _feed_line_part(self, text, delta):
+        if self._line_start:
+            stripped = text.lstrip()
+            if not stripped:
+                return
+            self._line_start = False
+            if self.detect_tables and stripped.startswith("|"):
+                self._flush_word(delta)
+                self._end_output_line(delta)
+                if self._blank_lines and self._has_output:
+                    delta.append("\n")
+                self._in_table_row = True
+                self._has_output = True
+            elif self._blank_lines and self._has_output:
+                # A blank line ended the paragraph.
+                self._flush_word(delta)
+                self._end_output_line(delta)
+                delta.append("\n")
+            self._blank_lines = 0
+            text = stripped
+        if self._in_table_row:
+            self._row.append(text)
+        else:
+            self._flow(text, delta)
+
+    def _end_line(self, delta):
+        if self._in_table_row:
+            delta.append("".join(self._row).rstrip() + "\n")
+            self._row = []
+            self._in_table_row = False
+        elif self._line_start:
+            self._blank_lines += 1
+        else:
+            # Within a paragraph a line break is just a word separator.
+            self._flush_word(delta)
+        self._line_start = True
+
+    def _flow(self, text, delta):
+        words = _WHITESPACE.split(self._word + text)
+        # The last part is a word cut off by the end of the chunk, or "" after whitespace.
+        self._word = words.pop()
+        for word in words:
+            if word:
+                self._add_word(word, delta)
+
+    def _flush_word(self, delta):
+        if self._word:
+            self._add_word(self._word, delta)
+            self._word = ""
+
+    def _add_word(self, word, delta):
+        self._has_output = True
+        if self._output_line and len(self._output_line) + 1 + len(word) <= self.width:
+            self._output_line += " " + word
+            return
+        self._end_output_line(delta)
+        while len(word) > self.width:
+            delta.append(word[: self.width] + "\n")
+            word = word[self.width :]
+        self._output_line = word
+
+    def _end_output_line(self, delta):
+        if self._output_line:
+            delta.append(self._output_line + "\n")
+            self._output_line = ""
+
+
+def format_stream(chunks, width=WRAP_WIDTH, detect_tables=True):
+    """Yields the formatted deltas of a stream of text chunks."""
+    formatter = StreamFormatter(width, detect_tables)
+    for chunk in chunks:
+        delta = formatter.feed(chunk)
+        if delta:
+            yield delta
+    delta = formatter.close()
+    if delta:
+        yield delta
@@ -0,0 +1,161 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+
+from activity_store import DATA_DIR
+
+STREAMS_DIR = os.path.join(DATA_DIR, "streams")
+STREAM_FETCH_CONCURRENCY = 4
+# Written after every channel of a save, so an interrupted save doesn't count as stored.
+COMPLETE_MARKER = ".complete"
+# Compact on-disk dtype of every Strava stream channel. Sensor channels can drop out
+# mid-activity, which Strava reports as null samples, so they are stored as float32 with NaN.
+STREAM_DTYPES = {
+    "time": np.int32,
+    "distance": np.float32,
+    "latlng": np.float32,
+    "altitude": np.float32,
+    "velocity_smooth": np.float32,
+    "heartrate": np.float32,
+    "cadence": np.float32,
+    "watts": np.float32,
+    "temp": np.float32,
+    "moving": np.bool_,
+    "grade_smooth": np.float32,
+}
+
+
+def channel_array(channel, data):
+    """The samples of a stream channel as an ndarray of its dtype, with null samples as NaN (False for `moving`)."""
+    if channel == "latlng":
+        data = [(np.nan, np.nan) if point is None else point for point in data]
+    return np.asarray(data, dtype=STREAM_DTYPES[channel])
+
+
+def fetch_activity_streams(client, access_token, activity_id, channels=tuple(STREAM_DTYPES)):
+    """Fetches the per-second streams of one activity as {channel: ndarray}; {} if it has none."""
+    try:
+        response = client.get(
+            f"/activities/{activity_id}/streams",
+            params={"keys": ",".join(channels), "key_by_type": "true"},
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            return {}
+        raise
+    payload = response.json()
+    return {
+        channel: channel_array(channel, stream["data"])
+        for channel, stream in payload.items()
+        if channel in STREAM_DTYPES
+    }
+
+
+def stream_version(directory):
+    """Latest modification time (ns) of the stream channels in `directory`, 0 if it has none."""
+    if not os.path.isdir(directory):
+        return 0
+    return max((entry.stat().st_mtime_ns for entry in os.scandir(directory) if entry.name.endswith(".npy")), default=0)
+
+
+class ActivityStreams:
+    """
+    Lazily memory-mapped streams of one activity.
+
+    Channels are only mapped when first accessed and slicing them returns views
+    into the mapped file, so nothing is read into RAM until the values are used.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._channels = {}
+
+    @property
+    def channels(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[: -len(".npy")] for name in os.listdir(self.directory) if name.endswith(".npy"))
+
+    def __contains__(self, channel):
+        return os.path.exists(os.path.join(self.directory, f"{channel}.npy"))
+
+    def __getitem__(self, channel):
+        if channel not in self._channels:
+            path = os.path.join(self.directory, f"{channel}.npy")
+            if not os.path.exists(path):
+                raise KeyError(channel)
+            self._channels[channel] = np.load(path, mmap_mode="r")
+        return self._channels[channel]
+
+    def get(self, channel, default=None):
+        try:
+            return self[channel]
+        except KeyError:
+            return default
+
+    def window(self, start_seconds, end_seconds):
+        """Index slice covering `start_seconds <= time < end_seconds`, for zero-copy slicing of every channel."""
+        time = self["time"]
+        return slice(
+            int(np.searchsorted(time, start_seconds, side="left")),
+            int(np.searchsorted(time, end_seconds, side="left")),
+        )
+
+
+class StreamStore:
+    """Stores activity streams as one `.npy` file per activity per channel under `root/<athlete_id>/<activity_id>/`."""
+
+    def __init__(self, root=STREAMS_DIR):
+        self.root = root
+
+    def _directory(self, athlete_id, activity_id):
+        return os.path.join(self.root, str(athlete_id), str(activity_id))
+
+    def has(self, athlete_id, activity_id):
+        """Whether every channel of the activity's last save was written."""
+        return os.path.exists(os.path.join(self._directory(athlete_id, activity_id), COMPLETE_MARKER))
+
+    def save(self, athlete_id, activity_id, streams):
+        directory = self._directory(athlete_id, activity_id)
+        os.makedirs(directory, exist_ok=True)
+        marker = os.path.join(directory, COMPLETE_MARKER)
+        if os.path.exists(marker):
+            os.remove(marker)
+        for channel, values in streams.items():
+            # Write to a temporary file first so readers never map a half-written channel.
+            descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(descriptor, "wb") as f:
+                np.save(f, np.asarray(values, dtype=STREAM_DTYPES.get(channel)))
+            os.replace(temporary_path, os.path.join(directory, f"{channel}.npy"))
+        for name in os.listdir(directory):
+            if name.endswith(".npy") and name[: -len(".npy")] not in streams:
+                os.remove(os.path.join(directory, name))
+        open(marker, "w").close()
+
+    def load(self, athlete_id, activity_id):
+        return ActivityStreams(self._directory(athlete_id, activity_id))
+
+    def version(self, athlete_id, activity_id):
+        """Changes whenever the activity's streams are saved again; 0 for an activity without streams."""
+        return stream_version(self._directory(athlete_id, activity_id))
+
+    def sync(self, client, access_token, athlete_id, activity_ids, max_concurrency=STREAM_FETCH_CONCURRENCY):
+        """
+        Fetches and stores the streams of every activity not stored yet, `max_concurrency` at a time.
+
+        Activities without streams are stored without channels so they are not fetched again;
+        interrupted saves are fetched again.
+        Returns the ids that were fetched.
+        """
+        missing = [activity_id for activity_id in activity_ids if not self.has(athlete_id, activity_id)]
+
+        def fetch_and_save(activity_id):
+            self.save(athlete_id, activity_id, fetch_activity_streams(client, access_token, activity_id))
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            list(executor.map(fetch_and_save, missing))
+        return missing
@@ -0,0 +1,133 @@
+import json
+import os
+import secrets
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from activity_store import DATA_DIR
+
+DEFAULT_TOKEN_STORE_PATH = os.path.join(DATA_DIR, "tokens.sqlite3")
+# Access tokens are refreshed this long before they expire, so none runs out mid-sync.
+TOKEN_REFRESH_MARGIN_SECONDS = 30 * 60
+# Session ids are kept in a browser cookie for this long; older rows are purged.
+SESSION_TTL_SECONDS = 30 * 24 * 3600
+
+
+def expires_soon(tokens, now=None, margin=TOKEN_REFRESH_MARGIN_SECONDS):
+    return tokens["expires_at"] - margin <= (time.time() if now is None else now)
+
+
+class TokenStore:
+    """
+    Persistent per-athlete store of Strava OAuth tokens, backed by SQLite.
+
+    Browser sessions are identified by an opaque random id that maps to an athlete. It
+    is a bearer credential, so callers keep it out of the URL.
+    """
+
+    def __init__(self, path=DEFAULT_TOKEN_STORE_PATH, session_ttl_seconds=SESSION_TTL_SECONDS):
+        self.path = path
+        self.session_ttl_seconds = session_ttl_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tokens (
+                    athlete_id INTEGER PRIMARY KEY,
+                    access_token TEXT NOT NULL,
+                    refresh_token TEXT NOT NULL,
+                    expires_at INTEGER NOT NULL,
+                    athlete TEXT NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY,
+                    athlete_id INTEGER NOT NULL,
+                    created REAL NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def save(self, tokens, athlete=None, athlete_id=None):
+        """
+        Stores a token response of the Strava OAuth endpoint. Refresh responses carry no
+        athlete, so for those the athlete stored under `athlete_id` is kept unless given.
+        Raises `KeyError` when neither names a known athlete.
+        """
+        athlete = athlete or tokens.get("athlete")
+        if athlete is None:
+            previous = self.load(athlete_id) if athlete_id is not None else None
+            if previous is None:
+                raise KeyError(f"No athlete stored for tokens of athlete {athlete_id}")
+            athlete = previous["athlete"]
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO tokens (athlete_id, access_token, refresh_token, expires_at, athlete) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    athlete["id"],
+                    tokens["access_token"],
+                    tokens["refresh_token"],
+                    tokens["expires_at"],
+                    json.dumps(athlete),
+                ),
+            )
+        return self.load(athlete["id"])
+
+    def load(self, athlete_id):
+        """The athlete's tokens in the shape of the OAuth token response, or None."""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT access_token, refresh_token, expires_at, athlete FROM tokens WHERE athlete_id = ?",
+                (athlete_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        access_token, refresh_token, expires_at, athlete = row
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "expires_at": expires_at,
+            "athlete": json.loads(athlete),
+        }
+
+    def delete(self, athlete_id):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM tokens WHERE athlete_id = ?", (athlete_id,))
+            connection.execute("DELETE FROM sessions WHERE athlete_id = ?", (athlete_id,))
+
+    def start_session(self, athlete_id):
+        session_id = secrets.token_urlsafe(32)
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("DELETE FROM sessions WHERE created < ?", (now - self.session_ttl_seconds,))
+            connection.execute(
+                "INSERT INTO sessions (id, athlete_id, created) VALUES (?, ?, ?)", (session_id, athlete_id, now)
+            )
+        return session_id
+
+    def session_athlete(self, session_id):
+        """The athlete id of a live session, or None."""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT athlete_id FROM sessions WHERE id = ? AND created > ?",
+                (session_id, time.time() - self.session_ttl_seconds),
+            ).fetchone()
+        return row[0] if row else None
+
+    def end_session(self, session_id):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
@@ -0,0 +1,207 @@
+import bisect
+import math
+
+import numpy as np
+import pandas as pd
+
+DECAY_FACTOR = 0.7
+# Weeks end on Monday, like `Series.dt.to_period('W-MON')`.
+WEEK_END_WEEKDAY = 0
+METRICS = ("volume", "intensity", "hrpr")
+# Kept as running min/max; HRPR bounds depend on the median heart rate and are found on read.
+RUNNING_METRICS = ("volume", "intensity")
+
+
+def week_end(date):
+    """The Monday closing the W-MON week of `date`."""
+    day = date.normalize()
+    return day + pd.Timedelta(days=(WEEK_END_WEEKDAY - day.weekday()) % 7)
+
+
+def _is_missing(value):
+    return value is None or value is pd.NA or (isinstance(value, (float, np.floating)) and math.isnan(value))
+
+
+class _Week:
+    __slots__ = (
+        "end",
+        "volume",
+        "max_hr_sum",
+        "max_hr_count",
+        "hrpr_sum",
+        "hrpr_count",
+        "inverse_speed_sum",
+        "inverse_speed_count",
+        "gap_sum",
+        "gap_count",
+    )
+
+    def __init__(self, end):
+        self.end = end
+        self.volume = 0.0
+        self.max_hr_sum = 0.0
+        self.max_hr_count = 0
+        self.hrpr_sum = 0.0
+        self.hrpr_count = 0
+        # 1 / speed of the runs without a heart rate, whose HRPR uses the median heart rate.
+        self.inverse_speed_sum = 0.0
+        self.inverse_speed_count = 0
+        self.gap_sum = 0.0
+        self.gap_count = 0
+
+    def hrpr(self, median_heartrate):
+        total, count = self.hrpr_sum, self.hrpr_count
+        if not math.isnan(median_heartrate):
+            total += median_heartrate * self.inverse_speed_sum
+            count += self.inverse_speed_count
+        return total / count if count else math.nan
+
+    def values(self, median_heartrate):
+        return {
+            "volume": self.volume,
+            "intensity": self.max_hr_sum / self.max_hr_count if self.max_hr_count else math.nan,
+            "hrpr": self.hrpr(median_heartrate),
+            "days_since_last": self.gap_sum / self.gap_count if self.gap_count else math.nan,
+        }
+
+
+class TrainingLoad:
+    """
+    Weekly training load, updated per activity without revisiting the history.
+
+    Keeps the running aggregates of each week plus running min/max of the weekly
+    volume and intensity (mean max heart rate) of all closed weeks. Activities must
+    be added in chronological order.
+
+    Follows the formula `plots.plot_fatigue_sport` used, including HRPR (heart rate /
+    speed) filling missing heart rates with the median of all runs, with two changes:
+    a metric with no spread or no value in a week adds 0 to the score instead of
+    making it NaN, and runs without a speed are left out of HRPR instead of making
+    it infinite.
+    """
+
+    def __init__(self):
+        self.first_date = None
+        self.last_date = None
+        self._weeks = []
+        self._current = None
+        self._heartrates = []
+        self._minimum = dict.fromkeys(RUNNING_METRICS, math.inf)
+        self._maximum = dict.fromkeys(RUNNING_METRICS, -math.inf)
+
+    def add(self, date, distance_km, max_heartrate=None, average_heartrate=None, average_speed=None):
+        end = week_end(date)
+        if self._current is None or end != self._current.end:
+            self._close_week()
+            self._current = _Week(end)
+        week = self._current
+
+        week.volume += 0.0 if _is_missing(distance_km) else float(distance_km)
+        if not _is_missing(max_heartrate):
+            week.max_hr_sum += float(max_heartrate)
+            week.max_hr_count += 1
+        has_speed = not _is_missing(average_speed) and average_speed
+        if not _is_missing(average_heartrate):
+            bisect.insort(self._heartrates, float(average_heartrate))
+            if has_speed:
+                week.hrpr_sum += float(average_heartrate) / float(average_speed)
+                week.hrpr_count += 1
+        elif has_speed:
+            week.inverse_speed_sum += 1 / float(average_speed)
+            week.inverse_speed_count += 1
+        if self.last_date is not None:
+            week.gap_sum += (date - self.last_date).days
+            week.gap_count += 1
+        else:
+            self.first_date = date
+        self.last_date = date
+
+    @property
+    def median_heartrate(self):
+        count = len(self._heartrates)
+        if not count:
+            return math.nan
+        middle = count // 2
+        return self._heartrates[middle] if count % 2 else (self._heartrates[middle - 1] + self._heartrates[middle]) / 2
+
+    def _close_week(self):
+        if self._current is None:
+            return
+        values = self._current.values(math.nan)
+        for metric in RUNNING_METRICS:
+            if not math.isnan(values[metric]):
+                self._minimum[metric] = min(self._minimum[metric], values[metric])
+                self._maximum[metric] = max(self._maximum[metric], values[metric])
+        self._weeks.append(self._current)
+        self._current = None
+
+    def extend(self, df: pd.DataFrame):
+        """Adds the activities of `df` that are newer than the last one seen. `df` is not modified."""
+        dates = df["date"]
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+        new = df.assign(date=dates).sort_values("date")
+        if self.last_date is not None:
+            new = new[new["date"] > self.last_date]
+        for row in new[
+            ["date", "distance_km", "max_heartrate", "average_heartrate", "average_speed_metres_per_second"]
+        ].itertuples(index=False):
+            self.add(*row)
+        return self
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame):
+        return cls().extend(df)
+
+    @classmethod
+    def updated(cls, load, df: pd.DataFrame):
+        """
+        Returns `load` brought up to date with `df`, only ingesting the new activities.
+
+        Starts over when there is no previous state or `df` reaches further back than it.
+        """
+        if load is None or load.first_date is None or df.empty or df["date"].min().tz_localize(None) < load.first_date:
+            return cls.from_frame(df)
+        return load.extend(df)
+
+    def _bounds(self, median_heartrate):
+        minimum, maximum = dict(self._minimum), dict(self._maximum)
+        if self._current is not None:
+            values = self._current.values(median_heartrate)
+            for metric in RUNNING_METRICS:
+                if not math.isnan(values[metric]):
+                    minimum[metric] = min(minimum[metric], values[metric])
+                    maximum[metric] = max(maximum[metric], values[metric])
+        weeks = self._weeks + ([self._current] if self._current is not None else [])
+        hrprs = [hrpr for hrpr in (week.hrpr(median_heartrate) for week in weeks) if not math.isnan(hrpr)]
+        minimum["hrpr"], maximum["hrpr"] = (min(hrprs), max(hrprs)) if hrprs else (math.inf, -math.inf)
+        return minimum, maximum
+
+    @staticmethod
+    def _fatigue(values, minimum, maximum):
+        normalized = []
+        for metric in METRICS:
+            spread = maximum[metric] - minimum[metric]
+            normalized.append((values[metric] - minimum[metric]) / spread if spread > 0 else 0.0)
+        days_since_last = 0.0 if math.isnan(values["days_since_last"]) else values["days_since_last"]
+        adjustment = 1 - days_since_last * (1 - DECAY_FACTOR)
+        return 100 * adjustment * np.nansum(normalized) / 3 + 10
+
+    @property
+    def current_fatigue(self):
+        if self._current is None:
+            return math.nan
+        median_heartrate = self.median_heartrate
+        minimum, maximum = self._bounds(median_heartrate)
+        return self._fatigue(self._current.values(median_heartrate), minimum, maximum)
+
+    def weekly(self) -> pd.DataFrame:
+        """The fatigue time series, one row per week, normalised over the whole history."""
+        weeks = self._weeks + ([self._current] if self._current is not None else [])
+        median_heartrate = self.median_heartrate
+        minimum, maximum = self._bounds(median_heartrate)
+        rows = []
+        for week in weeks:
+            values = week.values(median_heartrate)
+            rows.append({"week": week.end, **values, "fatigue": self._fatigue(values, minimum, maximum)})
+        return pd.DataFrame(rows, columns=["week", "volume", "intensity", "hrpr", "days_since_last", "fatigue"])
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+COMPARISON_WINDOWS = [7, 30, 60, 90, 365]
+
+
+class ActivityWindows:
+    """
+    Date-sorted prefix sums over a runs frame, answering any date-window metric in O(log n).
+
+    A window `(start, end]` is resolved with two `searchsorted` calls and a subtraction
+    of the cumulative run count, distance and pace columns.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        df = df.sort_values("date")
+        dates = df["date"]
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+        self.dates = dates.to_numpy(dtype="datetime64[ns]")
+        distance = df["distance_km"].to_numpy(dtype=np.float64, na_value=np.nan)
+        pace = df["pace"].to_numpy(dtype=np.float64, na_value=np.nan)
+        has_pace = ~np.isnan(pace)
+        self.cumulative_distance = np.concatenate([[0.0], np.cumsum(np.nan_to_num(distance))])
+        self.cumulative_pace = np.concatenate([[0.0], np.cumsum(np.where(has_pace, pace, 0.0))])
+        self.cumulative_paced_runs = np.concatenate([[0], np.cumsum(has_pace)])
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def end_date(self):
+        return pd.Timestamp(self.dates[-1]) if len(self.dates) else None
+
+    def _position(self, date):
+        date = pd.Timestamp(date).tz_localize(None)
+        return int(np.searchsorted(self.dates, np.datetime64(date, "ns"), side="right"))
+
+    def _metrics(self, first, last):
+        paced_runs = self.cumulative_paced_runs[last] - self.cumulative_paced_runs[first]
+        pace_sum = self.cumulative_pace[last] - self.cumulative_pace[first]
+        return {
+            "Total Records": last - first,
+            "Total Distance": round(self.cumulative_distance[last] - self.cumulative_distance[first], 2),
+            "Average Pace": round(pace_sum / paced_runs, 2) if paced_runs else np.nan,
+        }
+
+    def window(self, start, end):
+        """Metrics of the runs with `start < date <= end`."""
+        return self._metrics(self._position(start), self._position(end))
+
+    def last_days(self, days, offset_days=0):
+        """Metrics of the `days` days ending `offset_days` days before the latest run."""
+        if not len(self.dates):
+            return self._metrics(0, 0)
+        end = self.end_date - pd.Timedelta(days=offset_days)
+        return self.window(end - pd.Timedelta(days=days), end)
+
+    def all_time(self):
+        return self._metrics(0, len(self.dates))
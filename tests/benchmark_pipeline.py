@@ -0,0 +1,238 @@
+"""
+Benchmarks the data pipeline and plot builders on synthetic athlete histories.
+
+Every stage runs with Streamlit's rendering calls replaced by no-op stubs and with the
+derived caches bypassed, so the timings are the cold cost of the computation alone.
+
+    python tests/benchmark_pipeline.py --sizes 100 1000 10000 50000 --output report.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+try:
+    from tests.synthetic_activities import generate_activities
+except ImportError:  # Run as a script, with tests/ on sys.path.
+    from synthetic_activities import generate_activities
+
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+DEFAULT_REPEAT = 3
+
+
+class _Block:
+    """Stands in for the containers st.columns/st.empty return."""
+
+    def __init__(self, stub):
+        self._stub = stub
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._stub, name)
+
+
+class FakeStreamlit:
+    """No-op replacements for the Streamlit calls the benchmarked stages make, counting each call."""
+
+    def __init__(self):
+        self.calls = {}
+        self.session_state = {}
+
+    def _record(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _render(self, name):
+        def render(*args, **kwargs):
+            self._record(name)
+
+        return render
+
+    def columns(self, spec, *args, **kwargs):
+        self._record("columns")
+        return [_Block(self) for _ in range(spec if isinstance(spec, int) else len(spec))]
+
+    def empty(self):
+        self._record("empty")
+        return _Block(self)
+
+    def container(self):
+        return _Block(self)
+
+    def select_slider(self, label, options=(), value=None, **kwargs):
+        self._record("select_slider")
+        return value if value is not None else list(options)[0]
+
+    def selectbox(self, label, options=(), index=0, **kwargs):
+        self._record("selectbox")
+        return list(options)[index]
+
+    def multiselect(self, label, options=(), default=None, **kwargs):
+        self._record("multiselect")
+        return list(default or [])
+
+    def slider(self, label, min_value=None, max_value=None, value=None, **kwargs):
+        self._record("slider")
+        return value
+
+    def patches(self):
+        patched = {"columns": self.columns, "empty": self.empty, "container": self.container}
+        patched.update(
+            select_slider=self.select_slider,
+            selectbox=self.selectbox,
+            multiselect=self.multiselect,
+            slider=self.slider,
+            session_state=self.session_state,
+        )
+        for name in ("plotly_chart", "metric", "markdown", "subheader", "warning", "error", "write"):
+            patched[name] = self._render(name)
+        return patched
+
+
+@contextmanager
+def fake_streamlit():
+    fake = FakeStreamlit()
+    originals = {}
+    for name, replacement in fake.patches().items():
+        originals[name] = getattr(st, name)
+        setattr(st, name, replacement)
+    try:
+        yield fake
+    finally:
+        for name, original in originals.items():
+            setattr(st, name, original)
+
+
+def pipeline_stages(activities):
+    """The benchmarked stages in pipeline order, as (name, function of the previous results)."""
+    import app
+    import plots
+    import strava
+    from monthly_cube import MonthlyCube
+    from quick_answers import RunSummary
+    from windows import ActivityWindows
+
+    return [
+        ("dataframe_from_activities", lambda r: strava.dataframe_from_activities(activities)),
+        ("load_strava_data", lambda r: strava.load_strava_data(r["dataframe_from_activities"])),
+        ("filter_runs", lambda r: app.filter_runs(r["load_strava_data"], 10.0, 0.0)),
+        ("activity_windows", lambda r: ActivityWindows(r["filter_runs"])),
+        ("monthly_cube", lambda r: MonthlyCube.build(r["filter_runs"])),
+        ("run_summary", lambda r: RunSummary(r["filter_runs"])),
+        (
+            "activity_heatmap",
+            lambda r: app.activity_heatmap(
+                r["load_strava_data"], sorted(r["load_strava_data"]["date"].dt.year.unique())
+            ),
+        ),
+        (
+            "display_comparison_metrics",
+            lambda r: app.display_comparison_metrics(r["activity_windows"], r["load_strava_data"]),
+        ),
+        ("plot_cumulative_kms_per_month", lambda r: plots.plot_cumulative_kms_per_month(r["monthly_cube"])),
+        ("plot_monthly_avg_pace", lambda r: plots.plot_monthly_avg_pace(r["monthly_cube"])),
+        ("plot_pace_distribution", lambda r: plots.plot_pace_distribution(r["monthly_cube"])),
+        ("plot_heart_rate_efficiency", lambda r: plots.plot_heart_rate_efficiency(r["filter_runs"])),
+        ("plot_distance_histogram", lambda r: plots.plot_distance_histogram(r["filter_runs"])),
+    ]
+
+
+def run_stages(activities, repeat=DEFAULT_REPEAT):
+    """Times each stage `repeat` times, then measures its peak memory in one traced run."""
+    results, report = {}, []
+    for name, stage in pipeline_stages(activities):
+        timings = []
+        for _ in range(repeat):
+            with fake_streamlit():
+                started = time.perf_counter()
+                result = stage(results)
+                timings.append(time.perf_counter() - started)
+        with fake_streamlit() as fake:
+            tracemalloc.start()
+            stage(results)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        results[name] = result
+        report.append(
+            {
+                "stage": name,
+                "min_seconds": min(timings),
+                "median_seconds": statistics.median(timings),
+                "peak_bytes": peak,
+                # Memory held by the frames a stage returns, e.g. the runs frame kept per athlete.
+                "result_bytes": int(result.memory_usage(deep=True).sum()) if isinstance(result, pd.DataFrame) else None,
+                "streamlit_calls": fake.calls,
+            }
+        )
+    return report
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, timeout=10
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT, seed=0):
+    """Benchmarks every stage for each history size; returns a JSON-serialisable report."""
+    runs = []
+    for size in sizes:
+        activities = generate_activities(size, seed=seed)
+        runs.append({"activities": size, "stages": run_stages(activities, repeat)})
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "repeat": repeat,
+        "seed": seed,
+        "runs": runs,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, args.repeat, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    for run in report["runs"]:
+        for stage in run["stages"]:
+            print(
+                f"{run['activities']:>7} {stage['stage']:<30} {stage['median_seconds'] * 1000:>10.1f} ms "
+                f"{stage['peak_bytes'] / 2**20:>8.1f} MiB",
+                file=sys.stderr,
+            )
+
+
+if __name__ == "__main__":
+    import conftest  # noqa: F401  Puts the app on sys.path and provides st.secrets.
+
+    main()
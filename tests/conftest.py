@@ -0,0 +1,49 @@
+import copy
+import functools
+import os
+import sys
+import tempfile
+
+import pytest
+import streamlit as st
+from streamlit.runtime.secrets import Secrets
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "run_app")
+sys.path.insert(0, APP_DIR)
+
+# The app modules read their configuration from st.secrets at import time.
+_secrets_path = os.path.join(tempfile.mkdtemp(), "secrets.toml")
+with open(_secrets_path, "w") as f:
+    f.write('APP_URL = "http://localhost:8501"\n')
+    f.write('STRAVA_CLIENT_ID = "client-id"\n')
+    f.write('STRAVA_CLIENT_SECRET = "client-secret"\n')
+    f.write('gpt4_key = "gpt4-key"\n')
+st.secrets = Secrets([_secrets_path])
+
+# Default synthetic history of the `activities` and `runs` fixtures, as (count, seed).
+HISTORY = (1500, 0)
+
+
+@functools.lru_cache(maxsize=None)
+def _history(count, seed):
+    import strava
+    from tests.synthetic_activities import generate_activities
+
+    activities = generate_activities(count, seed=seed)
+    return activities, strava.load_strava_data(strava.dataframe_from_activities(activities))
+
+
+@pytest.fixture
+def activities(request):
+    """
+    Activity summaries of a synthetic history.
+
+    Parametrize indirectly with `(count, seed)` for another history than `HISTORY`.
+    """
+    return copy.deepcopy(_history(*getattr(request, "param", HISTORY))[0])
+
+
+@pytest.fixture
+def runs(request):
+    """Processed runs frame of a synthetic history, parametrized like `activities`."""
+    return _history(*getattr(request, "param", HISTORY))[1].copy()
@@ -0,0 +1,79 @@
+"""Synthetic Strava activity summaries, shaped like the `/athlete/activities` API response."""
+import numpy as np
+import pandas as pd
+
+END_DATE = pd.Timestamp("2025-12-31T18:00:00")
+# History length is capped so that large histories pack several activities a day.
+MAX_HISTORY_DAYS = 10 * 365
+SPORTS = {
+    # type: (share, median distance m, speed m/s range)
+    "Run": (0.7, 9000, (2.2, 4.2)),
+    "Ride": (0.15, 35000, (5.0, 9.0)),
+    "Walk": (0.08, 5000, (1.1, 1.6)),
+    "Swim": (0.04, 2000, (0.6, 1.0)),
+    "WeightTraining": (0.03, 0, (0.0, 0.0)),
+}
+# Share of activities missing each optional field, e.g. recorded without a heart rate strap.
+FIELD_GAPS = {
+    "heartrate": 0.25,
+    "cadence": 0.3,
+    "watts": 0.85,
+    "suffer_score": 0.3,
+    "elevation": 0.1,
+}
+
+
+def generate_activities(count, seed=0, end_date=END_DATE):
+    """Returns `count` activity summaries, newest first, with realistic field gaps."""
+    rng = np.random.default_rng(seed)
+    types = list(SPORTS)
+    kinds = rng.choice(len(types), size=count, p=[SPORTS[sport][0] for sport in types])
+    mean_gap_hours = min(36.0, MAX_HISTORY_DAYS * 24 / max(count, 1))
+    starts = end_date - pd.to_timedelta(np.cumsum(rng.exponential(mean_gap_hours, count)), unit="h")
+    utc_offsets = rng.choice([0, 1, 2], size=count)
+    gaps = {field: rng.random(count) < share for field, share in FIELD_GAPS.items()}
+
+    activities = []
+    for i in range(count):
+        sport = types[kinds[i]]
+        _, median_distance, (slowest, fastest) = SPORTS[sport]
+        distance = float(rng.lognormal(np.log(median_distance), 0.45)) if median_distance else 0.0
+        speed = float(rng.uniform(slowest, fastest))
+        moving_time = int(distance / speed) if speed else int(rng.uniform(1800, 4500))
+        start_local = starts[i].round("s")
+        activity = {
+            "resource_state": 2,
+            "athlete": {"id": 1, "resource_state": 1},
+            "name": f"{start_local:%A} {sport}",
+            "distance": round(distance, 1),
+            "moving_time": moving_time,
+            "elapsed_time": moving_time + int(rng.exponential(120)),
+            "type": sport,
+            "sport_type": sport,
+            "id": 10_000_000 + count - i,
+            "start_date": (start_local - pd.Timedelta(hours=int(utc_offsets[i]))).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "start_date_local": start_local.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "timezone": "(GMT+01:00) Europe/Berlin",
+            "average_speed": round(speed, 3),
+            "max_speed": round(speed * float(rng.uniform(1.1, 1.8)), 3),
+            "has_heartrate": not gaps["heartrate"][i],
+        }
+        if not gaps["elevation"][i] and sport != "Swim":
+            low = float(rng.uniform(0, 600))
+            activity["total_elevation_gain"] = round(float(rng.exponential(8 * distance / 1000)), 1)
+            activity["elev_low"] = round(low, 1)
+            activity["elev_high"] = round(low + float(rng.exponential(60)), 1)
+        else:
+            activity["total_elevation_gain"] = 0.0
+        if not gaps["heartrate"][i]:
+            average = float(rng.normal(145, 12))
+            activity["average_heartrate"] = round(average, 1)
+            activity["max_heartrate"] = round(average + float(rng.uniform(10, 35)), 1)
+        if not gaps["cadence"][i] and sport in ("Run", "Walk", "Ride"):
+            activity["average_cadence"] = round(float(rng.normal(82 if sport == "Run" else 60, 5)), 1)
+        if not gaps["watts"][i]:
+            activity["average_watts"] = round(float(rng.normal(220, 40)), 1)
+        if not gaps["suffer_score"][i] and not gaps["heartrate"][i]:
+            activity["suffer_score"] = float(rng.integers(5, 250))
+        activities.append(activity)
+    return activities
@@ -0,0 +1,54 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from activity_cache import ActivityCache
+from derived_cache import sizeof
+
+
+def history(athlete_id, count=50):
+    return [{"id": athlete_id * 1000 + i, "name": "Morning Run", "distance": 5000.0} for i in range(count)]
+
+
+def test_concurrent_misses_share_one_load():
+    loads = []
+
+    def load(athlete_id):
+        loads.append(athlete_id)
+        time.sleep(0.2)
+        return history(athlete_id)
+
+    cache = ActivityCache(load)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: cache.get(1), range(8)))
+    assert loads == [1]
+    assert all(result is results[0] for result in results)
+    assert cache.get(1) is results[0]
+
+
+def test_idle_athletes_are_evicted_over_the_budget():
+    cache = ActivityCache(history, max_bytes=int(sizeof(history(1)) * 2.5))
+    cache.get(1)
+    cache.get(2)
+    cache.get(1)
+    cache.get(3)
+    assert 1 in cache and 3 in cache and 2 not in cache
+    assert cache.total_bytes <= cache.max_bytes
+
+
+def test_load_racing_an_invalidation_is_not_cached():
+    started, release = threading.Event(), threading.Event()
+
+    def load(athlete_id):
+        started.set()
+        release.wait()
+        return history(athlete_id)
+
+    cache = ActivityCache(load)
+    loader = threading.Thread(target=cache.get, args=(1,))
+    loader.start()
+    started.wait()
+    cache.invalidate(1)
+    release.set()
+    loader.join()
+    assert 1 not in cache
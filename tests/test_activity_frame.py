@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import activity_frame
+import strava
+
+
+def test_runs_frame_follows_the_schema(activities):
+    runs = strava.load_strava_data(strava.dataframe_from_activities(activities))
+    assert {column: str(dtype) for column, dtype in runs.dtypes.items()} == {
+        column: str(pd.Series(dtype=dtype).dtype) for column, dtype in activity_frame.RUNS_DTYPES.items()
+    }
+    assert (runs["month"] == runs["date"].dt.tz_localize(None).dt.to_period("M")).all()
+
+
+def test_heart_rate_is_rounded_and_gaps_stay_missing(activities):
+    runs = strava.load_strava_data(strava.dataframe_from_activities(activities))
+    by_id = {activity["id"]: activity for activity in activities}
+    for run in runs.head(200).itertuples():
+        expected = by_id[run.id].get("average_heartrate")
+        if expected is None:
+            assert pd.isna(run.average_heartrate)
+        else:
+            assert run.average_heartrate == round(expected)
+
+
+def test_compaction_saves_memory(activities):
+    runs = strava.load_strava_data(strava.dataframe_from_activities(activities))
+    loose = runs.astype({column: "float64" for column in runs.select_dtypes("number").columns})
+    loose = loose.assign(name=loose["name"].astype(object), month=loose["month"].dt.strftime("%Y-%m"))
+    assert activity_frame.memory_usage(runs) < activity_frame.memory_usage(loose) / 2
+
+
+def test_compaction_rejects_incomplete_frames():
+    with pytest.raises(ValueError, match="missing columns"):
+        activity_frame.compact_runs(pd.DataFrame({"date": pd.to_datetime(["2024-01-01"], utc=True)}))
+
+
+def test_builder_decodes_every_field_of_the_schema(activities):
+    frame = activity_frame.ActivityFrameBuilder().extend(activities).to_frame()
+    assert list(frame.columns) == [column for column, _, _ in activity_frame.ACTIVITY_SCHEMA]
+    assert len(frame) == len(activities)
+
+    for column, field, kind in activity_frame.ACTIVITY_SCHEMA:
+        values = [activity.get(field) for activity in activities]
+        if kind == "datetime":
+            expected = pd.to_datetime(values, utc=True)
+            assert (frame[column] == expected).all()
+        elif kind in ("int32", "int64"):
+            assert str(frame[column].dtype) == kind.capitalize()
+            assert frame[column].isna().tolist() == [value is None for value in values]
+            assert frame[column].fillna(-1).tolist() == [-1 if value is None else value for value in values]
+        elif kind == "float32":
+            assert frame[column].dtype == np.float32
+            expected = np.array([np.nan if value is None else value for value in values], dtype=np.float32)
+            np.testing.assert_array_equal(frame[column].to_numpy(), expected)
+        else:
+            assert frame[column].tolist() == values
+
+
+def test_buffers_grow_without_losing_rows(activities):
+    builder = activity_frame.ActivityFrameBuilder(capacity=1)
+    start = 0
+    for size in [1, 0, 3, 250, 7, 600]:
+        builder.extend(activities[start : start + size])
+        start += size
+    assert len(builder) == start
+    pd.testing.assert_frame_equal(builder.to_frame(), activity_frame.frame_from_pages([activities[:start]]))
+
+
+def test_builder_without_activities():
+    frame = activity_frame.ActivityFrameBuilder().to_frame()
+    assert frame.empty
+    assert list(frame.columns) == [column for column, _, _ in activity_frame.ACTIVITY_SCHEMA]
@@ -0,0 +1,60 @@
+import copy
+
+import pytest
+
+from activity_store import ActivityStore, dataset_version, start_timestamp
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ActivityStore(str(tmp_path / "activities.sqlite3"))
+
+
+def test_start_timestamp_is_utc_epoch_seconds():
+    assert start_timestamp({"start_date": "2024-01-01T00:00:10Z"}) == 1704067210
+    assert start_timestamp({"start_date_local": "1970-01-01T00:01:00Z"}) == 60
+    assert start_timestamp({}) is None
+
+
+def test_activities_load_newest_first_per_athlete(store, activities):
+    store.upsert(1, activities[:100])
+    store.upsert(2, activities[100:110])
+
+    loaded = store.load(1)
+    assert sorted(activity["id"] for activity in loaded) == sorted(activity["id"] for activity in activities[:100])
+    assert [start_timestamp(activity) for activity in loaded] == sorted(map(start_timestamp, loaded), reverse=True)
+    assert len(store.load(2)) == 10
+    assert store.load(3) == []
+
+
+def test_upserts_replace_activities_by_id(store, activities):
+    assert store.upsert(1, activities[:20]) == 20
+    edited = copy.deepcopy(activities[5])
+    edited["name"] = "Renamed on Strava"
+    store.upsert(1, [edited] + activities[:3])
+
+    loaded = {activity["id"]: activity for activity in store.load(1)}
+    assert len(loaded) == 20
+    assert loaded[edited["id"]]["name"] == "Renamed on Strava"
+
+
+def test_dataset_version_matches_the_loaded_history(store, activities):
+    assert store.dataset_version(1) == (0, 0, 0) == dataset_version([])
+    store.upsert(1, activities[10:40])
+    assert store.dataset_version(1) == dataset_version(store.load(1))
+    assert store.latest_start_timestamp(1) == max(map(start_timestamp, activities[10:40]))
+
+    before = store.dataset_version(1)
+    store.upsert(1, activities[:10])
+    assert store.dataset_version(1) == dataset_version(activities[:40]) != before
+
+
+def test_a_reopened_store_keeps_activities_and_sync_cursors(store, activities):
+    assert store.sync_cursor(1) is None
+    store.upsert(1, activities[:30])
+    store.set_sync_cursor(1, start_timestamp(activities[0]))
+
+    reopened = ActivityStore(store.path)
+    assert reopened.load(1) == store.load(1)
+    assert reopened.dataset_version(1) == store.dataset_version(1)
+    assert reopened.sync_cursor(1) == start_timestamp(activities[0])
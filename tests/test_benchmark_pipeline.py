@@ -0,0 +1,24 @@
+import json
+
+from tests.benchmark_pipeline import pipeline_stages, run_benchmark
+from tests.synthetic_activities import FIELD_GAPS, generate_activities
+
+
+def test_synthetic_activities_have_field_gaps():
+    activities = generate_activities(2000, seed=1)
+    assert len({a["id"] for a in activities}) == 2000
+    assert [a["start_date_local"] for a in activities] == sorted(
+        (a["start_date_local"] for a in activities), reverse=True
+    )
+    missing_heartrate = sum("average_heartrate" not in a for a in activities) / len(activities)
+    assert abs(missing_heartrate - FIELD_GAPS["heartrate"]) < 0.05
+
+
+def test_benchmark_reports_every_stage():
+    report = run_benchmark(sizes=[100], repeat=1)
+    json.dumps(report)
+    (run,) = report["runs"]
+    assert run["activities"] == 100
+    assert [stage["stage"] for stage in run["stages"]] == [name for name, _ in pipeline_stages([])]
+    for stage in run["stages"]:
+        assert stage["min_seconds"] > 0 and stage["peak_bytes"] > 0
@@ -0,0 +1,96 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+import decoupling
+from streams import StreamStore
+
+
+def steady_run(seconds=3600, heartrate=150.0, velocity=3.0):
+    time = np.arange(seconds)
+    return time, np.full(seconds, heartrate), np.full(seconds, velocity)
+
+
+def test_minetti_cost_of_running():
+    assert decoupling.running_cost(0.0) == decoupling.FLAT_COST
+    # 155.4 g^5 - 30.4 g^4 - 43.3 g^3 + 46.3 g^2 + 19.5 g + 3.6 at g = 0.1 and -0.1.
+    assert decoupling.running_cost(0.1) == pytest.approx(5.968214)
+    assert decoupling.running_cost(-0.1) == pytest.approx(2.151706)
+    # Grades beyond +-45% are clamped.
+    assert decoupling.running_cost(0.9) == decoupling.running_cost(decoupling.MAX_GRADE)
+    assert decoupling.running_cost(-0.9) == decoupling.running_cost(-decoupling.MAX_GRADE)
+
+
+def test_grade_from_distance_and_altitude():
+    distance = np.array([0.0, 10.0, 20.0, 20.0, 30.0])
+    altitude = np.array([100.0, 101.0, 101.0, 102.0, 100.0])
+    np.testing.assert_allclose(decoupling.grade(distance, altitude), [0.0, 0.1, 0.0, 0.0, -0.2])
+
+
+def test_steady_run_has_no_decoupling():
+    result = decoupling.efficiency_kernel(*steady_run())
+    assert result["efficiency_factor"] == pytest.approx(3.0 / 150.0)
+    assert result["decoupling"] == pytest.approx(0.0)
+    assert result["grade_adjusted_speed"] == pytest.approx(3.0)
+
+
+def test_cardiac_drift_shows_as_decoupling():
+    time, heartrate, velocity = steady_run()
+    heartrate[len(time) // 2 :] = 165.0
+    result = decoupling.efficiency_kernel(time, heartrate, velocity)
+    # Speed per beat drops from 3/150 to 3/165.
+    assert result["decoupling"] == pytest.approx((1 - 150 / 165) * 100, rel=1e-3)
+
+
+def test_samples_are_weighted_by_the_time_they_cover():
+    time = np.array([0, 1, 2, 602, 603])
+    heartrate = np.full(5, 150.0)
+    velocity = np.array([2.0, 2.0, 4.0, 2.0, 2.0])
+    result = decoupling.efficiency_kernel(time, heartrate, velocity)
+    assert result["grade_adjusted_speed"] == pytest.approx((2 + 2 + 4 * 600 + 2) / 603)
+
+
+def test_dropouts_and_stops_are_left_out():
+    time, heartrate, velocity = steady_run(600)
+    heartrate[100:200] = np.nan
+    velocity[300:310] = np.nan
+    moving = np.ones(600, dtype=bool)
+    moving[400:500] = False
+    velocity[400:500] = 0.0
+    result = decoupling.efficiency_kernel(time, heartrate, velocity, moving=moving)
+    assert result["efficiency_factor"] == pytest.approx(3.0 / 150.0)
+
+
+def test_uphill_running_is_grade_adjusted():
+    time, heartrate, velocity = steady_run(600)
+    result = decoupling.efficiency_kernel(time, heartrate, velocity, grades=np.full(600, 10.0))
+    assert result["grade_adjusted_speed"] == pytest.approx(3.0 * decoupling.running_cost(0.1) / decoupling.FLAT_COST)
+
+
+def test_too_few_samples():
+    result = decoupling.efficiency_kernel([0], [150.0], [3.0])
+    assert all(np.isnan(value) for value in result.values())
+
+
+def test_cached_results_follow_the_streams(tmp_path):
+    store = StreamStore(root=str(tmp_path))
+    time_, heartrate, velocity = steady_run(600)
+    store.save(1, 10, {"time": time_, "heartrate": heartrate, "velocity_smooth": velocity})
+    store.save(1, 11, {})
+
+    measured = decoupling.analyse_activities(store, 1, [10, 11, 12])
+    assert measured.index.tolist() == [10, 11]
+    assert measured.loc[10, "efficiency_factor"] == pytest.approx(3.0 / 150.0)
+    assert np.isnan(measured.loc[11, "efficiency_factor"])
+    key = decoupling.measurement_key(measured)
+    assert decoupling.measurement_key(decoupling.analyse_activities(store, 1, [10, 11])) == key
+
+    # Streams saved again, e.g. after an edit on Strava, are measured again.
+    time.sleep(0.01)
+    store.save(1, 10, {"time": time_, "heartrate": heartrate + 50, "velocity_smooth": velocity})
+    assert os.path.exists(os.path.join(store.load(1, 10).directory, decoupling.RESULT_FILE))
+    remeasured = decoupling.analyse_activities(store, 1, [10, 11])
+    assert remeasured.loc[10, "efficiency_factor"] == pytest.approx(3.0 / 200.0)
+    assert decoupling.measurement_key(remeasured) != key
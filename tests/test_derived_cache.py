@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import derived_cache
+from derived_cache import DerivedCache, cache_key, sizeof
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = DerivedCache()
+    monkeypatch.setattr(derived_cache, "shared_cache", lambda: cache)
+    return cache
+
+
+def array(kilobytes):
+    return np.zeros(kilobytes * 128)
+
+
+def test_sizes_of_frames_arrays_and_objects():
+    assert sizeof(array(1)) == 1024
+    frame = pd.DataFrame({"x": np.zeros(100)})
+    assert sizeof(frame) == frame.memory_usage(deep=True).sum()
+    assert sizeof({"a": 1}) > 0
+    assert sizeof(lambda: None) == 0
+
+
+def test_least_recently_used_entries_are_evicted_over_the_budget():
+    cache = DerivedCache(max_bytes=3 * 1024)
+    cache.put(("a",), array(1))
+    cache.put(("b",), array(1))
+    cache.put(("c",), array(1))
+    cache.get(("a",))
+    cache.put(("d",), array(1))
+
+    assert ("b",) not in cache
+    assert all(key in cache for key in [("a",), ("c",), ("d",)])
+    assert cache.total_bytes == 3 * 1024
+
+
+def test_replaced_and_oversized_values():
+    cache = DerivedCache(max_bytes=4 * 1024)
+    cache.put(("a",), array(1))
+    cache.put(("a",), array(2))
+    assert cache.total_bytes == 2 * 1024
+    # A value larger than the whole budget is returned but not kept.
+    assert len(cache.put(("b",), array(5))) == 5 * 128
+    assert ("b",) not in cache
+    assert cache.total_bytes == 2 * 1024
+
+
+def test_a_new_dataset_version_is_computed_again(cache):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    key = cache_key(1, (100, 5), max_pace=8.0, min_distance=4)
+    assert derived_cache.cached(key, "summary", compute) == 1
+    # Filter parameters are keyed regardless of their order.
+    assert derived_cache.cached(cache_key(1, (100, 5), min_distance=4, max_pace=8.0), "summary", compute) == 1
+    assert derived_cache.cached(cache_key(1, (101, 6), max_pace=8.0, min_distance=4), "summary", compute) == 2
+    assert derived_cache.cached(cache_key(2, (100, 5), max_pace=8.0, min_distance=4), "summary", compute) == 3
+    assert derived_cache.cached(None, "summary", compute) == 4
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_invalidating_an_athletes_stale_versions(cache):
+    for version in [(1, 1), (2, 2)]:
+        derived_cache.cached(cache_key(1, version), "runs", lambda: array(1))
+    derived_cache.cached(cache_key(2, (1, 1)), "runs", lambda: array(2))
+    assert cache.bytes_by_athlete() == {1: 2 * 1024, 2: 2 * 1024}
+
+    cache.invalidate(lambda key: key[0] == 1 and key[1] != (2, 2))
+    assert len(cache) == 2
+    assert cache_key(1, (2, 2)) + ("runs",) in cache
+    assert cache.bytes_by_athlete() == {1: 1024, 2: 2 * 1024}
+    assert cache.total_bytes == 3 * 1024
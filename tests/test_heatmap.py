@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import heatmap
+
+
+def years_of(df):
+    return sorted(df["date"].dt.year.unique().tolist())
+
+
+def test_cells_hold_the_distance_of_each_day(runs):
+    years = years_of(runs)
+    grid = heatmap.daily_distance_grid(runs, years)
+    dates = runs["date"].dt.tz_localize(None) if runs["date"].dt.tz is not None else runs["date"]
+    per_day = runs.groupby(dates.dt.normalize())["distance_km"].sum()
+
+    assert grid.shape == (len(years), 7, heatmap.WEEK_COLUMNS)
+    for index, year in enumerate(years):
+        first_day = pd.Timestamp(year=year, month=1, day=1)
+        days = pd.date_range(first_day, pd.Timestamp(year=year, month=12, day=31))
+        week = (days.dayofyear - 1 + first_day.weekday()) // 7
+        cells = grid[index][days.weekday, week]
+        np.testing.assert_allclose(cells, per_day.reindex(days, fill_value=0.0).to_numpy())
+        # Cells outside the year are blank, and every day of the year has its own cell.
+        assert np.isnan(grid[index]).sum() == 7 * heatmap.WEEK_COLUMNS - len(days)
+
+
+def test_runs_on_the_same_day_are_summed(runs):
+    day = runs.iloc[:1].copy()
+    both = pd.concat([day, day.assign(distance_km=2.5)], ignore_index=True)
+    grid = heatmap.daily_distance_grid(both, years_of(both))
+    assert np.nansum(grid) == pytest.approx(day["distance_km"].iloc[0] + 2.5)
+
+
+def test_runs_outside_the_years_are_left_out(runs):
+    years = years_of(runs)[-1:]
+    grid = heatmap.daily_distance_grid(runs, years)
+    latest = runs[runs["date"].dt.year == years[0]]
+    assert np.nansum(grid) == pytest.approx(latest["distance_km"].sum())
+
+
+def test_figure_labels_match_the_grid(runs):
+    year = years_of(runs)[-1]
+    grid = heatmap.daily_distance_grid(runs, [year])
+    fig = heatmap.heatmap_figure(grid[0], year)
+    text = np.array(fig.data[0].text)
+    has_run = np.nan_to_num(grid[0]) > 0
+    assert (text != "").sum() == has_run.sum()
+    assert len(fig.layout.xaxis.tickvals) == 12
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import derived_cache
+import instrumentation
+
+
+def test_stages_are_recorded_only_inside_a_rerun():
+    profiler = instrumentation.Profiler(history=2)
+
+    @instrumentation.timed("work")
+    def work():
+        return [0] * 100
+
+    work()
+    with profiler.rerun("session"):
+        with instrumentation.stage("outer"):
+            work()
+    assert [(t.name, t.depth) for t in profiler.reruns[0].stages] == [("work", 1), ("outer", 0)]
+    assert profiler.reruns[0].session_id == "session"
+
+    for _ in range(3):
+        with profiler.rerun():
+            work()
+    assert len(profiler.reruns) == 2
+    assert profiler.stage_summary()["work"]["calls"] == 2
+
+
+def test_cache_lookups_and_errors_are_counted_per_stage():
+    profiler = instrumentation.Profiler()
+    cache = derived_cache.DerivedCache()
+    with profiler.rerun():
+        with instrumentation.stage("lookup"):
+            cache.get_or_compute(("a",), lambda: 1)
+            cache.get_or_compute(("a",), lambda: 1)
+        with pytest.raises(ValueError):
+            with instrumentation.stage("failing"):
+                raise ValueError
+    summary = profiler.stage_summary()
+    assert summary["lookup"]["cache_hits"] == {"derived": 1}
+    assert summary["lookup"]["cache_misses"] == {"derived": 1}
+    assert summary["failing"]["errors"] == 1
+
+
+def test_exports():
+    profiler = instrumentation.Profiler()
+    with profiler.rerun():
+        with instrumentation.stage('plots "quoted"'):
+            pass
+    report = json.loads(profiler.to_json(extra=1))
+    assert report["extra"] == 1 and len(report["reruns"]) == 1
+    text = profiler.to_prometheus()
+    assert 'run_app_stage_seconds_count{stage="plots \\"quoted\\""} 1' in text
+    assert "run_app_rerun_seconds_count 1" in text
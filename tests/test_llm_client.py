@@ -0,0 +1,164 @@
+import asyncio
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from llm_client import ChatStreamClient, ChatStreamer, SSEParser
+
+ANSWER = ["Your ", "longest ", "run ", "was ", "21.1 km."]
+
+
+class StubCompletions(BaseHTTPRequestHandler):
+    """Mimics the chat-completions SSE stream: chunked, with keep-alive comments and a role-only first delta."""
+
+    protocol_version = "HTTP/1.1"
+    chunk_delay = 0.0
+    stall = 0.0
+    status = 200
+    clients = []
+
+    def log_message(self, *args):
+        pass
+
+    def write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.clients.append(self.client_address)
+        if self.status != 200:
+            error = json.dumps({"error": {"message": "invalid key"}}).encode()
+            self.send_response(self.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(error)))
+            self.end_headers()
+            self.wfile.write(error)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(self.stall)
+        try:
+            self.write_chunk(b": keep-alive\n\n")
+            self.write_chunk(b'data: {"choices": [{"delta": {"role": "assistant"}}]}\n\n')
+            for content in ANSWER:
+                event = {"model": body["model"], "choices": [{"delta": {"content": content}}]}
+                line = b"data: " + json.dumps(event).encode() + b"\n\n"
+                # Split events across chunks to exercise the incremental parser.
+                self.write_chunk(line[:7])
+                self.write_chunk(line[7:])
+                time.sleep(self.chunk_delay)
+            self.write_chunk(b"data: [DONE]\n\n")
+            self.write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+@pytest.fixture
+def server():
+    handler = type("Handler", (StubCompletions,), {"clients": []})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_sse_parser_skips_comments_and_keeps_partial_lines():
+    parser = SSEParser()
+    assert parser.feed(b": ping\n\ndata: {\"a\"") == []
+    assert parser.feed(b": 1}\n\ndata: [DONE]\n") == [b'{"a": 1}', b"[DONE]"]
+
+
+def test_streams_content_and_reuses_the_connection(server):
+    async def ask(client):
+        return [chunk async for chunk in client.stream("key", [{"role": "user", "content": "hi"}], "gpt-4")]
+
+    async def main():
+        client = ChatStreamClient(base_url(server))
+        try:
+            return await ask(client), await ask(client)
+        finally:
+            await client.aclose()
+
+    first, second = asyncio.run(main())
+    assert first == second == ANSWER
+    assert server.RequestHandlerClass.clients[0] == server.RequestHandlerClass.clients[1]
+
+
+def test_closing_the_iterator_cancels_the_stream(server):
+    server.RequestHandlerClass.chunk_delay = 0.5
+    streamer = ChatStreamer(base_url(server))
+    try:
+        started = time.monotonic()
+        stream = streamer.stream("key", [{"role": "user", "content": "hi"}], "gpt-4")
+        assert next(stream) == ANSWER[0]
+        stream.close()
+        assert time.monotonic() - started < 1.0
+    finally:
+        streamer.close()
+
+
+def test_read_timeout(server):
+    server.RequestHandlerClass.stall = 1.0
+    streamer = ChatStreamer(base_url(server))
+    try:
+        with pytest.raises(httpx.ReadTimeout):
+            list(streamer.stream("key", [{"role": "user", "content": "hi"}], "gpt-4", read_timeout=0.2))
+    finally:
+        streamer.close()
+
+
+def test_stream_timeout(server):
+    server.RequestHandlerClass.chunk_delay = 0.2
+    streamer = ChatStreamer(base_url(server))
+    try:
+        with pytest.raises(TimeoutError):
+            list(streamer.stream("key", [{"role": "user", "content": "hi"}], "gpt-4", timeout=0.3))
+    finally:
+        streamer.close()
+
+
+def test_error_status_raises(server):
+    server.RequestHandlerClass.status = 401
+    streamer = ChatStreamer(base_url(server))
+    try:
+        with pytest.raises(httpx.HTTPStatusError):
+            list(streamer.stream("key", [{"role": "user", "content": "hi"}], "gpt-4"))
+    finally:
+        streamer.close()
+
+
+def test_decodes_compressed_streams():
+    events = [b": keep-alive\n\n"] + [
+        b"data: " + json.dumps({"choices": [{"delta": {"content": content}}]}).encode() + b"\n\n" for content in ANSWER
+    ]
+    body = gzip.compress(b"".join(events) + b"data: [DONE]\n\n")
+
+    def respond(request):
+        assert "gzip" in request.headers["Accept-Encoding"]
+        return httpx.Response(
+            200, headers={"Content-Type": "text/event-stream", "Content-Encoding": "gzip"}, content=body
+        )
+
+    async def main():
+        client = ChatStreamClient("https://api.example.com/v1", transport=httpx.MockTransport(respond))
+        try:
+            return [chunk async for chunk in client.stream("key", [{"role": "user", "content": "hi"}], "gpt-4")]
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(main()) == ANSWER
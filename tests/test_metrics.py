@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import metrics
+import plots
+
+
+@pytest.fixture
+def runs():
+    rng = np.random.default_rng(42)
+    size = 500
+    return pd.DataFrame(
+        {
+            "distance_km": rng.uniform(0.5, 42.2, size),
+            "total_elevation_gain": rng.uniform(0, 600, size),
+            "moving_time_seconds": rng.integers(300, 5 * 3600, size),
+            "average_heartrate": rng.uniform(100, 190, size),
+            "average_speed_metres_per_second": rng.uniform(1.5, 6.5, size),
+        }
+    )
+
+
+def test_speed_to_pace_encodes_minutes_and_seconds():
+    # 250, 400, 200 and 320 seconds per kilometre.
+    pace = metrics.speed_to_pace(pd.Series([4.0, 2.5, 5.0, 3.125]))
+
+    np.testing.assert_array_equal(pace, [4.10, 6.40, 3.20, 5.20])
+
+
+def test_speed_to_pace_truncates_seconds(runs):
+    speeds = runs["average_speed_metres_per_second"]
+    pace = metrics.speed_to_pace(speeds)
+    seconds_per_kilometer = 1000 / speeds.to_numpy()
+
+    minutes = np.floor(pace)
+    seconds = np.round((pace - minutes) * 100)
+    assert (seconds < 60).all()
+    assert (minutes * 60 + seconds <= seconds_per_kilometer).all()
+    assert (seconds_per_kilometer < minutes * 60 + seconds + 1).all()
+
+
+def test_speed_to_pace_edge_cases():
+    pace = metrics.speed_to_pace(pd.Series([0.0, np.nan, 2.5], dtype="float32"))
+
+    assert pace[0] == np.inf
+    assert np.isnan(pace[1])
+    assert pace[2] == 6.40
+
+
+def test_drift_adjusted_heartrate_matches_scalar(runs):
+    expected = runs.apply(plots.adjust_heart_rate_for_cardiac_drift, axis=1).to_numpy()
+    adjusted = metrics.drift_adjusted_heartrate(runs["average_heartrate"], runs["moving_time_seconds"])
+
+    np.testing.assert_allclose(adjusted, expected, rtol=0, atol=1e-12)
+
+
+def test_heart_rate_efficiency_matches_row_wise_formula(runs):
+    df = runs.copy()
+    df["additional_distance"] = metrics.ELEVATION_ADJUSTMENT_FACTOR * df["total_elevation_gain"]
+    df["adjusted_distance"] = df["distance_km"] + df["additional_distance"] / 1000
+    df["adjusted_speed"] = df["adjusted_distance"] / df["moving_time_seconds"] * 1000
+    df["adjusted_heartrate"] = df.apply(plots.adjust_heart_rate_for_cardiac_drift, axis=1)
+    df["decay"] = df["distance_km"].apply(lambda d: 1 - 0.12 * (1 - d / 8) if d <= 6 else 1)
+    df["heart_rate_efficiency"] = (df["adjusted_speed"] / df["adjusted_heartrate"]) * df["decay"]
+
+    columns = metrics.heart_rate_efficiency(runs)
+
+    for column, values in columns.items():
+        np.testing.assert_allclose(values, df[column].to_numpy(), rtol=1e-12, err_msg=column)
+
+
+def test_kernels_accept_nullable_integers():
+    moving_time = pd.Series([3600, None], dtype="Int32")
+
+    adjusted = metrics.drift_adjusted_heartrate(pd.Series([150.0, 150.0]), moving_time)
+
+    assert adjusted[0] == pytest.approx(142.5)
+    assert np.isnan(adjusted[1])
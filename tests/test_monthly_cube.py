@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+
+from app import filter_runs
+from monthly_cube import CUBE_COLUMNS, MonthlyCube
+
+
+def test_empty_frame_builds_an_empty_cube(runs):
+    cube = MonthlyCube.build(runs.iloc[:0])
+    assert list(cube.table.columns) == CUBE_COLUMNS
+    assert cube.table.empty
+    assert isinstance(cube.table.index, pd.PeriodIndex)
+    assert cube.last_date is None
+
+
+def test_filters_excluding_every_run_give_an_empty_cube(runs):
+    previous = MonthlyCube.build(filter_runs(runs, 10.0, 0.0))
+    cube = MonthlyCube.updated(previous, filter_runs(runs, 10.0, 1000.0))
+    assert cube.table.empty
+    assert list(cube.table.columns) == CUBE_COLUMNS
+
+
+def test_update_matches_a_full_build(runs):
+    df = filter_runs(runs, 10.0, 0.0)
+    cube = MonthlyCube.updated(MonthlyCube.build(df.iloc[: len(df) // 2]), df)
+    pd.testing.assert_frame_equal(cube.table, MonthlyCube.build(df).table)
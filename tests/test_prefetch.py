@@ -0,0 +1,83 @@
+import threading
+
+import pandas as pd
+import pytest
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+import strava
+from prefetch import Prefetcher, PrefetchJob
+from tests.synthetic_activities import generate_activities
+
+
+@pytest.fixture
+def pages():
+    activities = generate_activities(600, seed=11)
+    return [activities[start : start + 200] for start in range(0, len(activities), 200)]
+
+
+def test_progressive_runs_are_built_from_the_landed_pages(pages, monkeypatch):
+    def reprocess(athlete_id):
+        raise AssertionError("the stored history was reprocessed")
+
+    monkeypatch.setattr(strava, "athlete_activities", reprocess)
+    job = PrefetchJob(athlete_id=91)
+    job.base_version = (0, 0, 0)
+    for page in pages:
+        job.add_page(page, strava.load_strava_data(strava.dataframe_from_activities(page)))
+
+    first = strava.progressive_runs_frame(91, job, 1)
+    expected = strava.load_strava_data(strava.dataframe_from_activities(pages[0]))
+    assert first["id"].tolist() == expected["id"].tolist()
+
+    runs = strava.progressive_runs_frame(91, job, len(pages))
+    expected = strava.load_strava_data(strava.dataframe_from_activities([a for page in pages for a in page]))
+    pd.testing.assert_frame_equal(runs.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_no_landed_pages_give_an_empty_frame():
+    job = PrefetchJob(athlete_id=92)
+    job.base_version = (0, 0, 0)
+    runs = strava.progressive_runs_frame(92, job, 0)
+    assert runs.empty
+    assert list(runs.columns) == list(strava.activity_frame.RUNS_DTYPES)
+
+
+def test_waiting_for_pages_gives_up_after_the_timeout():
+    job = PrefetchJob(athlete_id=93)
+    job.add_page([])
+    assert job.wait_for_pages(2, timeout=0.01) == 1
+    assert not job.done
+
+    threading.Timer(0.05, job._finish, args=(RuntimeError("stalled"),)).start()
+    assert job.wait_for_pages(2, timeout=5) == 1
+    assert job.done and job.error is not None
+
+
+def test_workers_only_carry_a_session_context_while_its_task_runs():
+    prefetcher = Prefetcher(max_workers=1)
+    session_ctx = object()
+    seen = []
+
+    def task(job):
+        seen.append(get_script_run_ctx(suppress_warning=True))
+
+    thread = threading.current_thread()
+    setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, session_ctx)
+    try:
+        prefetcher.start(1, task).future.result()
+    finally:
+        delattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME)
+    prefetcher.start(2, task).future.result()
+
+    assert seen == [session_ctx, None]
+
+
+def test_running_jobs_are_shared():
+    prefetcher = Prefetcher()
+    release = threading.Event()
+    job = prefetcher.start(3, lambda job: release.wait(5))
+    assert prefetcher.start(3, lambda job: None) is job
+    release.set()
+    job.future.result()
+    assert job.done and job.error is None
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+import quick_answers
+import strava
+from app import filter_runs
+
+
+def runs_frame(activities):
+    return filter_runs(strava.load_strava_data(strava.dataframe_from_activities(activities)), 10.0, 0.0)
+
+
+@pytest.fixture
+def runs_without_heartrate(activities):
+    for activity in activities:
+        activity["has_heartrate"] = False
+        activity.pop("average_heartrate", None)
+        activity.pop("max_heartrate", None)
+    return runs_frame(activities)
+
+
+def test_summary_of_runs_without_heart_rate(runs_without_heartrate):
+    assert runs_without_heartrate["average_heartrate"].isna().all()
+    summary = quick_answers.RunSummary(runs_without_heartrate)
+
+    assert np.isnan(summary.totals["average_heartrate"])
+    assert summary.records["hardest run by heart rate"] is None
+    assert "heart rate" not in summary.context().splitlines()[0]
+    assert "bpm" not in summary.context()
+    assert quick_answers.answer("What is my average heart rate?", summary) == (
+        "None of your runs was recorded with a heart rate."
+    )
+
+
+@pytest.fixture
+def summary(runs):
+    return quick_answers.RunSummary(filter_runs(runs, 10.0, 0.0))
+
+
+def test_summary_of_no_runs(runs):
+    summary = quick_answers.RunSummary(runs.iloc[:0])
+
+    assert summary.totals["runs"] == 0
+    assert summary.monthly.empty
+    assert summary.context() == "No runs yet."
+    assert quick_answers.answer("Show me my longest run!", summary) is None
+
+
+@pytest.mark.parametrize(
+    "question, expected",
+    [
+        ("What is my fastest 5k?", "Your fastest run of 5k or longer:"),
+        ("pr 10 km", "Your fastest run of 10k or longer:"),
+        ("fastest half marathon", "Your fastest run of half marathon or longer:"),
+        ("What was my fastest marathon?", "Your fastest run of marathon or longer:"),
+        ("Show me my longest run!", "Your longest run:"),
+        ("Longest run by time", "Your longest run by time:"),
+        ("What was my fastest run?", "Your fastest run:"),
+        ("Which was my hilliest run?", "Your hilliest run:"),
+        ("Run with the highest heart rate", "Your hardest run by heart rate:"),
+        ("How far did I run in the last 30 days?", "In the last 30 days you ran"),
+        ("Show my monthly distance", "| Month | Runs |"),
+        ("How many km per week?", "| Week ending | Runs |"),
+        ("What is my average pace?", "Your average pace is"),
+        ("average heartrate", "Your average heart rate is"),
+        ("How many runs in total?", "You ran"),
+        ("How far have I run so far?", "You ran"),
+        ("What's my total distance?", "You ran"),
+        ("What's my longest run ever?", "Your longest run:"),
+        ("Average heart rate", "Your average heart rate is"),
+        ("How many km did I run in the past 7 days", "In the last 7 days you ran"),
+    ],
+)
+def test_common_questions_are_answered_locally(summary, question, expected):
+    assert quick_answers.answer(question, summary).startswith(expected)
+
+
+@pytest.mark.parametrize("runs", [(100, 0)], indirect=True)
+def test_distances_never_run(summary):
+    assert quick_answers.answer("What was my fastest marathon?", summary) == "You haven't run a marathon yet."
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "Longest run in 2024",
+        "Fastest run since March",
+        "How many runs over 20 km?",
+        "What was my average pace this month?",
+        "Why am I getting slower?",
+        "Plan my next training block",
+        # Questions that mention an intent but ask for something the summary doesn't hold.
+        "How many marathons have I run?",
+        "How much has my pace improved?",
+        "How many times did I run faster than 5 min/km?",
+        "How far do I usually run on Sundays?",
+        "What's my longest streak of running days?",
+        "What was the fastest month?",
+        "Is my average pace getting better?",
+    ],
+)
+def test_narrowed_or_unknown_questions_go_to_the_agent(summary, question):
+    assert quick_answers.answer(question, summary) is None
@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, response_key
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, "time", clock)
+    return clock
+
+
+def test_equivalent_questions_share_a_key():
+    assert response_key("  What is my   longest run? ", "gpt-4") == response_key("what is my longest run", "gpt-4")
+    assert response_key("What is my longest run?", "gpt-4") != response_key("What is my longest run?", "gpt-3.5")
+    assert response_key("Longest run?", "gpt-4", "a") != response_key("Longest run?", "gpt-4", "b")
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), ttl_seconds=60)
+    cache.put("question", "answer")
+
+    clock.now += 59
+    assert cache.get("question") == "answer"
+    clock.now += 2
+    assert cache.get("question") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Expired entries are dropped when the next response is stored.
+    cache.put("other", "answer")
+    assert len(cache) == 1
+
+
+def test_least_recently_used_entries_are_evicted_beyond_the_size_limit(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), max_bytes=10)
+    cache.put("a", "aaaa")
+    clock.now += 1
+    cache.put("b", "bbbb")
+    clock.now += 1
+    assert cache.get("a") == "aaaa"
+    clock.now += 1
+    cache.put("c", "cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.get("c") == "cccc"
+    assert len(cache) == 2
+
+
+def test_concurrent_identical_calls_make_one_upstream_request(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"))
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def upstream():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("question", upstream))) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["answer"] * 8
+    # Later calls are served from the cache.
+    assert cache.get_or_compute("question", upstream) == "answer"
+    assert len(calls) == 1
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def run_concurrently(count, target):
+    """Starts `count` threads calling `target` and returns once they all are about to call it."""
+    results, errors = [], []
+    barrier = threading.Barrier(count + 1)
+
+    def call():
+        barrier.wait()
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    # Gives every thread time to join the flight before the test lets it land.
+    time.sleep(0.1)
+    return threads, results, errors
+
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return len(calls)
+
+    threads, results, _ = run_concurrently(6, lambda: flight.do("key", compute))
+    assert flight.in_flight("key")
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == [1] * 6
+    assert not flight.in_flight("key")
+    # Calls after the flight landed compute again.
+    assert flight.do("key", compute) == 2
+
+
+def test_waiters_get_the_leaders_exception():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def compute():
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    threads, results, errors = run_concurrently(4, lambda: flight.do("key", compute))
+    assert flight.in_flight("key")
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == []
+    assert len(errors) == 4 and all(isinstance(error, ValueError) for error in errors)
+    assert not flight.in_flight("key")
+
+
+def test_different_keys_do_not_wait_for_each_other():
+    flight = SingleFlight()
+    release = threading.Event()
+    threads, _, _ = run_concurrently(1, lambda: flight.do("slow", lambda: release.wait(5)))
+    assert flight.in_flight("slow")
+    assert flight.do("fast", lambda: "done") == "done"
+    release.set()
+    for thread in threads:
+        thread.join()
+    with pytest.raises(KeyError):
+        flight.do("key", lambda: {}["missing"])
@@ -0,0 +1,91 @@
+import copy
+import io
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import snapshot
+from activity_store import ActivityStore
+import strava
+from tests.synthetic_activities import generate_activities
+from tests.test_startup import APP_DIR
+
+
+def test_round_trip_keeps_the_frame(runs):
+    back = snapshot.read_snapshot(io.BytesIO(snapshot.snapshot_bytes(runs, athlete_id=1)))
+    pd.testing.assert_frame_equal(back, runs.reset_index(drop=True), check_categorical=False, rtol=1e-6)
+    assert back["type"].dtype == "category"
+    assert str(back["date"].dtype) == "datetime64[ns, UTC]"
+
+
+def test_projection_and_date_filter(runs):
+    source = io.BytesIO(snapshot.snapshot_bytes(runs))
+    june = snapshot.read_snapshot(source, columns=["date", "distance_km"], start="2025-06-01", end="2025-07-01")
+    expected = runs[(runs["date"] >= "2025-06-01") & (runs["date"] < "2025-07-01")]
+    assert list(june.columns) == ["date", "distance_km"]
+    assert len(june) == len(expected) > 0
+    assert june["date"].is_monotonic_increasing
+
+
+def test_rejects_other_files(runs):
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.read_snapshot(io.BytesIO(b"date,distance\n"))
+    other = io.BytesIO()
+    runs[["distance_km"]].to_parquet(other)
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.read_snapshot(io.BytesIO(other.getvalue()))
+
+
+def test_local_snapshot_is_only_used_for_its_version(runs, tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    assert snapshot.load_local_snapshot(1, (10, 5)) is None
+    snapshot.save_local_snapshot(1, runs, (10, 5))
+    assert len(snapshot.load_local_snapshot(1, (10, 5))) == len(runs)
+    assert snapshot.load_local_snapshot(1, (11, 6)) is None
+
+
+def test_snapshots_are_only_written_for_synced_histories(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    store = ActivityStore(str(tmp_path / "activities.sqlite3"))
+    monkeypatch.setattr(strava, "activity_store", lambda: store)
+    monkeypatch.setattr(strava, "athlete_activities", store.load)
+    activities = generate_activities(300, seed=2)
+
+    store.upsert(1, activities[:200])
+    strava.load_runs_frame(1, store.dataset_version(1))
+    assert not os.path.exists(snapshot.local_snapshot_path(1))
+
+    store.upsert(1, activities[200:])
+    store.set_sync_cursor(1, store.latest_start_timestamp(1))
+    strava.load_runs_frame(1, store.dataset_version(1))
+    assert snapshot.load_local_snapshot(1, store.dataset_version(1)) is not None
+
+
+def test_an_edited_activity_invalidates_the_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    store = ActivityStore(str(tmp_path / "activities.sqlite3"))
+    monkeypatch.setattr(strava, "activity_store", lambda: store)
+    monkeypatch.setattr(strava, "athlete_activities", store.load)
+    activities = generate_activities(50, seed=3)
+    store.upsert(1, activities)
+    store.set_sync_cursor(1, store.latest_start_timestamp(1))
+    saved = store.dataset_version(1)
+    strava.load_runs_frame(1, saved)
+
+    edited = copy.deepcopy(activities[10])
+    edited["distance"] += 1000
+    store.upsert(1, [edited])
+    assert store.dataset_version(1)[:2] == saved[:2]
+    assert snapshot.load_local_snapshot(1, store.dataset_version(1)) is None
+
+
+def test_snapshot_imports_without_loading_pyarrow():
+    # pandas may load pyarrow itself, so block it outright: snapshot must only need it once a snapshot is used.
+    script = "import sys; sys.modules['pyarrow'] = None; import snapshot"
+    result = subprocess.run(
+        [sys.executable, "-c", script], env={**os.environ, "PYTHONPATH": APP_DIR}, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
@@ -0,0 +1,73 @@
+"""
+Startup benchmark: imports the app in a fresh interpreter under `python -X importtime`.
+
+Set STARTUP_REPORT to a path to keep the JSON report, and STARTUP_BUDGET_SECONDS to
+fail when the total import time exceeds it. Run this file directly to print the report.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "run_app")
+# Subsystems that must stay off the startup path until their feature is used.
+LAZY_MODULES = ["langchain", "mitosheet", "bokeh", "plotly.figure_factory", "snapshot", "pyarrow.parquet"]
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+SECRETS = 'APP_URL = "http://localhost:8501"\nSTRAVA_CLIENT_ID = "client-id"\nSTRAVA_CLIENT_SECRET = "client-secret"\n'
+
+
+def import_times(module="app"):
+    """Imports `module` in a fresh interpreter; returns {name: (self_us, cumulative_us, depth)} of every import."""
+    with tempfile.TemporaryDirectory() as directory:
+        # Streamlit reads st.secrets from the working directory.
+        os.makedirs(os.path.join(directory, ".streamlit"))
+        with open(os.path.join(directory, ".streamlit", "secrets.toml"), "w") as f:
+            f.write(SECRETS)
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=directory,
+            env={**os.environ, "PYTHONPATH": APP_DIR},
+            capture_output=True,
+            text=True,
+            timeout=300,
+        )
+    assert result.returncode == 0, result.stderr[-2000:]
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            times[name] = (int(own), int(cumulative), len(indent) // 2)
+    return times
+
+
+def startup_report(times):
+    """Total import time, module count and the slowest direct imports of the imported module."""
+    total = sum(cumulative for _, cumulative, depth in times.values() if depth == 0)
+    direct = {name: cumulative for name, (_, cumulative, depth) in times.items() if depth == 1}
+    slowest = sorted(direct.items(), key=lambda item: -item[1])[:15]
+    return {
+        "total_seconds": total / 1e6,
+        "modules": len(times),
+        "slowest": {name: cumulative / 1e6 for name, cumulative in slowest},
+    }
+
+
+def test_startup_does_not_import_heavy_subsystems():
+    times = import_times()
+    report = startup_report(times)
+    if os.environ.get("STARTUP_REPORT"):
+        with open(os.environ["STARTUP_REPORT"], "w") as f:
+            json.dump(report, f, indent=2)
+
+    eager = [name for name in times if any(name == lazy or name.startswith(f"{lazy}.") for lazy in LAZY_MODULES)]
+    assert not eager
+    budget = os.environ.get("STARTUP_BUDGET_SECONDS")
+    if budget:
+        assert report["total_seconds"] <= float(budget), report
+
+
+if __name__ == "__main__":
+    print(json.dumps(startup_report(import_times()), indent=2))
@@ -0,0 +1,144 @@
+import httpx
+import pytest
+
+import strava_client
+from strava_client import MAX_ATTEMPTS, RateLimiter, RateLimitExceeded, StravaClient
+
+# 5 minutes into a 15-minute rate-limit window.
+NOW = 1000 * strava_client.RATE_LIMIT_WINDOW_SECONDS + 300
+
+
+def client_for(responses):
+    """A client answering each request with the next of `responses`, recording requests and sleeps."""
+    requests, sleeps = [], []
+
+    def handler(request):
+        requests.append(request)
+        response = responses[min(len(requests), len(responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    client = StravaClient(
+        base_url="https://strava.test/api/v3", transport=httpx.MockTransport(handler), sleep=sleeps.append
+    )
+    return client, requests, sleeps
+
+
+def test_retries_then_succeeds():
+    client, requests, sleeps = client_for(
+        [httpx.Response(503), httpx.Response(429, headers={"Retry-After": "3"}), httpx.Response(200, json=[{"id": 1}])]
+    )
+
+    assert client.get("/athlete/activities").json() == [{"id": 1}]
+    assert len(requests) == 3
+    backoffs = [seconds for seconds in sleeps if seconds]
+    assert len(backoffs) == 2
+    assert 0 <= backoffs[0] <= strava_client.BACKOFF_BASE_SECONDS
+    assert backoffs[1] == 3.0
+    assert [sample["attempt"] for sample in client.latencies] == [0, 1, 2]
+
+
+def test_transport_errors_are_retried():
+    client, requests, _ = client_for([httpx.ConnectError("refused"), httpx.Response(200, json={})])
+    assert client.get("/athlete").json() == {}
+    assert len(requests) == 2
+    assert client.latency_summary()["GET /athlete"]["errors"] == 1
+
+
+def test_gives_up_after_max_attempts():
+    client, requests, _ = client_for([httpx.Response(502)])
+    with pytest.raises(httpx.HTTPStatusError):
+        client.get("/activities/123/streams")
+    assert len(requests) == MAX_ATTEMPTS
+    assert list(client.latency_summary()) == ["GET /activities/{id}/streams"]
+
+
+def test_client_errors_are_not_retried():
+    client, requests, _ = client_for([httpx.Response(404)])
+    with pytest.raises(httpx.HTTPStatusError):
+        client.get("/activities/1")
+    assert len(requests) == 1
+
+
+def test_backoff_is_jittered_and_capped():
+    for attempt in range(10):
+        assert 0 <= strava_client.backoff(attempt) <= strava_client.BACKOFF_MAX_SECONDS
+    # Retry-After is honoured as given; HTTP dates fall back to the jittered backoff.
+    assert strava_client.backoff(0, retry_after="600") == 600.0
+    assert 0 <= strava_client.backoff(0, retry_after="Wed, 21 Oct 2025 07:28:00 GMT") <= 0.5
+
+
+def test_long_retry_after_fails_fast():
+    client, requests, sleeps = client_for([httpx.Response(429, headers={"Retry-After": "600"})])
+    with pytest.raises(httpx.HTTPStatusError):
+        client.get("/athlete")
+    assert len(requests) == 1
+    assert all(seconds <= strava_client.MAX_RETRY_AFTER_SECONDS for seconds in sleeps)
+
+
+def test_retry_after_is_not_shortened():
+    client, _, sleeps = client_for([httpx.Response(503, headers={"Retry-After": "20"}), httpx.Response(200, json={})])
+    client.get("/athlete")
+    assert 20.0 in sleeps
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setattr(strava_client.time, "time", lambda: NOW)
+    return RateLimiter()
+
+
+def test_limiter_waits_nothing_below_the_threshold(limiter):
+    assert limiter.delay() == 0.0
+    limiter.update({"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "50,400"})
+    assert limiter.delay() == 0.0
+
+
+def test_limiter_spreads_the_remaining_quota_over_the_window(limiter):
+    limiter.update({"X-RateLimit-Limit": "1000,10000", "X-RateLimit-Usage": "850,4000"})
+    # 600 seconds left in the window for 150 remaining requests.
+    assert limiter.delay() == pytest.approx(4.0)
+    assert limiter.delay() == pytest.approx(600 / 149)
+
+
+def test_limiter_delay_is_capped(limiter):
+    limiter.update({"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "90,400"})
+    # Spreading 10 requests over 600 seconds would hold the worker for a minute each.
+    for _ in range(10):
+        assert limiter.delay() == strava_client.MAX_THROTTLE_SECONDS
+    with pytest.raises(RateLimitExceeded):
+        limiter.delay()
+
+
+def test_limiter_honours_the_daily_limit(limiter, monkeypatch):
+    limiter.update({"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "10,999"})
+    assert limiter.delay() == 0.0
+    with pytest.raises(RateLimitExceeded) as raised:
+        limiter.delay()
+    assert raised.value.retry_after == pytest.approx(strava_client.DAILY_WINDOW_SECONDS - NOW % (24 * 3600))
+
+    monkeypatch.setattr(strava_client.time, "time", lambda: NOW + strava_client.DAILY_WINDOW_SECONDS)
+    assert limiter.delay() == 0.0
+    assert limiter.daily_limit is None
+
+
+def test_limiter_raises_once_the_quota_is_used_up(limiter, monkeypatch):
+    limiter.update({"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "100,400"})
+    with pytest.raises(RateLimitExceeded) as raised:
+        limiter.delay()
+    assert raised.value.retry_after == pytest.approx(600)
+
+    monkeypatch.setattr(strava_client.time, "time", lambda: NOW + 601)
+    assert limiter.delay() == 0.0
+    assert limiter.limit is None
+
+
+def test_client_paces_requests_by_the_rate_limit_headers(monkeypatch):
+    monkeypatch.setattr(strava_client.time, "time", lambda: NOW)
+    headers = {"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "95,400"}
+    client, _, sleeps = client_for([httpx.Response(200, headers=headers, json={})])
+
+    client.get("/athlete")
+    client.get("/athlete")
+    assert sleeps == [0.0, strava_client.MAX_THROTTLE_SECONDS]
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from stream_format import StreamFormatter, format_stream
+
+ANSWER = """Here is a summary of your running over the last months, with the longest runs first.
+It continues on the next line of the same paragraph   with some    extra spaces.
+
+| Month | Runs | Distance (km) |
+| --- | --- | --- |
+| 2025-10 | 14 | 132.4 |
+| 2025-11 | 12 | 118.0 |
+
+Your  longest run was a half marathon, and a very long token follows: {token}
+
+
+  Indented lines start a new paragraph after blank lines.
+Last line without a newline""".format(
+    token="x" * 75
+)
+
+
+def formatted(chunks, **options):
+    return "".join(format_stream(chunks, **options))
+
+
+def random_chunks(text, seed):
+    rng = random.Random(seed)
+    chunks, position = [], 0
+    while position < len(text):
+        size = rng.randint(1, 12)
+        chunks.append(text[position : position + size])
+        position += size
+    return chunks
+
+
+@pytest.mark.parametrize("options", [{"width": 40}, {"width": 40, "detect_tables": False}, {}])
+def test_output_does_not_depend_on_chunking(options):
+    whole = formatted([ANSWER], **options)
+    assert formatted(list(ANSWER), **options) == whole
+    for seed in range(20):
+        assert formatted(random_chunks(ANSWER, seed), **options) == whole
+    # Splits right at line breaks and around table pipes.
+    assert formatted(ANSWER.replace("\n", "\0\n\0").replace("|", "\0|\0").split("\0"), **options) == whole
+
+
+def test_paragraphs_are_wrapped_and_tables_kept():
+    lines = formatted([ANSWER], width=40).split("\n")
+    assert all(len(line) <= 40 for line in lines)
+    assert "| 2025-10 | 14 | 132.4 |" in lines
+    assert "| --- | --- | --- |" in lines
+    # Paragraphs are separated by exactly one blank line.
+    assert "\n\n\n" not in formatted([ANSWER], width=40)
+    assert lines[-1] == "newline"
+
+
+def test_deltas_only_contain_finished_lines():
+    formatter = StreamFormatter(width=20)
+    assert formatter.feed("Short words that wr") == ""
+    assert formatter.tail == "Short words that wr"
+    assert formatter.feed("ap up ") == "Short words that\n"
+    assert formatter.tail == "wrap up"
+    assert formatter.close() == "wrap up"
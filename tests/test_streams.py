@@ -0,0 +1,111 @@
+import httpx
+import numpy as np
+import pytest
+
+import streams
+
+
+class FakeClient:
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.requests = []
+
+    def get(self, path, params=None, headers=None):
+        self.requests.append(path)
+        activity_id = int(path.split("/")[2])
+        request = httpx.Request("GET", f"https://www.strava.com/api/v3{path}")
+        if activity_id not in self.payloads:
+            raise httpx.HTTPStatusError("Not Found", request=request, response=httpx.Response(404, request=request))
+        return httpx.Response(200, json=self.payloads[activity_id], request=request)
+
+
+def payload(**channels):
+    return {channel: {"data": data, "series_type": "time"} for channel, data in channels.items()}
+
+
+def test_null_samples_become_nan():
+    client = FakeClient(
+        {
+            1: payload(
+                time=[0, 1, 2, 3],
+                heartrate=[140, None, None, 142],
+                cadence=[None, 88, 89, 90],
+                velocity_smooth=[3.1, 3.2, None, 3.3],
+                latlng=[[52.5, 13.4], None, [52.5, 13.41], [52.5, 13.42]],
+                moving=[True, None, True, True],
+            )
+        }
+    )
+
+    fetched = streams.fetch_activity_streams(client, "token", 1)
+
+    assert fetched["time"].dtype == np.int32
+    np.testing.assert_array_equal(fetched["heartrate"], np.array([140, np.nan, np.nan, 142], dtype=np.float32))
+    assert np.isnan(fetched["cadence"][0])
+    assert np.isnan(fetched["velocity_smooth"][2])
+    assert fetched["latlng"].shape == (4, 2) and np.isnan(fetched["latlng"][1]).all()
+    np.testing.assert_array_equal(fetched["moving"], [True, False, True, True])
+
+
+def test_activity_without_streams():
+    assert streams.fetch_activity_streams(FakeClient({}), "token", 7) == {}
+
+
+def test_saved_streams_are_memory_mapped(tmp_path):
+    store = streams.StreamStore(root=str(tmp_path))
+    time = np.arange(0, 600, 2)
+    store.save(1, 42, {"time": time, "heartrate": np.full(len(time), 150.0), "velocity_smooth": np.ones(len(time))})
+
+    assert store.has(1, 42) and not store.has(1, 43)
+    loaded = store.load(1, 42)
+    assert loaded.channels == ["heartrate", "time", "velocity_smooth"]
+    assert isinstance(loaded["time"], np.memmap)
+    assert loaded["heartrate"].dtype == np.float32
+    np.testing.assert_array_equal(loaded["time"], time)
+
+    window = loaded.window(100, 200)
+    np.testing.assert_array_equal(loaded["time"][window], np.arange(100, 200, 2))
+    assert np.shares_memory(loaded["time"][window], loaded["time"])
+    with pytest.raises(KeyError):
+        loaded["watts"]
+    assert loaded.get("watts") is None
+
+
+def test_sync_fetches_only_missing_activities(tmp_path):
+    store = streams.StreamStore(root=str(tmp_path))
+    client = FakeClient({1: payload(time=[0, 1], heartrate=[None, 150])})
+
+    assert sorted(store.sync(client, "token", 5, [1, 2], max_concurrency=2)) == [1, 2]
+    assert store.load(5, 2).channels == []
+    assert np.isnan(store.load(5, 1)["heartrate"][0])
+    assert store.sync(client, "token", 5, [1, 2]) == []
+    assert len(client.requests) == 2
+
+
+def test_interrupted_saves_are_fetched_again(tmp_path, monkeypatch):
+    store = streams.StreamStore(root=str(tmp_path))
+    client = FakeClient({1: payload(time=[0, 1], heartrate=[150, 151], velocity_smooth=[3.0, 3.1])})
+    save = np.save
+
+    def failing_save(f, values):
+        if values.dtype == np.float32:
+            raise OSError("disk full")
+        save(f, values)
+
+    monkeypatch.setattr(streams.np, "save", failing_save)
+    with pytest.raises(OSError):
+        store.sync(client, "token", 5, [1])
+    assert not store.has(5, 1)
+
+    monkeypatch.setattr(streams.np, "save", save)
+    assert store.sync(client, "token", 5, [1]) == [1]
+    assert store.has(5, 1)
+    assert store.load(5, 1).channels == ["heartrate", "time", "velocity_smooth"]
+
+
+def test_saving_again_replaces_every_channel(tmp_path):
+    store = streams.StreamStore(root=str(tmp_path))
+    store.save(1, 42, {"time": [0, 1], "watts": [200, 210]})
+    store.save(1, 42, {"time": [0, 1, 2]})
+    assert store.has(1, 42)
+    assert store.load(1, 42).channels == ["time"]
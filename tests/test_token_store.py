@@ -0,0 +1,166 @@
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+import strava
+from singleflight import SingleFlight
+from strava_client import StravaClient
+from token_store import TokenStore
+
+ATHLETE = {"id": 7, "firstname": "Ada", "lastname": "Runner"}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = TokenStore(str(tmp_path / "tokens.sqlite3"))
+    monkeypatch.setattr(strava, "token_store", lambda: store)
+    refreshes = SingleFlight()
+    monkeypatch.setattr(strava, "token_refreshes", lambda: refreshes)
+    return store
+
+
+def token_endpoint(monkeypatch, handler):
+    requests = []
+
+    def record(request):
+        requests.append(json.loads(request.content))
+        time.sleep(0.1)
+        return handler(request)
+
+    client = StravaClient(transport=httpx.MockTransport(record), sleep=lambda seconds: None)
+    monkeypatch.setattr(strava, "strava_client", lambda: client)
+    return requests
+
+
+def test_sessions_map_to_athletes(store):
+    store.save({"access_token": "a", "refresh_token": "r", "expires_at": 1, "athlete": ATHLETE})
+    session_id = store.start_session(ATHLETE["id"])
+    assert store.session_athlete(session_id) == ATHLETE["id"]
+    assert store.session_athlete("unknown") is None
+    store.end_session(session_id)
+    assert store.session_athlete(session_id) is None
+
+
+def test_fresh_tokens_are_not_refreshed(store, monkeypatch):
+    requests = token_endpoint(monkeypatch, lambda request: httpx.Response(500))
+    store.save({"access_token": "a", "refresh_token": "r", "expires_at": time.time() + 6 * 3600, "athlete": ATHLETE})
+    assert strava.athlete_auth(ATHLETE["id"])["access_token"] == "a"
+    assert requests == []
+
+
+def test_expiring_tokens_are_refreshed_once(store, monkeypatch):
+    expires_at = int(time.time()) + 6 * 3600
+    requests = token_endpoint(
+        monkeypatch,
+        lambda request: httpx.Response(
+            200, json={"access_token": "b", "refresh_token": "r2", "expires_at": expires_at, "expires_in": 21600}
+        ),
+    )
+    store.save({"access_token": "a", "refresh_token": "r", "expires_at": int(time.time()) + 60, "athlete": ATHLETE})
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(strava.athlete_auth(ATHLETE["id"]))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(requests) == 1
+    assert requests[0]["grant_type"] == "refresh_token" and requests[0]["refresh_token"] == "r"
+    assert {result["access_token"] for result in results} == {"b"}
+    assert store.load(ATHLETE["id"]) == {
+        "access_token": "b",
+        "refresh_token": "r2",
+        "expires_at": expires_at,
+        "athlete": ATHLETE,
+    }
+
+
+def test_revoked_access_logs_the_athlete_out(store, monkeypatch):
+    token_endpoint(monkeypatch, lambda request: httpx.Response(400, json={"message": "Bad Request"}))
+    store.save({"access_token": "a", "refresh_token": "r", "expires_at": 0, "athlete": ATHLETE})
+    session_id = store.start_session(ATHLETE["id"])
+    assert strava.session_auth(session_id) is None
+    assert store.load(ATHLETE["id"]) is None
+    assert store.session_athlete(session_id) is None
+
+
+def test_refresh_responses_keep_the_stored_athlete(store):
+    store.save({"access_token": "a", "refresh_token": "r", "expires_at": 1, "athlete": ATHLETE})
+    saved = store.save({"access_token": "b", "refresh_token": "r2", "expires_at": 2}, athlete_id=ATHLETE["id"])
+    assert saved == {"access_token": "b", "refresh_token": "r2", "expires_at": 2, "athlete": ATHLETE}
+    with pytest.raises(KeyError):
+        store.save({"access_token": "c", "refresh_token": "r3", "expires_at": 3}, athlete_id=99)
+
+
+@pytest.fixture
+def browser(store, monkeypatch):
+    """A browser tab logging in, with its query params, session state and cookies."""
+    tab = {"query_params": {}, "session_state": {}, "cookies": {}}
+    monkeypatch.setattr(strava.st, "experimental_get_query_params", lambda: dict(tab["query_params"]))
+    monkeypatch.setattr(strava.st, "experimental_set_query_params", lambda **params: tab["query_params"].clear())
+    monkeypatch.setattr(strava.st, "session_state", tab["session_state"])
+    monkeypatch.setattr(
+        strava,
+        "_get_websocket_headers",
+        lambda: {"Cookie": "; ".join(f"{name}={value}" for name, value in tab["cookies"].items())},
+    )
+
+    def set_cookie(script, height):
+        name, value = script.split('"')[1].split(";")[0].split("=", 1)
+        if value:
+            tab["cookies"][name] = value
+        else:
+            tab["cookies"].pop(name, None)
+
+    monkeypatch.setattr(strava, "html", set_cookie)
+    tokens = {"access_token": "a", "refresh_token": "r", "expires_at": time.time() + 6 * 3600, "athlete": ATHLETE}
+    monkeypatch.setattr(strava, "exchange_authorization_code", lambda code: store.save(tokens))
+    for name in ("login_header", "logout_header", "prefetch_activities", "logged_in_title"):
+        monkeypatch.setattr(strava, name, lambda *args, **kwargs: None)
+    return tab
+
+
+def test_session_id_stays_out_of_the_url(store, browser):
+    browser["query_params"]["code"] = ["one-time-code"]
+    assert strava.authenticate()["access_token"] == "a"
+    assert browser["query_params"] == {}
+    session_id = browser["session_state"][strava.SESSION_STATE_KEY]
+    assert store.session_athlete(session_id) == ATHLETE["id"]
+
+    assert strava.authenticate()["access_token"] == "a"
+    store.end_session(session_id)
+    assert strava.authenticate(stop_if_unauthenticated=False) is None
+    assert strava.SESSION_STATE_KEY not in browser["session_state"]
+
+
+def test_login_survives_a_reload_through_the_signed_cookie(store, browser):
+    browser["query_params"]["code"] = ["one-time-code"]
+    strava.authenticate()
+    session_id = browser["session_state"][strava.SESSION_STATE_KEY]
+    assert strava.verify_session_cookie(browser["cookies"][strava.SESSION_COOKIE]) == session_id
+
+    # A reload, a new tab or a server restart starts with an empty session state.
+    browser["session_state"].clear()
+    assert strava.authenticate()["access_token"] == "a"
+    assert browser["session_state"][strava.SESSION_STATE_KEY] == session_id
+
+    # Ended sessions are not revived by their cookie, which is removed.
+    browser["session_state"].clear()
+    store.end_session(session_id)
+    assert strava.authenticate(stop_if_unauthenticated=False) is None
+    assert strava.SESSION_COOKIE not in browser["cookies"]
+
+
+def test_tampered_cookies_are_rejected(store, browser):
+    session_id = store.start_session(ATHLETE["id"])
+    store.save({"access_token": "a", "refresh_token": "r", "expires_at": time.time() + 6 * 3600, "athlete": ATHLETE})
+    signed = strava.sign_session_id(session_id)
+    assert strava.verify_session_cookie(signed) == session_id
+    assert strava.verify_session_cookie(session_id) is None
+    assert strava.verify_session_cookie(signed[:-1] + ("1" if signed.endswith("0") else "0")) is None
+
+    browser["cookies"][strava.SESSION_COOKIE] = session_id + ".forged"
+    assert strava.authenticate(stop_if_unauthenticated=False) is None
@@ -0,0 +1,110 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import plots
+from training_load import DECAY_FACTOR, TrainingLoad
+
+
+def baseline_weekly(df):
+    """The weekly fatigue `plot_fatigue_sport` computed before the training-load engine, on a copy of `df`."""
+    df = df.astype({"average_heartrate": "float64", "max_heartrate": "float64"})
+    df['average_heartrate'] = df['average_heartrate'].fillna(df['average_heartrate'].dropna().median())
+    df['HRPR'] = df['average_heartrate'] / df['average_speed_metres_per_second']
+    df['date'] = df['date'].dt.tz_localize(None)
+    df['week'] = df['date'].dt.to_period('W-MON')
+    df['days_since_last_workout'] = df['date'].diff().dt.days
+    weekly = df.groupby('week').agg(
+        {'distance_km': 'sum', 'max_heartrate': 'mean', 'HRPR': 'mean', 'days_since_last_workout': 'mean'}
+    )
+    normalized = sum(
+        (weekly[column] - weekly[column].min()) / (weekly[column].max() - weekly[column].min())
+        for column in ['HRPR', 'distance_km', 'max_heartrate']
+    )
+    adjustment = 1 - weekly['days_since_last_workout'] * (1 - DECAY_FACTOR)
+    return weekly.assign(fatigue=100 * adjustment * normalized / 3 + 10)
+
+
+def assert_same_load(load, expected):
+    pd.testing.assert_frame_equal(load.weekly(), expected.weekly())
+    assert load.first_date == expected.first_date
+    assert load.last_date == expected.last_date
+    assert math.isclose(load.current_fatigue, expected.current_fatigue)
+
+
+@pytest.mark.parametrize("share", [0.1, 0.5, 0.99])
+def test_incremental_update_matches_a_full_rebuild(runs, share):
+    seen = runs.iloc[: int(len(runs) * share)]
+    load = TrainingLoad.updated(TrainingLoad.from_frame(seen), runs)
+    assert_same_load(load, TrainingLoad.from_frame(runs))
+
+
+def test_updates_page_by_page_match_a_full_rebuild(runs):
+    load = None
+    for end in range(100, len(runs) + 100, 100):
+        load = TrainingLoad.updated(load, runs.iloc[:end])
+    assert_same_load(load, TrainingLoad.from_frame(runs))
+
+
+def test_update_reaching_further_back_rebuilds(runs):
+    recent = runs[runs["date"] >= runs["date"].iloc[len(runs) // 2]]
+    stale = TrainingLoad.from_frame(recent)
+    load = TrainingLoad.updated(stale, runs)
+    assert load is not stale
+    assert_same_load(load, TrainingLoad.from_frame(runs))
+
+
+def test_unchanged_frame_keeps_the_state(runs):
+    load = TrainingLoad.from_frame(runs)
+    assert TrainingLoad.updated(load, runs) is load
+    assert_same_load(load, TrainingLoad.from_frame(runs))
+
+
+def test_fatigue_matches_the_original_computation(runs):
+    runs = runs[runs["average_speed_metres_per_second"] > 0]
+    expected = baseline_weekly(runs)
+    weekly = TrainingLoad.from_frame(runs).weekly()
+
+    assert [week.end_time.normalize() for week in expected.index] == weekly["week"].tolist()
+    np.testing.assert_allclose(weekly["volume"], expected["distance_km"])
+    np.testing.assert_allclose(weekly["hrpr"], expected["HRPR"])
+    # Weeks without a max heart rate are NaN in the original and leave intensity out of the score here.
+    complete = expected["fatigue"].notna().to_numpy()
+    assert complete.sum() > len(complete) / 2
+    np.testing.assert_allclose(weekly["fatigue"][complete], expected["fatigue"][complete], rtol=1e-5)
+    assert weekly["fatigue"].notna().all()
+
+
+def test_missing_heart_rates_use_the_median(runs):
+    runs = runs[runs["average_speed_metres_per_second"] > 0].copy()
+    without = runs.index[::3]
+    runs.loc[without, "average_heartrate"] = pd.NA
+    np.testing.assert_allclose(TrainingLoad.from_frame(runs).weekly()["hrpr"], baseline_weekly(runs)["HRPR"])
+
+
+def test_metrics_without_spread_add_nothing(runs):
+    weeks = runs["date"].dt.tz_localize(None).dt.to_period("W-MON")
+    last_week = runs[weeks == weeks.iloc[-1]]
+    # With a single week every metric normalised to 0 / 0 in the original, making the score NaN.
+    assert baseline_weekly(last_week)["fatigue"].isna().all()
+    assert TrainingLoad.from_frame(last_week).current_fatigue == pytest.approx(10.0)
+
+
+def test_runs_without_speed_are_left_out_of_hrpr(runs):
+    runs = runs[runs["average_speed_metres_per_second"] > 0].copy()
+    expected = TrainingLoad.from_frame(runs).weekly()["hrpr"]
+    runs.loc[runs.index[-1], "average_speed_metres_per_second"] = 0.0
+    # The original divided by zero, making the last week's HRPR and its bounds infinite.
+    hrpr = TrainingLoad.from_frame(runs).weekly()["hrpr"]
+    assert np.isfinite(hrpr).all()
+    np.testing.assert_allclose(hrpr[:-1], expected[:-1])
+
+
+def test_the_input_frame_is_not_modified(runs):
+    before = runs.copy()
+    TrainingLoad.from_frame(runs)
+    plots.plot_fatigue_sport(runs)
+    pd.testing.assert_frame_equal(runs, before)
+    assert list(runs.columns) == list(before.columns)
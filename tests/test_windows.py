@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from windows import COMPARISON_WINDOWS, ActivityWindows
+
+
+def masked_metrics(df):
+    """The metrics as display_comparison_metrics computed them from a boolean mask."""
+    return {
+        "Total Records": round(df.shape[0], 2),
+        "Total Distance": round(df["distance_km"].sum(), 2),
+        "Average Pace": round(df["pace"].mean(), 2),
+    }
+
+
+def assert_same_metrics(metrics, expected):
+    assert metrics["Total Records"] == expected["Total Records"]
+    assert metrics["Total Distance"] == pytest.approx(expected["Total Distance"], abs=0.01)
+    if np.isnan(expected["Average Pace"]):
+        assert np.isnan(metrics["Average Pace"])
+    else:
+        assert metrics["Average Pace"] == pytest.approx(expected["Average Pace"], abs=0.01)
+
+
+@pytest.mark.parametrize("days", COMPARISON_WINDOWS)
+def test_windows_match_the_masked_frames(runs, days):
+    windows = ActivityWindows(runs)
+    end_date = runs["date"].max()
+    last = runs[(runs["date"] <= end_date) & (runs["date"] > end_date - pd.Timedelta(days=days))]
+    previous = runs[
+        (runs["date"] <= end_date - pd.Timedelta(days=days)) & (runs["date"] > end_date - pd.Timedelta(days=2 * days))
+    ]
+
+    assert_same_metrics(windows.last_days(days), masked_metrics(last))
+    assert_same_metrics(windows.last_days(days, offset_days=days), masked_metrics(previous))
+    assert_same_metrics(windows.all_time(), masked_metrics(runs))
+
+
+def test_unsorted_frames_and_missing_paces(runs):
+    shuffled = runs.sample(frac=1, random_state=1).copy()
+    shuffled.loc[shuffled.index[::7], "pace"] = np.nan
+    windows = ActivityWindows(shuffled)
+    end_date = shuffled["date"].max()
+
+    last = shuffled[shuffled["date"] > end_date - pd.Timedelta(days=90)]
+    assert_same_metrics(windows.last_days(90), masked_metrics(last))
+    assert_same_metrics(windows.all_time(), masked_metrics(shuffled))
+
+
+def test_windows_include_the_end_and_exclude_the_start(runs):
+    windows = ActivityWindows(runs)
+    start, end = runs["date"].iloc[10], runs["date"].iloc[20]
+    expected = runs[(runs["date"] > start) & (runs["date"] <= end)]
+    assert_same_metrics(windows.window(start, end), masked_metrics(expected))
+
+
+def test_empty_frame(runs):
+    windows = ActivityWindows(runs.iloc[:0])
+    assert len(windows) == 0
+    assert windows.end_date is None
+    metrics = windows.last_days(30)
+    assert metrics["Total Records"] == 0
+    assert metrics["Total Distance"] == 0
+    assert np.isnan(metrics["Average Pace"])